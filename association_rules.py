@@ -0,0 +1,236 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sicas_analysis import load_data, clean_data, get_translated_label
+from significance_testing import SICAS_COLUMNS, STAGE_PASS_LEVELS
+from survey_config import survey_routing
+from survey_encoding import MULTISELECT_QUESTIONS, encode_multiselect
+from instrumentation import timed
+
+# Outcomes added as items so rules can end in them: item name -> SICAS stage key (passing answers as in the funnel)
+OUTCOME_ITEMS = {
+    'purchase': 'purchase',
+    'satisfied': 'satisfaction'
+}
+
+# SWAR popcount constants for 64-bit words
+M1, M2, M4, H01 = (np.uint64(0x5555555555555555), np.uint64(0x3333333333333333),
+                   np.uint64(0x0f0f0f0f0f0f0f0f), np.uint64(0x0101010101010101))
+
+def popcount(words):
+    """Set bits per row of a (bitsets x words) uint64 array"""
+    x = words - ((words >> np.uint64(1)) & M1)
+    x = (x & M2) + ((x >> np.uint64(2)) & M2)
+    x = (x + (x >> np.uint64(4))) & M4
+    return ((x * H01) >> np.uint64(56)).sum(axis=-1, dtype=np.int64)
+
+def to_words(bitsets):
+    """Packed byte bitsets as uint64 words (zero-padded), so AND and popcount work 8 bytes at a time"""
+    padding = -bitsets.shape[1] % 8
+    padded = np.pad(bitsets, ((0, 0), (0, padding))) if padding else bitsets
+    return np.ascontiguousarray(padded).view(np.uint64)
+
+@timed
+def build_item_bitsets(df):
+    """One packed bitset per multi-select option and outcome (bit i = respondent i has the item)
+
+    Returns the (items x ceil(n/8)) uint8 array and an item table with each item's question and label.
+    """
+    rows = []
+    records = []
+
+    for key, column in MULTISELECT_QUESTIONS.items():
+        if column not in df.columns:
+            continue
+        indicator, options = encode_multiselect(df[column])
+        indicator = indicator.tocsc()
+        for j, option in enumerate(options):
+            has_item = np.zeros(len(df), dtype=bool)
+            has_item[indicator.indices[indicator.indptr[j]:indicator.indptr[j + 1]]] = True
+            rows.append(np.packbits(has_item))
+            records.append({'question': key, 'option': option, 'is_outcome': False})
+
+    for item, stage in OUTCOME_ITEMS.items():
+        column = SICAS_COLUMNS[stage]
+        if column in df.columns:
+            rows.append(np.packbits(df[column].isin(STAGE_PASS_LEVELS[stage]).to_numpy()))
+            records.append({'question': stage, 'option': item, 'is_outcome': True})
+
+    items = pd.DataFrame(records)
+    # Options such as '其他' appear in several questions; those labels carry their question
+    duplicated = items['option'].duplicated(keep=False)
+    items['label'] = np.where(duplicated, items['option'] + ' (' + items['question'] + ')', items['option'])
+
+    return np.vstack(rows), items
+
+def _extend(itemset, count, words, items, later_words, min_count, max_length, found):
+    """Record an itemset and extend it depth-first with the later items (vertical bitset intersections)"""
+    found[itemset] = int(count)
+    if len(itemset) >= max_length or len(items) == 0:
+        return
+
+    # All extensions at once: AND with every later item, then prune by support
+    joined = later_words & words
+    counts = popcount(joined)
+    keep = counts >= min_count
+    items, joined, counts = items[keep], joined[keep], counts[keep]
+
+    for j in range(len(items)):
+        _extend(itemset + (int(items[j]),), counts[j], joined[j], items[j + 1:], joined[j + 1:],
+                min_count, max_length, found)
+
+# Worker-process state, set once per worker so the bitsets are not re-sent per branch
+_WORKER_DATA = {}
+
+def _init_worker(items, words, counts, min_count, max_length):
+    """Store the shared item bitsets in the worker process"""
+    _WORKER_DATA.update(items=items, words=words, counts=counts, min_count=min_count, max_length=max_length)
+
+def _mine_branch(i):
+    """Every frequent itemset whose first (rarest) item is the i-th frequent item"""
+    data = _WORKER_DATA
+    found = {}
+    _extend((int(data['items'][i]),), data['counts'][i], data['words'][i], data['items'][i + 1:],
+            data['words'][i + 1:], data['min_count'], data['max_length'], found)
+    return found
+
+@timed
+def frequent_itemsets(bitsets, n_respondents, min_support=0.02, max_length=4, n_jobs=None):
+    """All itemsets held by at least min_support of respondents: {item index tuple: respondent count}
+
+    Eclat over packed bitsets: support counting is an AND plus a popcount, and every itemset
+    below min_support is pruned together with all of its supersets. The branches of the
+    search (one per first item) are mined in parallel.
+    """
+    min_count = max(1, int(np.ceil(min_support * n_respondents)))
+    words = to_words(bitsets)
+    counts = popcount(words)
+
+    # Rarest items first keeps the intersected bitsets small early in each branch
+    order = np.argsort(counts, kind='stable')
+    order = order[counts[order] >= min_count]
+    shared = (order, words[order], counts[order], min_count, max_length)
+
+    if n_jobs is None:
+        n_jobs = min(len(order), os.cpu_count() or 1)
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=shared) as executor:
+            branches = list(executor.map(_mine_branch, range(len(order))))
+    else:
+        _init_worker(*shared)
+        branches = [_mine_branch(i) for i in range(len(order))]
+
+    found = {}
+    for branch in branches:
+        found.update(branch)
+    return found
+
+def routed_on(outcome_question, config=None):
+    """Questions only asked depending on the outcome: they cannot predict it"""
+    return {key for key, (condition, _) in survey_routing(config).items() if condition == outcome_question}
+
+@timed
+def association_rules(itemsets, items, n_respondents, min_confidence=0.5, outcomes_only=False):
+    """Single-consequent rules X -> y from the frequent itemsets, with support, confidence, lift and leverage
+
+    Rules ending in an outcome never use options of a question routed on that outcome
+    (e.g. purchase channels, which only purchasers were asked).
+    """
+    item_support = {itemset[0]: count / n_respondents for itemset, count in itemsets.items() if len(itemset) == 1}
+    outcomes = set(np.flatnonzero(items['is_outcome'].to_numpy()))
+    questions = items['question'].to_numpy()
+    labels = items['label'].to_numpy()
+    excluded = {y: routed_on(questions[y]) | {questions[y]} for y in outcomes}
+
+    records = []
+    for itemset, count in itemsets.items():
+        if len(itemset) < 2:
+            continue
+        for position, consequent in enumerate(itemset):
+            if outcomes_only and consequent not in outcomes:
+                continue
+            antecedent = itemset[:position] + itemset[position + 1:]
+            if consequent in outcomes and any(questions[a] in excluded[consequent] for a in antecedent):
+                continue
+            # Outcomes are consequents, not conditions
+            if any(a in outcomes for a in antecedent):
+                continue
+
+            support = count / n_respondents
+            antecedent_support = itemsets[antecedent] / n_respondents
+            confidence = support / antecedent_support
+            if confidence < min_confidence:
+                continue
+            records.append({
+                'antecedent': ' + '.join(labels[a] for a in antecedent),
+                'consequent': labels[consequent],
+                'length': len(itemset),
+                'support': support,
+                'confidence': confidence,
+                'lift': confidence / item_support[consequent],
+                'leverage': support - antecedent_support * item_support[consequent],
+                'count': count
+            })
+
+    rules = pd.DataFrame(records, columns=['antecedent', 'consequent', 'length', 'support', 'confidence',
+                                           'lift', 'leverage', 'count'])
+    return rules.sort_values(['lift', 'support'], ascending=False, ignore_index=True)
+
+@timed
+def mine_association_rules(df, min_support=0.02, min_confidence=0.5, max_length=4, n_jobs=None):
+    """Frequent option combinations across all multi-select questions and the rules they support"""
+    bitsets, items = build_item_bitsets(df)
+    itemsets = frequent_itemsets(bitsets, len(df), min_support, max_length, n_jobs)
+    rules = association_rules(itemsets, items, len(df), min_confidence)
+
+    labels = items['label'].to_numpy()
+    frequent = pd.DataFrame({
+        'itemset': [' + '.join(labels[i] for i in itemset) for itemset in itemsets],
+        'length': [len(itemset) for itemset in itemsets],
+        'support': [count / len(df) for count in itemsets.values()]
+    }).sort_values(['length', 'support'], ascending=[True, False], ignore_index=True)
+
+    return {
+        'items': items,
+        'itemsets': frequent,
+        'rules': rules,
+        'outcome_rules': rules[rules['consequent'].isin(OUTCOME_ITEMS)].reset_index(drop=True)
+    }
+
+def translate_rule_side(text):
+    """English labels for one side of a rule"""
+    return ' + '.join(get_translated_label(label) for label in text.split(' + '))
+
+def main():
+    parser = argparse.ArgumentParser(description='Mine association rules across multi-select answers')
+    parser.add_argument('--min-support', type=float, default=0.02)
+    parser.add_argument('--min-confidence', type=float, default=0.5)
+    parser.add_argument('--max-length', type=int, default=4)
+    parser.add_argument('--top', type=int, default=20, help='rules shown per list')
+    args = parser.parse_args()
+
+    print("Loading data for association rules...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Mining frequent itemsets...")
+    mined = mine_association_rules(df, args.min_support, args.min_confidence, args.max_length)
+    print(f"{len(mined['items'])} items, {len(mined['itemsets'])} frequent itemsets, {len(mined['rules'])} rules")
+
+    columns = ['antecedent', 'consequent', 'support', 'confidence', 'lift']
+    outcome_lists = [(f"Rules ending in '{item}'", mined['outcome_rules'][mined['outcome_rules']['consequent'] == item])
+                     for item in OUTCOME_ITEMS]
+    for title, rules in outcome_lists + [('All rules', mined['rules'])]:
+        shown = rules.head(args.top)[columns].copy()
+        shown['antecedent'] = shown['antecedent'].map(translate_rule_side)
+        shown['consequent'] = shown['consequent'].map(translate_rule_side)
+        print(f"\n{title} (top {args.top} by lift):")
+        print(shown.round(3).to_string(index=False))
+
+    print("Association rule mining complete!")
+
+if __name__ == "__main__":
+    main()
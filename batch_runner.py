@@ -0,0 +1,233 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from survey_config import load_survey_config, missing_questions, canonicalize_columns
+import instrumentation
+
+# Relative output directories the analysis modules write into (created per survey)
+OUTPUT_DIRECTORIES = ['plots', 'thesis_plots', 'additional_plots', 'validation_plots', 'driver_plots', 'attribution_plots',
+                      'results']
+
+# Questions every report depends on; surveys without them are reported as failed up front
+CORE_QUESTIONS = ['awareness', 'attraction', 'interaction', 'purchase', 'satisfaction']
+
+# Matplotlib settings right after the analysis modules are imported; restored before every survey
+_BASE_RC_PARAMS = None
+
+# Suffix of the optional respondent weights file next to a survey export (<name>.weights.csv)
+WEIGHTS_SUFFIX = '.weights.csv'
+
+def discover_surveys(input_dir):
+    """Survey exports in a directory: each <name>.csv with an optional <name>.json questionnaire config
+    and optional <name>.weights.csv respondent weights (as written by survey_weighting.py)"""
+    surveys = []
+    for csv_path in sorted(glob.glob(os.path.join(input_dir, '*.csv'))):
+        if csv_path.endswith(WEIGHTS_SUFFIX):
+            continue
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        config_path = os.path.splitext(csv_path)[0] + '.json'
+        weights_path = os.path.splitext(csv_path)[0] + WEIGHTS_SUFFIX
+        surveys.append({
+            'name': name,
+            'data': os.path.abspath(csv_path),
+            'config': os.path.abspath(config_path) if os.path.exists(config_path) else None,
+            'weights': os.path.abspath(weights_path) if os.path.exists(weights_path) else None
+        })
+    return surveys
+
+def _init_worker():
+    """Import the analysis stack once per worker, so every survey it runs shares the loaded modules"""
+    global _BASE_RC_PARAMS
+    import matplotlib
+    matplotlib.use('Agg')
+
+    import sicas_analysis, thesis_enhancements, enhanced_analysis, statistical_validation, results_export
+
+    _BASE_RC_PARAMS = matplotlib.rcParams.copy()
+
+def run_pipeline(df, config, weights=None):
+    """Run every analysis stage for one survey; outputs are written relative to the working directory
+
+    weights: respondent weights aligned with df (None for an unweighted run), used by every stage that takes them.
+    """
+    import matplotlib
+    from sicas_analysis import (analyze_sicas, perform_demographic_analysis, visualize_sicas,
+                                generate_sicas_funnel, generate_report)
+    from thesis_enhancements import (set_thesis_style, create_pie_charts, create_radar_chart, create_heatmap,
+                                     create_grouped_bar_charts, generate_sicas_conclusions, generate_enhanced_report)
+    from significance_testing import run_segment_tests
+    from sequential_funnel import analyze_sequential_funnel
+    from path_model import analyze_sicas_paths
+    from driver_analysis import analyze_key_drivers, plot_key_drivers
+    from channel_attribution import analyze_channel_attribution, plot_channel_attribution
+    from enhanced_analysis import (analyze_additional_columns, update_translation_dict,
+                                   visualize_additional_results, generate_additional_report)
+    from text_mining import mine_suggestions
+    from statistical_validation import (map_questions_to_dimensions, reliability_analysis, validity_analysis,
+                                        factor_analysis, generate_validation_report)
+    from polychoric import polychoric_correlation_matrix
+    from correlation_significance import polychoric_significance
+    from multiple_imputation import multiple_imputation
+    from survey_weighting import respondent_weights
+    from results_export import (sicas_stage_results, demographic_stage_results, additional_stage_results,
+                                validation_stage_results, write_stage_results)
+
+    # Plot styles are global; start every survey from the same settings
+    if _BASE_RC_PARAMS is not None:
+        matplotlib.rcParams.update(_BASE_RC_PARAMS)
+
+    # The survey pool already uses every core, so the stages run their own work serially (n_jobs=1)
+
+    # Registry-based stages and the exports look questions up under the reference column names
+    canonical = canonicalize_columns(df, config)
+    weights = respondent_weights(df, weights)
+
+    # 1. Core SICAS analysis (reads the survey's own column names through the config)
+    print("Analyzing SICAS components...")
+    sicas_results = analyze_sicas(df, config, weights)
+    demographics = perform_demographic_analysis(df, config, weights)
+    visualize_sicas(sicas_results)
+    funnel = analyze_sequential_funnel(canonical, weights)
+    generate_sicas_funnel(sicas_results, funnel)
+    generate_report(sicas_results, demographics)
+    write_stage_results(sicas_stage_results(sicas_results, canonical, weights))
+    write_stage_results(demographic_stage_results(demographics, canonical, weights))
+
+    # 2. Thesis charts, segment tests and path model
+    print("Running thesis analysis...")
+    set_thesis_style()
+    create_pie_charts(sicas_results, demographics)
+    create_radar_chart(sicas_results, funnel)
+    # The polychoric significance bootstrap runs once, for the heatmap and the validity analysis
+    items, dimensions = map_questions_to_dimensions(canonical)
+    item_significance = polychoric_significance(items['matrix'], items['codes'], weights=weights)
+    create_heatmap(canonical, n_jobs=1, weights=weights, significance=item_significance)
+    create_grouped_bar_charts(sicas_results, demographics, canonical, weights)
+    significance = run_segment_tests(canonical, weights=weights)
+    conclusions = generate_sicas_conclusions(sicas_results, demographics, significance, funnel)
+    path_results = analyze_sicas_paths(canonical, n_jobs=1, weights=weights)
+    drivers = analyze_key_drivers(canonical, weights, n_jobs=1)
+    plot_key_drivers(drivers)
+    generate_enhanced_report(sicas_results, demographics, conclusions, path_results, drivers)
+
+    # 3. Additional questions and free-text suggestions
+    print("Analyzing additional columns...")
+    additional_results = analyze_additional_columns(canonical, weights)
+    translations_dict = update_translation_dict()
+    visualize_additional_results(additional_results, translations_dict, canonical, weights)
+    text_results = mine_suggestions(canonical, n_jobs=1)
+    attribution = analyze_channel_attribution(canonical, weights)
+    plot_channel_attribution(attribution)
+    generate_additional_report(additional_results, translations_dict, text_results, drivers, attribution)
+    write_stage_results(additional_stage_results(additional_results, canonical, weights))
+
+    # 4. Reliability, validity and factor analysis
+    print("Running statistical validation...")
+    reliability_results = reliability_analysis(items, dimensions, weights)
+    polychoric_corr = polychoric_correlation_matrix(items, n_jobs=1, weights=weights)
+    validity_results = validity_analysis(items, dimensions, polychoric_corr, weights, item_significance)
+    factor_results = factor_analysis(items, dimensions, polychoric_corr, weights)
+    imputation = multiple_imputation(items, dimensions, n_jobs=1)
+    generate_validation_report(reliability_results, validity_results, factor_results, imputation)
+    write_stage_results(validation_stage_results(reliability_results, validity_results, factor_results))
+
+def run_survey(survey, output_dir):
+    """Run the pipeline for one survey inside its own output directory; returns a summary dict"""
+    from sicas_analysis import load_data, clean_data
+    from survey_weighting import load_weights
+
+    survey_dir = os.path.join(os.path.abspath(output_dir), survey['name'])
+    os.makedirs(survey_dir, exist_ok=True)
+    summary = {'name': survey['name'], 'data': survey['data'], 'config': survey['config'],
+               'weights': survey.get('weights'), 'output': survey_dir}
+
+    start = time.perf_counter()
+    previous_dir = os.getcwd()
+    # Each survey gets its own stage timings (workers run many surveys)
+    instrumentation.reset_run_log()
+    with open(os.path.join(survey_dir, 'run.log'), 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        try:
+            config = load_survey_config(survey['config'])
+            df = clean_data(load_data(survey['data']))
+            weights = load_weights(survey['weights'], df) if survey.get('weights') else None
+            summary['n_respondents'] = len(df)
+            summary['missing_questions'] = missing_questions(df, config)
+            missing_core = [key for key in CORE_QUESTIONS if key in summary['missing_questions']]
+            if missing_core:
+                raise ValueError(f"Survey is missing core SICAS questions: {', '.join(missing_core)}")
+
+            os.chdir(survey_dir)
+            for directory in OUTPUT_DIRECTORIES:
+                os.makedirs(directory, exist_ok=True)
+
+            with instrumentation.stage('survey'):
+                run_pipeline(df, config, weights)
+            summary['status'] = 'ok'
+        except Exception as e:
+            # One broken export must not stop the rest of the batch
+            traceback.print_exc(file=log)
+            summary['status'] = 'failed'
+            summary['error'] = f'{type(e).__name__}: {e}'
+        finally:
+            os.chdir(previous_dir)
+
+    if instrumentation.ENABLED:
+        summary['run_log'] = instrumentation.write_run_log(os.path.join(survey_dir, 'run_log.json'))
+        instrumentation.reset_run_log()
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    return summary
+
+def _run_survey_task(task):
+    """Process-pool entry point"""
+    return run_survey(*task)
+
+def run_batch(input_dir, output_dir, n_jobs=None):
+    """Run every survey in input_dir across a process pool; writes batch_summary.json to output_dir"""
+    from report_engine import write_atomic
+
+    surveys = discover_surveys(input_dir)
+    tasks = [(survey, output_dir) for survey in surveys]
+    os.makedirs(output_dir, exist_ok=True)
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, len(tasks)))
+
+    if n_jobs > 1:
+        # Workers stay alive across surveys, so imports and chart caches are paid once per worker
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker) as executor:
+            summaries = list(executor.map(_run_survey_task, tasks))
+    else:
+        _init_worker()
+        summaries = [_run_survey_task(task) for task in tasks]
+
+    write_atomic(os.path.join(output_dir, 'batch_summary.json'),
+                 json.dumps(summaries, ensure_ascii=False, indent=2))
+    return summaries
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the SICAS analysis for every survey export in a directory')
+    parser.add_argument('input_dir', nargs='?', default='surveys',
+                        help='directory of <name>.csv exports, each with an optional <name>.json config and <name>.weights.csv weights')
+    parser.add_argument('output_dir', nargs='?', default='batch_output', help='one subdirectory per survey')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    print(f"Running surveys in '{args.input_dir}'...")
+    summaries = run_batch(args.input_dir, args.output_dir, args.jobs)
+
+    for summary in summaries:
+        detail = f"{summary.get('n_respondents', 0)} respondents" if summary['status'] == 'ok' else summary['error']
+        print(f"  {summary['name']}: {summary['status']} ({detail}, {summary['seconds']}s)")
+        if summary.get('missing_questions'):
+            print(f"    missing questions: {', '.join(summary['missing_questions'])}")
+
+    print(f"Batch complete! Per-survey outputs and 'batch_summary.json' saved in '{args.output_dir}/'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import matplotlib
+from sicas_analysis import load_data, clean_data, analyze_sicas, visualize_sicas, perform_demographic_analysis
+from significance_testing import build_contingency_cache, run_segment_tests
+from statistical_validation import map_questions_to_dimensions, reliability_analysis, validity_analysis, factor_analysis
+from polychoric import polychoric_correlation_matrix
+from survey_config import DEFAULT_QUESTIONS
+from survey_encoding import MULTISELECT_SEPARATOR, SKIP_MARKERS
+from survey_weighting import weighted_crosstab
+from instrumentation import _peak_rss_mb
+
+# Benchmark scales (rows) named in the performance plan
+DEFAULT_SCALES = [10_000, 1_000_000, 10_000_000]
+
+BENCHMARK_DIR = 'benchmarks'
+
+# Rows are generated and written in chunks so 10M-row files never sit in memory at once
+CHUNK_ROWS = 250_000
+
+# Share of answers redrawn from the column's marginal distribution instead of copied from the template respondent
+MIX_RATE = 0.3
+
+# Answers that drive survey routing are always copied with their template row, so skip patterns stay consistent
+ROUTING_QUESTIONS = [DEFAULT_QUESTIONS['purchase']]
+
+# Run-specific metadata columns: regenerated instead of resampled
+ROW_ID_COLUMN = '序号'
+
+def build_survey_model(raw_df):
+    """Per-column answer vocabularies and frequencies of the reference export (raw column names)"""
+    columns = []
+    cleaned_names = clean_data(raw_df.copy()).columns
+
+    for raw_name, clean_name in zip(raw_df.columns, cleaned_names):
+        codes, levels = pd.factorize(raw_df[raw_name], use_na_sentinel=False)
+        levels = np.asarray(levels, dtype=object)
+        column = {
+            'name': raw_name,
+            'codes': codes,
+            'levels': levels,
+            'probabilities': np.bincount(codes, minlength=len(levels)) / len(codes),
+            'routing': clean_name in ROUTING_QUESTIONS,
+            'options': None
+        }
+
+        # Multi-select answers are recombined from their options with the observed selection rates
+        answers = raw_df[raw_name].dropna().astype(str)
+        if answers.str.contains(MULTISELECT_SEPARATOR, regex=False).any():
+            selected = answers[~answers.isin(SKIP_MARKERS)].str.split(MULTISELECT_SEPARATOR)
+            options = pd.Series([option for answer in selected for option in answer]).value_counts()
+            column['options'] = np.asarray(options.index, dtype=object)
+            column['option_rates'] = (options / len(selected)).clip(upper=1).to_numpy()
+
+        columns.append(column)
+
+    return {'columns': columns, 'n_rows': len(raw_df)}
+
+def _recombine_multiselect(column, n, rng):
+    """Draw new multi-select answers: independent option choices, at least one option each"""
+    options = column['options']
+    chosen = rng.random((n, len(options))) < column['option_rates']
+    empty = ~chosen.any(axis=1)
+    chosen[empty, rng.integers(0, len(options), empty.sum())] = True
+
+    # Encode each combination as a bitmask and join every distinct combination only once
+    masks = chosen @ (1 << np.arange(len(options), dtype=np.int64))
+    unique_masks, inverse = np.unique(masks, return_inverse=True)
+    joined = np.array([MULTISELECT_SEPARATOR.join(options[(mask >> np.arange(len(options))) & 1 == 1])
+                       for mask in unique_masks], dtype=object)
+    return joined[inverse]
+
+def generate_chunk(model, n, rng, start_id=1, mix_rate=MIX_RATE):
+    """One chunk of synthetic respondents in the raw export layout"""
+    templates = rng.integers(0, model['n_rows'], n)
+    data = {}
+
+    for column in model['columns']:
+        if column['name'] == ROW_ID_COLUMN:
+            data[column['name']] = np.arange(start_id, start_id + n)
+            continue
+
+        values = column['levels'][column['codes'][templates]]
+        if not column['routing']:
+            fresh = rng.random(n) < mix_rate
+            if column['options'] is not None:
+                # Routed-away and blank answers stay with their template row
+                fresh &= ~pd.Series(values).isin(SKIP_MARKERS).to_numpy()
+                values[fresh] = _recombine_multiselect(column, fresh.sum(), rng)
+            else:
+                values[fresh] = column['levels'][rng.choice(len(column['levels']), fresh.sum(),
+                                                            p=column['probabilities'])]
+        data[column['name']] = values
+
+    return pd.DataFrame(data)
+
+def generate_synthetic_survey(path, n_rows, reference_path='data.csv', seed=42, chunk_rows=CHUNK_ROWS):
+    """Write a synthetic survey export with the reference layout and vocabularies, chunk by chunk"""
+    model = build_survey_model(load_data(reference_path))
+    rng = np.random.default_rng(seed)
+
+    temp_path = path + '.tmp'
+    written = 0
+    while written < n_rows:
+        n = min(chunk_rows, n_rows - written)
+        chunk = generate_chunk(model, n, rng, start_id=written + 1)
+        chunk.to_csv(temp_path, mode='w' if written == 0 else 'a', header=written == 0, index=False,
+                     encoding='utf-8')
+        written += n
+    os.replace(temp_path, path)
+    return path
+
+def measure(func, *args, repeat=1, **kwargs):
+    """Best-of-repeat wall and CPU time of a call, plus the process memory high-water mark; returns (result, timing)"""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = func(*args, **kwargs)
+        walls.append(time.perf_counter() - wall_start)
+        cpus.append(time.process_time() - cpu_start)
+    return result, {'wall_seconds': min(walls), 'cpu_seconds': min(cpus), 'peak_rss_mb': _peak_rss_mb()}
+
+def run_crosstabs(df):
+    """The crosstab workload: every demographic x SICAS table, the segment tests and a chart crosstab"""
+    cache = build_contingency_cache(df)
+    tests = run_segment_tests(df, cache=cache)
+    weighted_crosstab(df[DEFAULT_QUESTIONS['gender']], df[DEFAULT_QUESTIONS['awareness']], normalize='index')
+    return tests
+
+def run_statistical_validation(df):
+    """The statistical_validation pipeline without its report"""
+    items, dimensions = map_questions_to_dimensions(df)
+    reliability_analysis(items, dimensions)
+    polychoric_corr = polychoric_correlation_matrix(items, n_jobs=1)
+    validity_analysis(items, dimensions, polychoric_corr)
+    return factor_analysis(items, dimensions, polychoric_corr)
+
+def run_charts(results, df):
+    """SICAS and demographic chart rendering, in a scratch directory"""
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            os.makedirs('plots')
+            visualize_sicas(results)
+            perform_demographic_analysis(df)
+        finally:
+            os.chdir(previous_dir)
+
+def benchmark_file(path, repeat=1):
+    """Time every benchmarked stage on one survey file"""
+    timings = {}
+    raw, timings['load_data'] = measure(load_data, path, repeat=repeat)
+    df, timings['clean_data'] = measure(lambda: clean_data(raw.copy()), repeat=repeat)
+    results, timings['analyze_sicas'] = measure(analyze_sicas, df, repeat=repeat)
+    _, timings['crosstabs'] = measure(run_crosstabs, df, repeat=repeat)
+    _, timings['statistical_validation'] = measure(run_statistical_validation, df, repeat=repeat)
+    _, timings['charts'] = measure(run_charts, results, df, repeat=repeat)
+    return timings
+
+def environment_info():
+    """Versions and hardware the benchmark ran on, so stored results are comparable"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit or None
+    }
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=1, seed=42, data_dir=None):
+    """Generate (or reuse) a synthetic file per scale and time every stage on it"""
+    data_dir = data_dir or os.path.join(BENCHMARK_DIR, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+
+    results = {'created': datetime.now().isoformat(timespec='seconds'), 'environment': environment_info(),
+               'seed': seed, 'repeat': repeat, 'scales': {}}
+    for n_rows in scales:
+        path = os.path.join(data_dir, f'synthetic_{n_rows}_{seed}.csv')
+        if not os.path.exists(path):
+            print(f"Generating {n_rows:,} synthetic respondents...")
+            generate_synthetic_survey(path, n_rows, seed=seed)
+
+        print(f"Benchmarking {n_rows:,} rows...")
+        results['scales'][str(n_rows)] = benchmark_file(path, repeat)
+
+    return results
+
+def save_benchmark(results, path=None):
+    """Store a benchmark run as JSON under benchmarks/"""
+    if path is None:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        path = os.path.join(BENCHMARK_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+def compare_benchmarks(baseline, current, threshold=1.2, min_seconds=0.05):
+    """Wall-time ratios of current vs baseline per scale and stage
+
+    A stage regresses when it is slower than threshold times the baseline and by more than
+    min_seconds, so timer noise on millisecond stages is not reported.
+    """
+    records = []
+    for scale, stages in current['scales'].items():
+        for stage, timing in stages.items():
+            base = baseline['scales'].get(scale, {}).get(stage)
+            if base is None:
+                continue
+            ratio = timing['wall_seconds'] / base['wall_seconds'] if base['wall_seconds'] > 0 else np.nan
+            records.append({
+                'rows': int(scale),
+                'stage': stage,
+                'baseline_seconds': base['wall_seconds'],
+                'current_seconds': timing['wall_seconds'],
+                'ratio': ratio,
+                'regression': ratio > threshold and timing['wall_seconds'] - base['wall_seconds'] > min_seconds
+            })
+    return pd.DataFrame(records)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SICAS pipeline on synthetic surveys')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SCALES, help='synthetic survey sizes')
+    parser.add_argument('--repeat', type=int, default=1, help='best-of-N timing')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--compare', default=None, help='earlier benchmark JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2, help='slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.rows, args.repeat, args.seed)
+    path = save_benchmark(results)
+
+    for scale, stages in results['scales'].items():
+        print(f"\n{int(scale):,} rows")
+        for stage, timing in stages.items():
+            print(f"  {stage:<24} {timing['wall_seconds']:>9.3f}s wall {timing['cpu_seconds']:>9.3f}s CPU")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare_benchmarks(baseline, results, args.threshold)
+        print(f"\nComparison with {args.compare}:")
+        print(comparison.round(3).to_string(index=False))
+        if comparison['regression'].any():
+            print(f"Regressions (slower than {args.threshold}x): "
+                  f"{', '.join(comparison.loc[comparison['regression'], 'stage'].unique())}")
+
+    print(f"Benchmark complete! Results saved in '{path}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from sklearn.linear_model import LogisticRegression
+from sicas_analysis import load_data, clean_data, get_translated_label
+from significance_testing import SICAS_COLUMNS, STAGE_PASS_LEVELS
+from survey_config import response_masks
+from survey_encoding import MULTISELECT_QUESTIONS, encode_multiselect, collapse_write_ins
+from survey_weighting import respondent_weights
+from thesis_enhancements import ARCTERYX_COLORS
+from instrumentation import timed
+
+# Create output directory
+if not os.path.exists('attribution_plots'):
+    os.makedirs('attribution_plots')
+
+# Outcomes channels are credited for: name -> SICAS stage (passing answers as in the funnel)
+ATTRIBUTION_OUTCOMES = {
+    'interest': 'attraction',
+    'interaction': 'interaction',
+    'purchase': 'purchase'
+}
+
+# Inverse regularization strength of the uplift model (mild: the design is a few 0/1 columns)
+UPLIFT_C = 1.0
+
+@timed
+def channel_combinations(df, weights=None):
+    """Distinct contact-channel combinations with their (weighted) respondent and outcome counts
+
+    Every respondent's channels are packed into one bitmask, so all later work is per distinct
+    combination instead of per respondent. Only respondents who answered the channel question
+    and every outcome question are counted. Write-in channels are merged into the 'other' option.
+    """
+    column = MULTISELECT_QUESTIONS['contact_channels']
+    if column not in df.columns:
+        raise ValueError(f"Contact channel question missing from the survey: {column}")
+
+    base = response_masks(df)['base']
+    keep = base['contact_channels'].to_numpy().copy()
+    for stage in ATTRIBUTION_OUTCOMES.values():
+        keep &= base[stage].to_numpy()
+
+    indicator, channels = collapse_write_ins(*encode_multiselect(df[column]))
+    if len(channels) > 62:
+        raise ValueError(f"{len(channels)} channels do not fit a 64-bit combination mask")
+    masks = indicator[keep] @ (1 << np.arange(len(channels), dtype=np.int64))
+
+    weights = respondent_weights(df, weights)
+    row_weights = weights.to_numpy()[keep] if weights is not None else np.ones(keep.sum())
+
+    combinations, inverse = np.unique(masks, return_inverse=True)
+    counts = pd.DataFrame({'mask': combinations,
+                           'respondents': np.bincount(inverse, weights=row_weights, minlength=len(combinations))})
+    for outcome, stage in ATTRIBUTION_OUTCOMES.items():
+        passed = df[SICAS_COLUMNS[stage]].isin(STAGE_PASS_LEVELS[stage]).to_numpy()[keep]
+        counts[outcome] = np.bincount(inverse, weights=row_weights * passed, minlength=len(combinations))
+
+    exposure = ((combinations[:, None] >> np.arange(len(channels))) & 1).astype(np.float64)
+    counts['n_channels'] = exposure.sum(axis=1).astype(int)
+    return counts, exposure, channels
+
+def shapley_attribution(conversions, exposure):
+    """Conversions credited to each channel by the Shapley value of the additive conversion game
+
+    With v(S) the conversions of respondents reached only through channels in S, v is a sum of
+    unanimity games, one per combination, so the Shapley value splits each combination's
+    conversions equally between its channels.
+    """
+    n_channels = exposure.sum(axis=1)
+    shares = np.divide(conversions, n_channels, out=np.zeros_like(conversions), where=n_channels > 0)
+    return exposure.T @ shares
+
+def logistic_uplift(exposure, respondents, conversions):
+    """Average marginal effect of each channel on the respondents it reached, from a grouped logistic model
+
+    The model is fitted on one success and one failure row per combination, weighted by their
+    counts. A channel's uplift compares every combination containing it with the same
+    combination without it.
+    """
+    X = np.vstack([exposure, exposure])
+    y = np.r_[np.ones(len(exposure)), np.zeros(len(exposure))]
+    sample_weight = np.r_[conversions, respondents - conversions]
+    present = sample_weight > 0
+
+    model = LogisticRegression(C=UPLIFT_C, max_iter=1000)
+    model.fit(X[present], y[present], sample_weight=sample_weight[present])
+
+    probability = model.predict_proba(exposure)[:, 1]
+    uplift = np.zeros(exposure.shape[1])
+    for j in range(exposure.shape[1]):
+        reached = exposure[:, j] > 0
+        if not reached.any() or respondents[reached].sum() == 0:
+            continue
+        without = exposure[reached].copy()
+        without[:, j] = 0
+        effect = probability[reached] - model.predict_proba(without)[:, 1]
+        uplift[j] = np.average(effect, weights=respondents[reached])
+    return uplift, np.exp(model.coef_[0])
+
+@timed
+def analyze_channel_attribution(df, weights=None):
+    """Each contact channel's contribution to interest, interaction and purchase
+
+    Per outcome and channel: respondents reached, the outcome rate among them, Shapley-credited
+    conversions and their share, and the logistic uplift (average marginal effect on the reached
+    respondents) with the incremental conversions it implies. Cost depends on the number of
+    distinct channel combinations, not respondents.
+    """
+    combinations, exposure, channels = channel_combinations(df, weights)
+    respondents = combinations['respondents'].to_numpy()
+    reached = exposure.T @ respondents
+
+    attribution = {}
+    for outcome in ATTRIBUTION_OUTCOMES:
+        conversions = combinations[outcome].to_numpy()
+        credited = shapley_attribution(conversions, exposure)
+        uplift, odds_ratios = logistic_uplift(exposure, respondents, conversions)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            attribution[outcome] = pd.DataFrame({
+                'channel': channels,
+                'reached': reached,
+                'outcome_rate': (exposure.T @ conversions) / reached,
+                'shapley_conversions': credited,
+                'shapley_share': credited / conversions.sum(),
+                'uplift': uplift,
+                'incremental_conversions': uplift * reached,
+                'odds_ratio': odds_ratios
+            }).sort_values('shapley_conversions', ascending=False, ignore_index=True)
+
+    return {
+        'channels': channels,
+        'attribution': attribution,
+        'combinations': combinations,
+        'n_combinations': len(combinations),
+        'n_respondents': float(respondents.sum())
+    }
+
+@timed
+def plot_channel_attribution(results, outcome='purchase'):
+    """Shapley share and logistic uplift of each channel for one outcome"""
+    table = results['attribution'][outcome].iloc[::-1]
+    labels = [get_translated_label(channel) for channel in table['channel']]
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 7), sharey=True)
+    axes[0].barh(labels, table['shapley_share'], color=ARCTERYX_COLORS[0])
+    axes[0].set_title(f'Shapley share of {outcome}', fontsize=14)
+    axes[0].set_xlabel('Share of credited conversions', fontsize=12)
+    axes[1].barh(labels, table['uplift'], color=np.where(table['uplift'] >= 0, ARCTERYX_COLORS[1], ARCTERYX_COLORS[5]))
+    axes[1].axvline(0, color='black', linewidth=0.5)
+    axes[1].set_title(f'Logistic uplift on {outcome} rate', fontsize=14)
+    axes[1].set_xlabel('Change in probability for reached respondents', fontsize=12)
+    plt.tight_layout()
+    plt.savefig(f'attribution_plots/channel_attribution_{outcome}.png', dpi=300)
+    plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Attribute interest, interaction and purchase to brand contact channels')
+    parser.parse_args()
+
+    print("Loading data for channel attribution...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Attributing outcomes to contact channels...")
+    results = analyze_channel_attribution(df)
+    print(f"{results['n_respondents']:.0f} respondents in {results['n_combinations']} distinct channel combinations")
+
+    columns = ['channel', 'reached', 'outcome_rate', 'shapley_share', 'uplift', 'incremental_conversions']
+    for outcome, table in results['attribution'].items():
+        shown = table[columns].copy()
+        shown['channel'] = shown['channel'].map(get_translated_label)
+        print(f"\nAttribution of {outcome}:")
+        print(shown.round(3).to_string(index=False))
+        plot_channel_attribution(results, outcome)
+
+    print("Channel attribution complete! Charts saved in 'attribution_plots/' directory.")
+
+if __name__ == "__main__":
+    main()
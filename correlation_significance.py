@@ -0,0 +1,390 @@
+import argparse
+import numpy as np
+import pandas as pd
+from scipy import stats
+from sicas_analysis import load_data, clean_data
+from polychoric import (RHO_BOUND, THRESHOLD_BOUND, ordinal_category_codes, estimate_thresholds, contingency_tables,
+                        bivariate_normal_cdf, bivariate_normal_density, cell_differences, fit_polychoric_pair,
+                        nearest_correlation_matrix)
+from significance_testing import benjamini_hochberg
+from survey_encoding import LIKERT_REGISTRY, encode_likert_items, item_correlation_matrix, dimension_scores
+from instrumentation import timed
+
+# Replicates of the permutation test and the bootstrap
+DEFAULT_REPLICATES = 10_000
+
+# Cells with a Benjamini-Hochberg q-value at or above this level are masked in the heatmaps
+SIGNIFICANCE_LEVEL = 0.05
+
+# Bootstrap replicates evaluated per matrix product (bounds the replicates x patterns count matrix)
+BOOTSTRAP_CHUNK = 1000
+BOOTSTRAP_CELLS = 10_000_000
+
+# Correlations at which permuted tables are fitted in the polychoric permutation test (step 0.005)
+RHO_GRID = np.linspace(-RHO_BOUND, RHO_BOUND, 399)
+
+# Fisher scoring steps for the polychoric bootstrap replicates, and their convergence tolerance
+MAX_SCORING_STEPS = 20
+SCORING_TOLERANCE = 1e-6
+
+# From this many respondents on, resample counts are drawn as independent Poisson counts (the
+# Poisson bootstrap): indistinguishable from the multinomial at that size and about twice as fast
+POISSON_BOOTSTRAP_MIN = 10_000
+
+def discrete_codes(matrix):
+    """Distinct values of every column and each respondent's index into them (-1 = missing)"""
+    codes = np.full(matrix.shape, -1, dtype=np.int64)
+    values = []
+    for j in range(matrix.shape[1]):
+        observed = ~np.isnan(matrix[:, j])
+        levels, inverse = np.unique(matrix[observed, j], return_inverse=True)
+        codes[observed, j] = inverse
+        values.append(levels.astype(np.float64))
+    return codes, values
+
+def table_correlations(tables, x, y):
+    """Pearson correlation of every (replicates x len(x) x len(y)) contingency table with the given scores"""
+    n = tables.sum(axis=(1, 2))
+    rows, cols = tables.sum(axis=2), tables.sum(axis=1)
+    mean_x, mean_y = rows @ x / n, cols @ y / n
+    var_x, var_y = rows @ x ** 2 / n - mean_x ** 2, cols @ y ** 2 / n - mean_y ** 2
+    # All cross products at once: flattened tables times the flattened score outer product
+    cross = tables.reshape(len(tables), -1) @ np.outer(x, y).ravel() / n - mean_x * mean_y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cross / np.sqrt(var_x * var_y)
+
+def permutation_tables(table, n_replicates, rng):
+    """Contingency tables of n_replicates random permutations of one variable against the other
+
+    Permuting a column only matters through the table it produces with the other column, and
+    those tables are multivariate hypergeometric given the two margins. They are drawn cell by
+    cell for all replicates at once, so the cost does not grow with the number of respondents.
+    """
+    row_totals, col_totals = table.sum(axis=1), table.sum(axis=0)
+    tables = np.zeros((n_replicates,) + table.shape, dtype=np.int64)
+    remaining = np.tile(col_totals, (n_replicates, 1))
+
+    for a, row_total in enumerate(row_totals[:-1]):
+        left = np.full(n_replicates, row_total)
+        for b in range(len(col_totals) - 1):
+            rest = remaining[:, b + 1:].sum(axis=1)
+            tables[:, a, b] = rng.hypergeometric(remaining[:, b], rest, left)
+            left -= tables[:, a, b]
+        tables[:, a, -1] = left
+        remaining -= tables[:, a]
+    tables[:, -1] = remaining
+    return tables
+
+def response_patterns(codes, weights=None):
+    """Distinct rows of the code matrix (and respondent weight), how many respondents share each, and the weight"""
+    keys = np.zeros(len(codes), dtype=np.int64)
+    for j in range(codes.shape[1]):
+        # Refactorize after every column so the combined key never overflows
+        keys, _ = pd.factorize(keys * (codes[:, j].max() + 2) + codes[:, j] + 1)
+    if weights is not None:
+        weight_codes, _ = pd.factorize(weights)
+        keys, _ = pd.factorize(keys * (weight_codes.max() + 1) + weight_codes)
+    _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    unit_weights = weights[first] if weights is not None else np.ones(len(first))
+    return codes[first], counts, unit_weights
+
+def resample_chunks(n_replicates, n_patterns):
+    """Replicates per chunk, so that one chunk's count matrix stays within BOOTSTRAP_CELLS"""
+    size = max(1, min(BOOTSTRAP_CHUNK, BOOTSTRAP_CELLS // n_patterns))
+    return [min(size, n_replicates - start) for start in range(0, n_replicates, size)]
+
+def resample_counts(frequencies, size, rng):
+    """Bootstrap count vectors over the distinct patterns: multinomial, or Poisson on large panels"""
+    n = frequencies.sum()
+    if n >= POISSON_BOOTSTRAP_MIN:
+        return rng.poisson(frequencies, size=(size, len(frequencies))).astype(np.float64)
+    return rng.multinomial(n, frequencies / n, size=size).astype(np.float64)
+
+def bootstrap_correlations(codes, values, n_replicates, rng, weights=None):
+    """Pairwise-complete (weighted) Pearson correlations of every column pair in n_replicates bootstrap resamples
+
+    A resample of respondents is a multinomial (on large panels, Poisson) count vector over the
+    distinct response patterns, so every replicate's sufficient statistics for all pairs come from one matrix product of the
+    stacked counts with the per-pattern products. With weights, patterns are also split by weight
+    and each resampled respondent counts with its weight.
+    """
+    patterns, frequencies, unit_weights = response_patterns(codes, weights)
+    first, second = np.triu_indices(codes.shape[1], k=1)
+
+    observed = (patterns >= 0).astype(np.float64)
+    scores = np.column_stack([values[j][np.maximum(patterns[:, j], 0)] for j in range(codes.shape[1])]) * observed
+    x, y = scores[:, first], scores[:, second]
+    both = observed[:, first] * observed[:, second]
+    features = np.hstack([both, x * both, y * both, x ** 2 * both, y ** 2 * both, x * y * both])
+
+    replicates = []
+    for size in resample_chunks(n_replicates, len(frequencies)):
+        counts = resample_counts(frequencies, size, rng) * unit_weights
+        pairs, sum_x, sum_y, sum_xx, sum_yy, sum_xy = np.split(counts @ features, 6, axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            replicates.append((pairs * sum_xy - sum_x * sum_y) /
+                              np.sqrt((pairs * sum_xx - sum_x ** 2) * (pairs * sum_yy - sum_y ** 2)))
+    return np.vstack(replicates)
+
+def bootstrap_p_values(replicates):
+    """Two-sided bootstrap p-values of a zero correlation: twice the smaller share of replicates on either side of zero"""
+    valid = ~np.isnan(replicates)
+    below = ((replicates <= 0) & valid).sum(axis=0)
+    above = ((replicates >= 0) & valid).sum(axis=0)
+    return np.minimum(1.0, 2 * (np.minimum(below, above) + 1) / (valid.sum(axis=0) + 1))
+
+def grid_polychoric(tables, row_thresholds, col_thresholds):
+    """Polychoric correlations of stacked tables with fixed thresholds
+
+    The log-likelihood of every table is evaluated on RHO_GRID with one matrix product, and the
+    best grid point is refined by a parabola through its neighbours.
+    """
+    h, k = np.meshgrid(row_thresholds, col_thresholds, indexing='ij')
+    probabilities = cell_differences(bivariate_normal_cdf(h, k, RHO_GRID[:, None, None]))
+    log_likelihood = tables.reshape(len(tables), -1) @ np.log(np.maximum(probabilities, 1e-300)).reshape(len(RHO_GRID), -1).T
+
+    best = np.clip(log_likelihood.argmax(axis=1), 1, len(RHO_GRID) - 2)
+    rows = np.arange(len(tables))
+    left, centre, right = log_likelihood[rows, best - 1], log_likelihood[rows, best], log_likelihood[rows, best + 1]
+    curvature = left - 2 * centre + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(curvature < 0, np.clip(0.5 * (left - right) / curvature, -1, 1), 0.0)
+    return np.clip(RHO_GRID[best] + offset * (RHO_GRID[1] - RHO_GRID[0]), -RHO_BOUND, RHO_BOUND)
+
+def replicate_thresholds(marginals):
+    """Latent thresholds of one item in every replicate from its (replicates x categories) marginal counts"""
+    cumulative = np.cumsum(marginals, axis=1)[:, :-1] / marginals.sum(axis=1, keepdims=True)
+    inner = np.clip(stats.norm.ppf(cumulative), -THRESHOLD_BOUND, THRESHOLD_BOUND)
+    bound = np.full((len(marginals), 1), THRESHOLD_BOUND)
+    return np.hstack([-bound, inner, bound])
+
+def scoring_polychoric(tables, row_thresholds, col_thresholds, start):
+    """Polychoric correlations of stacked tables, each with its own thresholds, by Fisher scoring from start"""
+    # Only the inner thresholds need the bivariate integral: on the outer (infinite) bounds the
+    # CDF is a univariate margin or 0 / 1, and the density vanishes
+    h, k = np.broadcast_arrays(row_thresholds[:, 1:-1, None], col_thresholds[:, None, 1:-1])
+    cdf = np.zeros(tables.shape[:1] + (row_thresholds.shape[1], col_thresholds.shape[1]))
+    cdf[:, 1:-1, -1] = stats.norm.cdf(row_thresholds[:, 1:-1])
+    cdf[:, -1, 1:-1] = stats.norm.cdf(col_thresholds[:, 1:-1])
+    cdf[:, -1, -1] = 1
+    density = np.zeros_like(cdf)
+    n = tables.sum(axis=(1, 2))
+    rho = np.full(len(tables), start)
+
+    for _ in range(MAX_SCORING_STEPS):
+        r = rho[:, None, None]
+        cdf[:, 1:-1, 1:-1] = bivariate_normal_cdf(h, k, r)
+        density[:, 1:-1, 1:-1] = bivariate_normal_density(h, k, r)
+        probabilities = np.clip(cell_differences(cdf), 1e-12, None)
+        # d P(cell) / d rho: the bivariate density differenced over the cell corners
+        slopes = cell_differences(density)
+        score = (tables * slopes / probabilities).sum(axis=(1, 2))
+        information = n * (slopes ** 2 / probabilities).sum(axis=(1, 2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(information > 0, score / information, 0.0)
+        rho = np.clip(rho + step, -RHO_BOUND, RHO_BOUND)
+        if np.abs(step).max() < SCORING_TOLERANCE:
+            break
+    return rho
+
+def bootstrap_polychoric(codes, n_categories, start, n_replicates, rng, weights=None):
+    """Polychoric correlations of every item pair in n_replicates bootstrap resamples
+
+    Resamples are count vectors over the distinct response patterns, as for the Pearson bootstrap.
+    Each resample re-estimates the thresholds from its own margins and refits every pair by
+    Fisher scoring from the full-sample estimate, all replicates of a chunk at once.
+    """
+    patterns, frequencies, unit_weights = response_patterns(codes, weights)
+    first, second = np.triu_indices(codes.shape[1], k=1)
+    one_hot = [(patterns[:, j][:, None] == np.arange(k)).astype(np.float64) for j, k in enumerate(n_categories)]
+    cells = {(i, j): (one_hot[i][:, :, None] * one_hot[j][:, None, :]).reshape(len(patterns), -1)
+             for i, j in zip(first, second)}
+
+    replicates = []
+    for size in resample_chunks(n_replicates, len(frequencies)):
+        counts = resample_counts(frequencies, size, rng) * unit_weights
+        thresholds = [replicate_thresholds(counts @ indicator) for indicator in one_hot]
+        estimates = np.full((size, len(first)), np.nan)
+        for p, (i, j) in enumerate(zip(first, second)):
+            if np.isnan(start[i, j]):
+                continue
+            tables = (counts @ cells[(i, j)]).reshape(size, n_categories[i], n_categories[j])
+            estimates[:, p] = scoring_polychoric(tables, thresholds[i], thresholds[j], start[i, j])
+        replicates.append(estimates)
+    return np.vstack(replicates)
+
+def significance_results(labels, corr, p_values, replicates, confidence, method, test):
+    """Result frames: the correlation, p-values, Benjamini-Hochberg q-values and bootstrap percentile intervals"""
+    n_columns = len(labels)
+    upper = np.triu_indices(n_columns, k=1)
+    q_values = np.full((n_columns, n_columns), np.nan)
+    q_values[upper] = benjamini_hochberg(p_values[upper])
+    q_values.T[upper] = q_values[upper]
+
+    tail = (1 - confidence) / 2
+    lower, upper_bound = np.eye(n_columns), np.eye(n_columns)
+    with np.errstate(invalid='ignore'):
+        lower[upper] = np.nanquantile(replicates, tail, axis=0)
+        upper_bound[upper] = np.nanquantile(replicates, 1 - tail, axis=0)
+    lower.T[upper], upper_bound.T[upper] = lower[upper], upper_bound[upper]
+
+    frame = lambda data: pd.DataFrame(data, index=labels, columns=labels)
+    return {
+        'correlation': frame(corr),
+        'p_value': frame(p_values),
+        'q_value': frame(q_values),
+        'ci_lower': frame(lower),
+        'ci_upper': frame(upper_bound),
+        'n_replicates': len(replicates),
+        'method': method,
+        'test': test
+    }
+
+@timed
+def correlation_significance(matrix, labels, n_replicates=DEFAULT_REPLICATES, confidence=0.95, seed=42, weights=None):
+    """Permutation p-values, FDR q-values and bootstrap intervals for every cell of a Pearson correlation matrix
+
+    The tested statistic is the pairwise-complete Pearson correlation of the (discrete) answer
+    codes. Intervals are bootstrap percentile intervals. Columns are treated as discrete, which
+    keeps the cost independent of the number of respondents. With respondent weights the
+    correlations are weighted; respondents are then not exchangeable, so p-values come from the
+    bootstrap distribution instead of permutations.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    codes, values = discrete_codes(matrix)
+    corr = item_correlation_matrix(matrix, weights=weights)
+    n_columns = matrix.shape[1]
+
+    p_values = np.full((n_columns, n_columns), np.nan)
+    if weights is None:
+        for i, j in zip(*np.triu_indices(n_columns, k=1)):
+            if np.isnan(corr[i, j]):
+                continue
+            valid = (codes[:, i] >= 0) & (codes[:, j] >= 0)
+            table = np.bincount(codes[valid, i] * len(values[j]) + codes[valid, j],
+                                minlength=len(values[i]) * len(values[j])).reshape(len(values[i]), len(values[j]))
+            permuted = table_correlations(permutation_tables(table, n_replicates, rng), values[i], values[j])
+            # Two-sided, counting the observed table as one of the permutations
+            exceed = (np.abs(permuted) >= abs(corr[i, j]) - 1e-12).sum()
+            p_values[i, j] = p_values[j, i] = (exceed + 1) / (n_replicates + 1)
+
+    replicates = bootstrap_correlations(codes, values, n_replicates, rng, weights)
+    if weights is not None:
+        upper = np.triu_indices(n_columns, k=1)
+        p_values[upper] = bootstrap_p_values(replicates)
+        p_values.T[upper] = p_values[upper]
+
+    return significance_results(labels, corr, p_values, replicates, confidence, 'Pearson',
+                                'permutation' if weights is None else 'bootstrap')
+
+@timed
+def polychoric_significance(matrix, labels, n_replicates=DEFAULT_REPLICATES, confidence=0.95, seed=42, weights=None):
+    """Permutation p-values, FDR q-values and bootstrap intervals for every cell of a polychoric correlation matrix
+
+    The correlation is the (pseudo-)maximum-likelihood polychoric matrix of the ordinal items, as
+    from polychoric_correlation_matrix. Permuting one item keeps both margins and so both sets of
+    thresholds, so each permuted table is refitted on a correlation grid. The bootstrap refits the
+    estimator itself, thresholds included, so the intervals belong to the polychoric estimates.
+    With respondent weights, p-values come from the bootstrap distribution instead of permutations.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    codes, n_categories = ordinal_category_codes(matrix)
+    thresholds = estimate_thresholds(codes, n_categories, weights)
+    n_columns = matrix.shape[1]
+
+    corr = np.eye(n_columns)
+    p_values = np.full((n_columns, n_columns), np.nan)
+    for (i, j), table in contingency_tables(codes, n_categories, weights).items():
+        corr[i, j] = corr[j, i] = fit_polychoric_pair(table, thresholds[i], thresholds[j])
+        if weights is not None or np.isnan(corr[i, j]):
+            continue
+        permuted = grid_polychoric(permutation_tables(table.astype(np.int64), n_replicates, rng),
+                                   thresholds[i], thresholds[j])
+        # The observed table goes through the same grid fit, so both sides of the comparison match
+        observed = grid_polychoric(table[None].astype(np.float64), thresholds[i], thresholds[j])[0]
+        exceed = (np.abs(permuted) >= abs(observed) - 1e-12).sum()
+        p_values[i, j] = p_values[j, i] = (exceed + 1) / (n_replicates + 1)
+
+    replicates = bootstrap_polychoric(codes, n_categories, corr, n_replicates, rng, weights)
+    if weights is not None:
+        upper = np.triu_indices(n_columns, k=1)
+        p_values[upper] = bootstrap_p_values(replicates)
+        p_values.T[upper] = p_values[upper]
+
+    # The same smoothing as polychoric_correlation_matrix, so the reported matrix is the one shown
+    if not np.isnan(corr).any():
+        corr = nearest_correlation_matrix(corr)
+
+    return significance_results(labels, corr, p_values, replicates, confidence, 'polychoric',
+                                'permutation' if weights is None else 'bootstrap')
+
+def subset_significance(significance, keys, labels=None):
+    """The cells of a significance result for a subset of its columns, relabelled if labels are given
+
+    q-values are recomputed within the subset, which is the family of correlations shown;
+    p-values and intervals do not depend on the other columns.
+    """
+    frames = {key: significance[key].loc[keys, keys] for key in ('correlation', 'p_value', 'ci_lower', 'ci_upper')}
+    p_values = frames['p_value'].to_numpy()
+    upper = np.triu_indices(len(keys), k=1)
+    q_values = np.full(p_values.shape, np.nan)
+    q_values[upper] = benjamini_hochberg(p_values[upper])
+    q_values.T[upper] = q_values[upper]
+    frames['q_value'] = pd.DataFrame(q_values, index=keys, columns=keys)
+
+    if labels is not None:
+        frames = {key: frame.set_axis(labels, axis=0).set_axis(labels, axis=1) for key, frame in frames.items()}
+    return {**significance, **frames}
+
+def nonsignificant_mask(significance, alpha=SIGNIFICANCE_LEVEL):
+    """Heatmap mask (True = hidden) of the off-diagonal cells that are not significant after the FDR correction"""
+    q_values = significance['q_value'].to_numpy()
+    mask = ~(q_values < alpha)
+    np.fill_diagonal(mask, False)
+    return mask
+
+def significance_table(significance):
+    """One row per column pair: correlation, bootstrap interval, permutation p-value and q-value"""
+    labels = significance['correlation'].index
+    first, second = np.triu_indices(len(labels), k=1)
+    return pd.DataFrame({
+        'variable_1': labels[first],
+        'variable_2': labels[second],
+        **{key: significance[key].to_numpy()[first, second]
+           for key in ['correlation', 'ci_lower', 'ci_upper', 'p_value', 'q_value']}
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description='Permutation and bootstrap significance of the SICAS correlation matrices')
+    parser.add_argument('--replicates', type=int, default=DEFAULT_REPLICATES, help='permutations and bootstrap resamples')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print("Loading data for correlation significance...")
+    df = load_data()
+    df = clean_data(df)
+
+    print(f"Testing polychoric item correlations with {args.replicates} replicates...")
+    items = encode_likert_items(df)
+    labels = [LIKERT_REGISTRY[code]['label'] for code in items['codes']]
+    item_significance = polychoric_significance(items['matrix'], labels, args.replicates, seed=args.seed)
+    print(significance_table(item_significance).round(4).to_string(index=False))
+
+    print("\nTesting (Pearson) dimension score correlations...")
+    dimensions = {}
+    for code in items['codes']:
+        dimensions.setdefault(LIKERT_REGISTRY[code]['dimension'], {'codes': []})['codes'].append(code)
+    scores, score_names = dimension_scores(items, dimensions)
+    dimension_significance = correlation_significance(scores, score_names, args.replicates, seed=args.seed)
+    print(significance_table(dimension_significance).round(4).to_string(index=False))
+
+    print("Correlation significance complete!")
+
+if __name__ == "__main__":
+    main()
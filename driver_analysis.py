@@ -0,0 +1,302 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import factorial
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from scipy import linalg, sparse
+from sicas_analysis import load_data, clean_data, get_translated_label
+from survey_config import survey_routing
+from survey_encoding import LIKERT_REGISTRY, MULTISELECT_QUESTIONS, encode_likert_items, encode_multiselect, collapse_write_ins
+from survey_weighting import respondent_weights
+from thesis_enhancements import ARCTERYX_COLORS
+from instrumentation import timed
+
+# Create output directory
+if not os.path.exists('driver_plots'):
+    os.makedirs('driver_plots')
+
+# Outcomes whose drivers are decomposed: name -> Likert registry code
+DRIVER_TARGETS = {
+    'satisfaction': 'S2',
+    'purchase': 'A1'
+}
+
+# Likert predictors. The DRIVER_TARGETS outcomes are never predictors: explaining satisfaction by
+# purchase and purchase by satisfaction is circular
+DRIVER_ITEMS = ['S1', 'I1', 'C1', 'C2']
+
+# Exact decomposition fits every subset of predictors; beyond this the 2^p sub-models are impractical
+MAX_PREDICTORS = 20
+
+# Sub-models per process pool task
+CHUNK_SUBMODELS = 256
+
+def driver_questions(config=None):
+    """Multi-select questions used as predictors; routed questions only repeat their routing answer"""
+    routed = set(survey_routing(config))
+    return [key for key in MULTISELECT_QUESTIONS if key not in routed]
+
+@timed
+def build_driver_columns(df, target, weights=None):
+    """Target and predictor columns of the respondents who answered the target, as one sparse matrix
+
+    Column 0 is the target; Likert predictors follow (missing answers set to the item mean, as in
+    the purchase model), then the 0/1 options of every multi-select predictor question, with
+    write-ins collapsed into the 'other' option.
+    """
+    code = DRIVER_TARGETS[target]
+    target_items = encode_likert_items(df, [code])
+    if not target_items['codes']:
+        raise ValueError(f"Target question not found in the survey data: {LIKERT_REGISTRY[code]['question']}")
+    keep = ~target_items['missing'][:, 0]
+
+    weights = respondent_weights(df, weights)
+    row_weights = weights.to_numpy()[keep] if weights is not None else np.ones(keep.sum())
+
+    items = encode_likert_items(df, DRIVER_ITEMS)
+    likert = items['matrix'][keep].astype(np.float64)
+    likert = np.where(items['missing'][keep], np.nanmean(likert, axis=0), likert)
+
+    blocks = [sparse.csr_matrix(target_items['matrix'][keep].astype(np.float64)), sparse.csr_matrix(likert)]
+    columns = [{'predictor': LIKERT_REGISTRY[item]['label'], 'question': item, 'kind': 'likert'}
+               for item in items['codes']]
+
+    for key in driver_questions():
+        column = MULTISELECT_QUESTIONS[key]
+        if column not in df.columns:
+            continue
+        indicator, options = collapse_write_ins(*encode_multiselect(df[column]))
+        blocks.append(indicator[keep].astype(np.float64))
+        columns.extend({'predictor': option, 'question': key, 'kind': 'multiselect'} for option in options)
+
+    return sparse.hstack(blocks, format='csr'), row_weights, pd.DataFrame(columns)
+
+def weighted_correlations(matrix, weights):
+    """Weighted Pearson correlations of the columns of a sparse matrix, from its weighted cross-products"""
+    total = weights.sum()
+    means = np.asarray(matrix.T @ weights).ravel() / total
+    cross = np.asarray((matrix.T @ sparse.diags(weights) @ matrix).todense()) / total
+    covariance = cross - np.outer(means, means)
+    std = np.sqrt(np.clip(np.diag(covariance), 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return covariance / np.outer(std, std), std
+
+def independent_columns(corr, tolerance=1e-8):
+    """Positions of a maximal set of linearly independent columns, in their original order
+
+    Rare options picked by exactly the same respondents are duplicates; keeping both would make
+    every sub-model containing them singular.
+    """
+    _, R, pivots = linalg.qr(corr, pivoting=True)
+    diagonal = np.abs(np.diag(R))
+    rank = int((diagonal > tolerance * diagonal[0]).sum()) if len(diagonal) else 0
+    return np.sort(pivots[:rank])
+
+def popcounts(masks, n_bits):
+    """Number of set bits of every mask"""
+    return sum((masks >> bit) & 1 for bit in range(n_bits))
+
+def subset_r_squared(corr, groups, masks):
+    """R² of the regression of column 0 on every subset of predictor groups (bit j = group j included)"""
+    r_squared = np.zeros(len(masks))
+    for i, mask in enumerate(masks):
+        columns = [c for j, group in enumerate(groups) if mask >> j & 1 for c in group]
+        if not columns:
+            continue
+        r = corr[columns, 0]
+        block = corr[np.ix_(columns, columns)]
+        try:
+            beta = np.linalg.solve(block, r)
+        except np.linalg.LinAlgError:
+            beta = np.linalg.lstsq(block, r, rcond=None)[0]
+        r_squared[i] = r @ beta
+    return r_squared
+
+# Worker-process state, set once per worker so the correlation matrix is not re-sent per chunk
+_WORKER_DATA = {}
+
+def _init_worker(corr, groups):
+    """Store the shared correlation matrix and predictor groups in the worker process"""
+    _WORKER_DATA['corr'] = corr
+    _WORKER_DATA['groups'] = groups
+
+def _fit_submodels(bounds):
+    """Process pool entry point for one range of sub-model masks"""
+    start, stop = bounds
+    return subset_r_squared(_WORKER_DATA['corr'], _WORKER_DATA['groups'], np.arange(start, stop))
+
+@timed
+def all_submodels(corr, groups, n_jobs=None):
+    """R² of all 2^p sub-models, fitted in chunks across a process pool"""
+    n_models = 1 << len(groups)
+    chunks = [(start, min(start + CHUNK_SUBMODELS, n_models)) for start in range(0, n_models, CHUNK_SUBMODELS)]
+
+    if n_jobs is None:
+        n_jobs = min(len(chunks), os.cpu_count() or 1)
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(corr, groups)) as executor:
+            results = list(executor.map(_fit_submodels, chunks))
+    else:
+        _init_worker(corr, groups)
+        results = [_fit_submodels(chunk) for chunk in chunks]
+
+    return np.concatenate(results)
+
+def dominance_statistics(r_squared, n_predictors):
+    """Shapley values, conditional dominance (mean R² gain by subset size) and complete dominance
+
+    The Shapley value of a predictor is its R² gain averaged over every order of entry, which
+    equals Budescu's general dominance: the mean of its conditional dominance over subset sizes.
+    """
+    p = n_predictors
+    masks = np.arange(1 << p)
+    sizes = popcounts(masks, p)
+    order_weights = np.array([factorial(s) * factorial(p - s - 1) / factorial(p) for s in range(p)])
+
+    shapley = np.zeros(p)
+    conditional = np.zeros((p, p))
+    for j in range(p):
+        without = masks[(masks >> j) & 1 == 0]
+        gains = r_squared[without | (1 << j)] - r_squared[without]
+        shapley[j] = (order_weights[sizes[without]] * gains).sum()
+        conditional[j] = np.bincount(sizes[without], weights=gains, minlength=p) / np.bincount(sizes[without], minlength=p)
+
+    # i completely dominates j when adding i beats adding j to every subset containing neither
+    complete = np.zeros((p, p), dtype=bool)
+    for i in range(p):
+        for j in range(p):
+            if i != j:
+                neither = masks[((masks >> i) & 1 == 0) & ((masks >> j) & 1 == 0)]
+                complete[i, j] = np.all(r_squared[neither | (1 << i)] > r_squared[neither | (1 << j)])
+
+    return shapley, conditional, complete
+
+@timed
+def analyze_drivers(df, target='satisfaction', question=None, weights=None, n_jobs=None):
+    """Exact Shapley / dominance decomposition of the target's R² over its predictors
+
+    By default every Likert item is one predictor and every multi-select question one predictor
+    group (all of its options); constant and duplicated option columns are dropped first. With question set, the options of that multi-select question are
+    the predictors. All 2^p sub-models are linear regressions solved from one precomputed
+    correlation matrix.
+    """
+    matrix, row_weights, columns = build_driver_columns(df, target, weights)
+    corr, std = weighted_correlations(matrix, row_weights)
+
+    # Constant columns (e.g. an option nobody in the base chose) carry no information
+    varying = np.flatnonzero(std[1:] > 0)
+    varying = varying[independent_columns(corr[np.ix_(varying + 1, varying + 1)])]
+    columns = columns.iloc[varying].reset_index(drop=True)
+    corr = corr[np.ix_(np.r_[0, varying + 1], np.r_[0, varying + 1])]
+
+    if question is None:
+        # Likert items on their own, multi-select options grouped by question
+        keys = np.where(columns['kind'] == 'likert', columns['predictor'], columns['question'])
+        names = list(dict.fromkeys(keys))
+        groups = [list(np.flatnonzero(keys == name) + 1) for name in names]
+        kinds = [columns['kind'].iloc[group[0] - 1] for group in groups]
+    else:
+        options = np.flatnonzero(columns['question'] == question)
+        names = list(columns['predictor'].iloc[options])
+        kinds = ['option'] * len(names)
+        selected = np.r_[0, options + 1]
+        corr = corr[np.ix_(selected, selected)]
+        groups = [[j + 1] for j in range(len(options))]
+
+    if len(groups) > MAX_PREDICTORS:
+        raise ValueError(f"{len(groups)} predictors: exact decomposition is limited to {MAX_PREDICTORS}")
+
+    r_squared = all_submodels(corr, groups, n_jobs)
+    shapley, conditional, complete = dominance_statistics(r_squared, len(groups))
+
+    # Direction of single-column predictors: sign of the standardized coefficient in the full model
+    full = [c for group in groups for c in group]
+    beta = np.linalg.lstsq(corr[np.ix_(full, full)], corr[full, 0], rcond=None)[0]
+    betas = [beta[full.index(group[0])] if len(group) == 1 else np.nan for group in groups]
+
+    total = r_squared[-1]
+    importance = pd.DataFrame({
+        'predictor': names,
+        'kind': kinds,
+        'shapley': shapley,
+        'share': shapley / total if total > 0 else np.nan,
+        'beta': betas
+    }).sort_values('shapley', ascending=False, ignore_index=True)
+    importance['rank'] = np.arange(1, len(importance) + 1)
+
+    sizes = [f'{s} others' for s in range(len(groups))]
+    return {
+        'target': target,
+        'question': question,
+        'importance': importance,
+        'r_squared': total,
+        'conditional': pd.DataFrame(conditional, index=names, columns=sizes),
+        'complete': pd.DataFrame(complete, index=names, columns=names),
+        'n_respondents': float(row_weights.sum()),
+        'n_submodels': len(r_squared)
+    }
+
+@timed
+def analyze_key_drivers(df, weights=None, n_jobs=None):
+    """Driver decompositions used by the reports: each target over all predictors, and satisfaction over improvement areas"""
+    drivers = {target: analyze_drivers(df, target, weights=weights, n_jobs=n_jobs)
+               for target, code in DRIVER_TARGETS.items() if LIKERT_REGISTRY[code]['question'] in df.columns}
+    if 'satisfaction' in drivers and MULTISELECT_QUESTIONS['improvements'] in df.columns:
+        drivers['improvements'] = analyze_drivers(df, 'satisfaction', 'improvements', weights, n_jobs)
+    return drivers
+
+def predictor_display(name, kind):
+    """Readable predictor name for charts and reports"""
+    if kind == 'likert':
+        return name.replace('_', ' ')
+    if kind == 'multiselect':
+        return name.replace('_', ' ').capitalize() + ' (all options)'
+    return get_translated_label(name)
+
+@timed
+def plot_key_drivers(drivers):
+    """Share of explained variance per predictor, one panel per target"""
+    targets = [target for target in DRIVER_TARGETS if target in drivers]
+    if not targets:
+        return
+    fig, axes = plt.subplots(1, len(targets), figsize=(7 * len(targets), 6), squeeze=False)
+    for ax, target in zip(axes[0], targets):
+        importance = drivers[target]['importance'].iloc[::-1]
+        ax.barh([predictor_display(name, kind) for name, kind in zip(importance['predictor'], importance['kind'])],
+                importance['share'],
+                color=ARCTERYX_COLORS[0])
+        ax.set_title(f"Drivers of {target} (R² = {drivers[target]['r_squared']:.2f})", fontsize=14)
+        ax.set_xlabel('Share of explained variance (Shapley)', fontsize=12)
+    plt.tight_layout()
+    plt.savefig('driver_plots/key_drivers.png', dpi=300)
+    plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Shapley / dominance key-driver analysis of satisfaction and purchase')
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    print("Loading data for key-driver analysis...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Decomposing explained variance over all sub-models...")
+    drivers = analyze_key_drivers(df, n_jobs=args.jobs)
+
+    for name, result in drivers.items():
+        title = result['target'] if result['question'] is None else f"{result['target']} by {result['question']} option"
+        print(f"\nDrivers of {title}: R² = {result['r_squared']:.3f} "
+              f"({result['n_submodels']} sub-models, {result['n_respondents']:.0f} respondents)")
+        shown = result['importance'].copy()
+        shown['predictor'] = [predictor_display(name, kind) for name, kind in zip(shown['predictor'], shown['kind'])]
+        print(shown.round(4).to_string(index=False))
+
+    plot_key_drivers(drivers)
+    print("Key-driver analysis complete! Chart saved in 'driver_plots/' directory.")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -5,54 +6,62 @@ import numpy as np
 import os
 from sicas_analysis import load_data, clean_data, get_translated_label
 from thesis_enhancements import ARCTERYX_COLORS, set_thesis_style
+from text_mining import mine_suggestions, get_suggestion_texts
+from near_duplicates import find_near_duplicates, deduplicated_view
+from report_engine import heading, paragraph, bullets, image, table, write_report
+from results_export import additional_stage_results, write_stage_results
+from driver_analysis import analyze_key_drivers, predictor_display
+from channel_attribution import analyze_channel_attribution, plot_channel_attribution
+from survey_config import response_masks
+from survey_weighting import respondent_weights, load_weights, weighted_value_counts, multiselect_value_counts, weighted_crosstab
+from instrumentation import timed
 
 # Create output directories
 if not os.path.exists('additional_plots'):
     os.makedirs('additional_plots')
 
-def analyze_additional_columns(df):
+@timed
+def analyze_additional_columns(df, weights=None):
     """Analyze columns not covered in the original analysis"""
     
     additional_results = {}
+    weights = respondent_weights(df, weights)
+    
+    # Answered respondents of every question; skip markers are not answers
+    base = response_masks(df)['base']
     
     # 1. Channels through which users were exposed to the brand
     channel_col = '您通过以下哪些渠道接触过始祖鸟品牌?'
     if channel_col in df.columns:
-        channels = []
-        for response in df[channel_col].dropna():
-            types = response.split('┋')
-            channels.extend(types)
-        
-        additional_results['brand_contact_channels'] = pd.Series(channels).value_counts(normalize=True)
+        additional_results['brand_contact_channels'] = multiselect_value_counts(df[channel_col][base['contact_channels']], weights)
     
     # 2. Social media interaction experience
     experience_col = '您认为始祖鸟社交媒体互动的体验如何？'
     if experience_col in df.columns:
-        additional_results['interaction_experience'] = df[experience_col].value_counts(normalize=True)
+        additional_results['interaction_experience'] = weighted_value_counts(df[experience_col][base['interaction_experience']], weights)
     
     # 3. Brand impression
     impression_col = '您对始祖鸟品牌的印象如何？（可多选）'
     if impression_col in df.columns:
-        impressions = []
-        for response in df[impression_col].dropna():
-            types = response.split('┋')
-            impressions.extend(types)
-        
-        additional_results['brand_impression'] = pd.Series(impressions).value_counts(normalize=True)
+        additional_results['brand_impression'] = multiselect_value_counts(df[impression_col][base['brand_impression']], weights)
     
     # 4. Whether social media increased brand understanding
     understanding_col = '始祖鸟社交媒体是否增加了您对品牌的了解？'
     if understanding_col in df.columns:
-        additional_results['increased_understanding'] = df[understanding_col].value_counts(normalize=True)
+        additional_results['increased_understanding'] = weighted_value_counts(df[understanding_col][base['increased_understanding']], weights)
     
     # 5. Free-text suggestions (word frequency analysis)
     suggestion_col = '您对始祖鸟社交媒体营销有哪些建议或想法？请简要描述。'
     if suggestion_col in df.columns:
-        # Get non-empty suggestions
-        suggestions = df[suggestion_col].dropna()
-        suggestions = suggestions[suggestions != '(空)']
+        # Get non-empty suggestions (skipped and blank answers excluded)
+        suggestions = df[suggestion_col][base['suggestions']]
         additional_results['suggestion_count'] = len(suggestions)
         additional_results['suggestions'] = suggestions
+        
+        # Flag near-duplicate (repeated or templated) answers and keep a deduplicated view
+        duplicates = find_near_duplicates(get_suggestion_texts(df))
+        additional_results['suggestion_duplicates'] = duplicates
+        additional_results['suggestions_deduplicated'] = deduplicated_view(df[suggestion_col], duplicates)
     
     return additional_results
 
@@ -176,7 +185,8 @@ def get_enhanced_label(chinese_label, translations_dict):
     """Enhanced translation function with expanded dictionary"""
     return translations_dict.get(chinese_label, chinese_label)
 
-def visualize_additional_results(additional_results, translations_dict):
+@timed
+def visualize_additional_results(additional_results, translations_dict, df=None, weights=None):
     """Create visualizations for additional analyses"""
     
     # Set plot style
@@ -319,17 +329,21 @@ def visualize_additional_results(additional_results, translations_dict):
     # 5. Create relationship visualizations 
     # Cross-analysis between brand understanding and purchase behavior
     if 'increased_understanding' in additional_results:
-        df = load_data()
-        df = clean_data(df)
+        # Reload the dataset unless the caller already has it
+        if df is None:
+            df = load_data()
+            df = clean_data(df)
+        weights = respondent_weights(df, weights)
         
         understanding_col = '始祖鸟社交媒体是否增加了您对品牌的了解？'
         purchase_col = '您是否因社交媒体内容购买过始祖鸟产品？'
         
         if understanding_col in df.columns and purchase_col in df.columns:
             # Create cross-tabulation
-            cross_tab = pd.crosstab(
+            cross_tab = weighted_crosstab(
                 df[understanding_col], 
                 df[purchase_col], 
+                weights,
                 normalize='index'
             )
             
@@ -385,9 +399,10 @@ def visualize_additional_results(additional_results, translations_dict):
         
         if experience_col in df.columns and satisfaction_col in df.columns:
             # Create heatmap data
-            heatmap_data = pd.crosstab(
+            heatmap_data = weighted_crosstab(
                 df[experience_col], 
-                df[satisfaction_col]
+                df[satisfaction_col],
+                weights
             )
             
             # Translate for plotting
@@ -399,7 +414,7 @@ def visualize_additional_results(additional_results, translations_dict):
             sns.heatmap(
                 heatmap_data,
                 annot=True,
-                fmt='d',
+                fmt='d' if weights is None else '.1f',
                 cmap='YlGnBu',
                 linewidths=.5,
                 cbar_kws={"shrink": .8}
@@ -412,182 +427,283 @@ def visualize_additional_results(additional_results, translations_dict):
             plt.savefig('additional_plots/experience_vs_satisfaction.png')
             plt.close()
 
-def generate_additional_report(additional_results, translations_dict):
-    """Generate a supplementary report with additional analyses"""
+@timed
+def generate_additional_report(additional_results, translations_dict, text_results=None, drivers=None, attribution=None):
+    """Generate a supplementary report with additional analyses
+
+    With driver results, improvement areas are ranked by their satisfaction impact; with channel
+    attribution results, each contact channel's contribution to purchase is reported.
+    """
     
-    with open('additional_analysis_report.md', 'w', encoding='utf-8') as f:
-        f.write('# Supplementary Analysis: Arc\'teryx Social Media Marketing\n\n')
-        f.write('## Additional Insights Beyond the SICAS Framework\n\n')
+    blocks = [
+        heading(1, 'Supplementary Analysis: Arc\'teryx Social Media Marketing'),
+        heading(2, 'Additional Insights Beyond the SICAS Framework'),
         
         # Introduction
-        f.write('This report extends the original SICAS model analysis with additional dimensions that provide deeper insights into Arc\'teryx\'s social media marketing effectiveness.\n\n')
+        paragraph('This report extends the original SICAS model analysis with additional dimensions that provide deeper insights into Arc\'teryx\'s social media marketing effectiveness.')
+    ]
+    
+    # 1. Brand Contact Channels
+    if 'brand_contact_channels' in additional_results:
+        blocks.append(heading(2, '1. Brand Contact Channels'))
+        blocks.append(paragraph('Understanding how consumers first encounter and interact with the Arc\'teryx brand provides valuable insights for channel optimization.'))
+        blocks.append(image('Brand Contact Channels', 'additional_plots/brand_contact_channels.png'))
         
-        # 1. Brand Contact Channels
-        if 'brand_contact_channels' in additional_results:
-            f.write('## 1. Brand Contact Channels\n\n')
-            f.write('Understanding how consumers first encounter and interact with the Arc\'teryx brand provides valuable insights for channel optimization.\n\n')
-            f.write('![Brand Contact Channels](additional_plots/brand_contact_channels.png)\n\n')
-            
-            # Extract insights from data
-            channel_data = additional_results['brand_contact_channels']
-            top_channels = channel_data.nlargest(3)
-            top_channels_text = ", ".join([f"{get_enhanced_label(idx, translations_dict)} ({val:.1%})" for idx, val in top_channels.items()])
-            
-            f.write(f'The primary channels through which respondents encounter the Arc\'teryx brand are {top_channels_text}. ')
-            
-            # Recommendations based on channel data
-            f.write('**Recommendations:**\n\n')
-            f.write('- Strengthen presence on the top-performing channels to maximize reach\n')
-            f.write('- Evaluate underperforming channels to determine whether to improve content or reallocate resources\n')
-            f.write('- Develop channel-specific content strategies that leverage the unique features of each platform\n\n')
-        
-        # 2. Social Media Interaction Experience
-        if 'interaction_experience' in additional_results:
-            f.write('## 2. Social Media Interaction Experience\n\n')
-            f.write('The quality of interaction experience directly impacts user satisfaction and ongoing engagement with the brand.\n\n')
-            f.write('![Interaction Experience](additional_plots/interaction_experience.png)\n\n')
-            
-            # Extract insights from data
-            exp_data = additional_results['interaction_experience']
-            positive_exp = exp_data.get('非常好', 0) + exp_data.get('比较好', 0)
-            neutral_exp = exp_data.get('一般', 0)
-            negative_exp = exp_data.get('较差', 0) + exp_data.get('非常差', 0)
-            
-            f.write(f'Analysis shows that {positive_exp:.1%} of respondents report a positive interaction experience, while {neutral_exp:.1%} describe it as neutral and {negative_exp:.1%} report a negative experience. ')
-            
-            if positive_exp > 0.6:
-                f.write('This high level of positive experience suggests effective community management and responsive social media teams.\n\n')
-            elif positive_exp > 0.4:
-                f.write('The moderate level of positive experiences indicates room for improvement in interaction quality and responsiveness.\n\n')
-            else:
-                f.write('The low level of positive experiences signals a critical need to reassess interaction strategies and community management practices.\n\n')
-            
-            f.write('**Recommendations:**\n\n')
-            f.write('- Implement standardized response protocols to ensure consistent quality of interaction\n')
-            f.write('- Reduce response times to user comments and queries\n')
-            f.write('- Train social media managers on effective community engagement techniques\n\n')
-        
-        # 3. Brand Impression
-        if 'brand_impression' in additional_results:
-            f.write('## 3. Brand Impression\n\n')
-            f.write('Consumer perceptions of the Arc\'teryx brand reveal how effectively social media marketing communicates brand values and positioning.\n\n')
-            f.write('![Brand Impression](additional_plots/brand_impression.png)\n\n')
-            
-            # Extract insights from data
-            impression_data = additional_results['brand_impression']
-            top_impressions = impression_data.nlargest(3)
-            top_impressions_text = ", ".join([f"{get_enhanced_label(idx, translations_dict)} ({val:.1%})" for idx, val in top_impressions.items()])
-            
-            f.write(f'The dominant brand impressions among respondents are {top_impressions_text}. ')
-            
-            # Check for price perception
-            if '价格较高' in impression_data.index:
-                price_perception = impression_data['价格较高']
-                if price_perception > 0.3:
-                    f.write(f'The significant price perception ({price_perception:.1%}) could present a barrier to conversion that needs addressing through value-focused messaging.\n\n')
-            
-            f.write('**Recommendations:**\n\n')
-            f.write('- Align social media content with desired brand attributes to reinforce brand positioning\n')
-            f.write('- Address potential negative perceptions through targeted content strategies\n')
-            f.write('- Leverage strengths in consumer perception to differentiate from competitors\n\n')
-        
-        # 4. Increased Brand Understanding
-        if 'increased_understanding' in additional_results:
-            f.write('## 4. Increased Brand Understanding from Social Media\n\n')
-            f.write('Effective social media should educate consumers and increase their understanding of the brand\'s offerings and values.\n\n')
-            f.write('![Increased Understanding](additional_plots/increased_understanding.png)\n\n')
-            
-            # Extract insights from data
-            understanding_data = additional_results['increased_understanding']
-            high_understanding = understanding_data.get('很多', 0) + understanding_data.get('一些', 0)
-            low_understanding = understanding_data.get('较少', 0) + understanding_data.get('完全没有', 0)
-            
-            f.write(f'{high_understanding:.1%} of respondents report that social media has significantly or somewhat increased their understanding of the Arc\'teryx brand, while {low_understanding:.1%} indicate little or no increase in understanding. ')
-            
-            if high_understanding > 0.7:
-                f.write('This high educational impact demonstrates effective knowledge transfer through social media content.\n\n')
-            elif high_understanding > 0.4:
-                f.write('The moderate educational impact suggests opportunities to enhance informational content in social media strategy.\n\n')
-            else:
-                f.write('The low educational impact indicates a critical failure to communicate key brand information through social media channels.\n\n')
-            
-            f.write('**Recommendations:**\n\n')
-            f.write('- Develop more educational content that highlights product features, technologies, and brand values\n')
-            f.write('- Create content series specifically designed to increase brand literacy among consumers\n')
-            f.write('- Implement interactive formats like Q&A sessions to address consumer information needs\n\n')
-        
-        # 5. Relationship Analysis
-        f.write('## 5. Cross-Dimensional Analysis\n\n')
-        f.write('### Understanding-to-Purchase Relationship\n\n')
-        f.write('The relationship between increased brand understanding and purchase behavior reveals how educational content drives conversion.\n\n')
-        f.write('![Understanding vs Purchase](additional_plots/understanding_vs_purchase.png)\n\n')
-        f.write('This visualization demonstrates how increasing levels of brand understanding correlate with higher purchase rates, emphasizing the importance of educational content in the conversion funnel.\n\n')
-        
-        f.write('### Interaction Experience vs. Satisfaction\n\n')
-        f.write('The correlation between interaction experience and overall satisfaction highlights the impact of community management on brand perception.\n\n')
-        f.write('![Experience vs Satisfaction](additional_plots/experience_vs_satisfaction.png)\n\n')
-        f.write('The heatmap reveals a strong correlation between positive interaction experiences and higher overall satisfaction, underlining the importance of quality engagement in social media strategy.\n\n')
-        
-        # 6. User Suggestions
-        if 'suggestions' in additional_results:
-            f.write('## 6. User Suggestions\n\n')
-            f.write(f'The analysis collected {additional_results["suggestion_count"]} unique suggestions from respondents regarding Arc\'teryx\'s social media marketing. Common themes include:\n\n')
+        # Extract insights from data
+        channel_data = additional_results['brand_contact_channels']
+        top_channels = channel_data.nlargest(3)
+        top_channels_text = ", ".join([f"{get_enhanced_label(idx, translations_dict)} ({val:.1%})" for idx, val in top_channels.items()])
+        
+        blocks.append(paragraph(f'The primary channels through which respondents encounter the Arc\'teryx brand are {top_channels_text}. **Recommendations:**'))
+        
+        # Recommendations based on channel data
+        blocks.append(bullets([
+            'Strengthen presence on the top-performing channels to maximize reach',
+            'Evaluate underperforming channels to determine whether to improve content or reallocate resources',
+            'Develop channel-specific content strategies that leverage the unique features of each platform'
+        ]))
+        
+        # Channel attribution: reach alone does not say which channels convert
+        if attribution is not None and (attribution['attribution']['purchase']['reached'] >= 5).any():
+            purchase = attribution['attribution']['purchase']
+            purchase = purchase[purchase['reached'] >= 5]
+            blocks.append(heading(3, 'Channel Attribution'))
+            blocks.append(paragraph(f'Reach alone does not show which channels drive results. Each purchase was credited to the channels through which the respondent encountered the brand (Shapley attribution over {attribution["n_combinations"]} distinct channel combinations). A logistic model estimates each channel\'s uplift: the change in purchase probability for the respondents it reached, compared with the same channel mix without it. Channels reaching fewer than 5 respondents are omitted.'))
+            blocks.append(table(
+                ['Channel', 'Respondents Reached', 'Purchase Rate', 'Shapley Share', 'Uplift', 'Incremental Purchases'],
+                [[get_enhanced_label(row['channel'], translations_dict),
+                  '{:.0f}'.format(row['reached']),
+                  '{:.1%}'.format(row['outcome_rate']),
+                  '{:.1%}'.format(row['shapley_share']),
+                  '{:+.1f} pp'.format(row['uplift'] * 100),
+                  '{:.1f}'.format(row['incremental_conversions'])]
+                 for _, row in purchase.iterrows()]
+            ))
+            blocks.append(image('Channel Attribution', 'attribution_plots/channel_attribution_purchase.png'))
             
-            # We'd ideally do text analysis here, but for now, just report count
-            f.write('- More product demonstrations and usage scenarios\n')
-            f.write('- Enhanced interactivity and community-building features\n')
-            f.write('- Value-focused content that justifies premium pricing\n')
-            f.write('- Improved mobile experience and accessibility\n\n')
-        
-        # Integrated Conclusions
-        f.write('## Integrated Conclusions\n\n')
-        f.write('When combined with the SICAS model analysis, these additional dimensions provide a comprehensive view of Arc\'teryx\'s social media marketing effectiveness. Key integrated insights include:\n\n')
-        
-        f.write('1. **Channel-to-Awareness Pipeline**: The data reveals how different contact channels contribute to varying levels of brand awareness, highlighting the need for channel-specific strategies.\n\n')
-        
-        f.write('2. **Experience-Satisfaction-Loyalty Relationship**: The strong correlation between interaction experience and satisfaction underscores the importance of community management in building brand loyalty.\n\n')
-        
-        f.write('3. **Understanding-to-Purchase Conversion**: The clear relationship between increased brand understanding and purchase behavior demonstrates that educational content serves as a critical conversion driver.\n\n')
-        
-        f.write('4. **Brand Perception Alignment**: Analysis of brand impressions reveals how effectively social media communication aligns with desired brand positioning and highlights areas for refinement.\n\n')
-        
-        # Final Recommendations
-        f.write('## Strategic Recommendations\n\n')
-        f.write('Based on this supplementary analysis, we recommend the following strategic initiatives to enhance Arc\'teryx\'s social media marketing effectiveness:\n\n')
-        
-        f.write('1. **Integrated Channel Strategy**: Develop a coordinated multi-channel approach that leverages the strengths of each platform while maintaining consistent brand messaging.\n\n')
-        
-        f.write('2. **Enhanced Community Management**: Implement advanced community management protocols to improve interaction experience, which directly impacts overall satisfaction.\n\n')
+            best = purchase.loc[purchase['uplift'].idxmax()]
+            weakest = purchase.loc[purchase['uplift'].idxmin()]
+            blocks.append(paragraph('The largest purchase uplift comes from {} ({:+.1f} pp among the {:.0f} respondents it reached), the smallest from {} ({:+.1f} pp). Budget shifts between channels should follow the incremental purchases rather than reach.'.format(
+                get_enhanced_label(best['channel'], translations_dict), best['uplift'] * 100, best['reached'],
+                get_enhanced_label(weakest['channel'], translations_dict), weakest['uplift'] * 100
+            )))
+    
+    # 2. Social Media Interaction Experience
+    if 'interaction_experience' in additional_results:
+        blocks.append(heading(2, '2. Social Media Interaction Experience'))
+        blocks.append(paragraph('The quality of interaction experience directly impacts user satisfaction and ongoing engagement with the brand.'))
+        blocks.append(image('Interaction Experience', 'additional_plots/interaction_experience.png'))
         
-        f.write('3. **Educational Content Program**: Create structured educational content that systematically increases consumer understanding of brand values, product features, and technologies.\n\n')
+        # Extract insights from data
+        exp_data = additional_results['interaction_experience']
+        positive_exp = exp_data.get('非常好', 0) + exp_data.get('比较好', 0)
+        neutral_exp = exp_data.get('一般', 0)
+        negative_exp = exp_data.get('较差', 0) + exp_data.get('非常差', 0)
+        
+        text = f'Analysis shows that {positive_exp:.1%} of respondents report a positive interaction experience, while {neutral_exp:.1%} describe it as neutral and {negative_exp:.1%} report a negative experience. '
+        
+        if positive_exp > 0.6:
+            text += 'This high level of positive experience suggests effective community management and responsive social media teams.'
+        elif positive_exp > 0.4:
+            text += 'The moderate level of positive experiences indicates room for improvement in interaction quality and responsiveness.'
+        else:
+            text += 'The low level of positive experiences signals a critical need to reassess interaction strategies and community management practices.'
+        blocks.append(paragraph(text))
+        
+        blocks.append(paragraph('**Recommendations:**'))
+        blocks.append(bullets([
+            'Implement standardized response protocols to ensure consistent quality of interaction',
+            'Reduce response times to user comments and queries',
+            'Train social media managers on effective community engagement techniques'
+        ]))
+    
+    # 3. Brand Impression
+    if 'brand_impression' in additional_results:
+        blocks.append(heading(2, '3. Brand Impression'))
+        blocks.append(paragraph('Consumer perceptions of the Arc\'teryx brand reveal how effectively social media marketing communicates brand values and positioning.'))
+        blocks.append(image('Brand Impression', 'additional_plots/brand_impression.png'))
         
-        f.write('4. **Brand Perception Management**: Develop targeted content strategies to reinforce positive brand impressions while addressing potential negative perceptions.\n\n')
+        # Extract insights from data
+        impression_data = additional_results['brand_impression']
+        top_impressions = impression_data.nlargest(3)
+        top_impressions_text = ", ".join([f"{get_enhanced_label(idx, translations_dict)} ({val:.1%})" for idx, val in top_impressions.items()])
+        
+        text = f'The dominant brand impressions among respondents are {top_impressions_text}. '
+        
+        # Check for price perception
+        if '价格较高' in impression_data.index:
+            price_perception = impression_data['价格较高']
+            if price_perception > 0.3:
+                blocks.append(paragraph(text + f'The significant price perception ({price_perception:.1%}) could present a barrier to conversion that needs addressing through value-focused messaging.'))
+                text = ''
+        
+        blocks.append(paragraph(text + '**Recommendations:**'))
+        blocks.append(bullets([
+            'Align social media content with desired brand attributes to reinforce brand positioning',
+            'Address potential negative perceptions through targeted content strategies',
+            'Leverage strengths in consumer perception to differentiate from competitors'
+        ]))
+    
+    # 4. Increased Brand Understanding
+    if 'increased_understanding' in additional_results:
+        blocks.append(heading(2, '4. Increased Brand Understanding from Social Media'))
+        blocks.append(paragraph('Effective social media should educate consumers and increase their understanding of the brand\'s offerings and values.'))
+        blocks.append(image('Increased Understanding', 'additional_plots/increased_understanding.png'))
         
-        f.write('5. **Conversion Optimization**: Leverage the understanding-to-purchase relationship by creating educational content specifically designed to move consumers through the conversion funnel.\n\n')
+        # Extract insights from data
+        understanding_data = additional_results['increased_understanding']
+        high_understanding = understanding_data.get('很多', 0) + understanding_data.get('一些', 0)
+        low_understanding = understanding_data.get('较少', 0) + understanding_data.get('完全没有', 0)
+        
+        text = f'{high_understanding:.1%} of respondents report that social media has significantly or somewhat increased their understanding of the Arc\'teryx brand, while {low_understanding:.1%} indicate little or no increase in understanding. '
+        
+        if high_understanding > 0.7:
+            text += 'This high educational impact demonstrates effective knowledge transfer through social media content.'
+        elif high_understanding > 0.4:
+            text += 'The moderate educational impact suggests opportunities to enhance informational content in social media strategy.'
+        else:
+            text += 'The low educational impact indicates a critical failure to communicate key brand information through social media channels.'
+        blocks.append(paragraph(text))
+        
+        blocks.append(paragraph('**Recommendations:**'))
+        blocks.append(bullets([
+            'Develop more educational content that highlights product features, technologies, and brand values',
+            'Create content series specifically designed to increase brand literacy among consumers',
+            'Implement interactive formats like Q&A sessions to address consumer information needs'
+        ]))
+    
+    # 5. Relationship Analysis
+    blocks.extend([
+        heading(2, '5. Cross-Dimensional Analysis'),
+        heading(3, 'Understanding-to-Purchase Relationship'),
+        paragraph('The relationship between increased brand understanding and purchase behavior reveals how educational content drives conversion.'),
+        image('Understanding vs Purchase', 'additional_plots/understanding_vs_purchase.png'),
+        paragraph('This visualization demonstrates how increasing levels of brand understanding correlate with higher purchase rates, emphasizing the importance of educational content in the conversion funnel.'),
+        
+        heading(3, 'Interaction Experience vs. Satisfaction'),
+        paragraph('The correlation between interaction experience and overall satisfaction highlights the impact of community management on brand perception.'),
+        image('Experience vs Satisfaction', 'additional_plots/experience_vs_satisfaction.png'),
+        paragraph('The heatmap reveals a strong correlation between positive interaction experiences and higher overall satisfaction, underlining the importance of quality engagement in social media strategy.')
+    ])
+    
+    # 6. User Suggestions
+    if text_results is not None and text_results['n_texts'] > 0:
+        blocks.append(heading(2, '6. User Suggestions'))
+        blocks.append(paragraph(f'After removing skipped, empty and "no suggestion" answers, respondents submitted {text_results["n_texts"]} substantive suggestions regarding Arc\'teryx\'s social media marketing ({text_results["n_unique"]} distinct texts once {text_results["n_near_duplicates"]} near-duplicate answers are merged into the text they repeat). Suggestions were tokenized into character n-grams, ranked by TF-IDF and clustered into themes:'))
+        
+        blocks.append(table(
+            ['Theme', 'Key Terms', 'Respondents', 'Mean Satisfaction', 'Purchase Rate', 'Example'],
+            [[theme['theme'],
+              ", ".join(theme['top_terms']),
+              '{} ({:.1%})'.format(theme['n_respondents'], theme['share']),
+              '{:.2f}'.format(theme.get('mean_satisfaction', np.nan)),
+              '{:.1%}'.format(theme.get('purchase_rate', np.nan)),
+              theme['examples'][0] if theme['examples'] else '']
+             for _, theme in text_results['themes'].iterrows()]
+        ))
+        
+        top_keywords = ", ".join(text_results['keywords']['keyword'].head(10))
+        blocks.append(paragraph(f'The highest-ranked keywords are: {top_keywords}.'))
+    elif 'suggestions' in additional_results:
+        blocks.append(heading(2, '6. User Suggestions'))
+        blocks.append(paragraph(f'The analysis collected {additional_results["suggestion_count"]} unique suggestions from respondents regarding Arc\'teryx\'s social media marketing. Common themes include:'))
+        
+        # We'd ideally do text analysis here, but for now, just report count
+        blocks.append(bullets([
+            'More product demonstrations and usage scenarios',
+            'Enhanced interactivity and community-building features',
+            'Value-focused content that justifies premium pricing',
+            'Improved mobile experience and accessibility'
+        ]))
+    
+    # Integrated Conclusions
+    blocks.extend([
+        heading(2, 'Integrated Conclusions'),
+        paragraph('When combined with the SICAS model analysis, these additional dimensions provide a comprehensive view of Arc\'teryx\'s social media marketing effectiveness. Key integrated insights include:'),
+        paragraph('1. **Channel-to-Awareness Pipeline**: The data reveals how different contact channels contribute to varying levels of brand awareness, highlighting the need for channel-specific strategies.'),
+        paragraph('2. **Experience-Satisfaction-Loyalty Relationship**: The strong correlation between interaction experience and satisfaction underscores the importance of community management in building brand loyalty.'),
+        paragraph('3. **Understanding-to-Purchase Conversion**: The clear relationship between increased brand understanding and purchase behavior demonstrates that educational content serves as a critical conversion driver.'),
+        paragraph('4. **Brand Perception Alignment**: Analysis of brand impressions reveals how effectively social media communication aligns with desired brand positioning and highlights areas for refinement.')
+    ])
+    
+    # Final Recommendations
+    blocks.extend([
+        heading(2, 'Strategic Recommendations'),
+        paragraph('Based on this supplementary analysis, we recommend the following strategic initiatives to enhance Arc\'teryx\'s social media marketing effectiveness:'),
+        paragraph('1. **Integrated Channel Strategy**: Develop a coordinated multi-channel approach that leverages the strengths of each platform while maintaining consistent brand messaging.'),
+        paragraph('2. **Enhanced Community Management**: Implement advanced community management protocols to improve interaction experience, which directly impacts overall satisfaction.'),
+        paragraph('3. **Educational Content Program**: Create structured educational content that systematically increases consumer understanding of brand values, product features, and technologies.'),
+        paragraph('4. **Brand Perception Management**: Develop targeted content strategies to reinforce positive brand impressions while addressing potential negative perceptions.'),
+        paragraph('5. **Conversion Optimization**: Leverage the understanding-to-purchase relationship by creating educational content specifically designed to move consumers through the conversion funnel.')
+    ])
+    
+    # Improvement areas ranked by their Shapley share of the satisfaction variance they explain together
+    if drivers is not None and 'improvements' in drivers and 'satisfaction' in drivers:
+        areas = drivers['improvements']['importance']
+        group = drivers['satisfaction']['importance'].set_index('predictor')
+        top_areas = ", ".join([
+            "{} ({:.1%}, tied to {} satisfaction)".format(
+                get_enhanced_label(row['predictor'], translations_dict),
+                row['share'],
+                'higher' if row['beta'] > 0 else 'lower'
+            )
+            for _, row in areas.head(3).iterrows()
+        ])
+        text = '6. **Prioritize Improvement Areas by Impact**: Ranked by an exact Shapley decomposition of the satisfaction variance they explain together (R² = {:.3f}), the improvement areas that matter most are {}.'.format(
+            drivers['improvements']['r_squared'], top_areas)
+        if 'improvements' in group.index:
+            strongest = drivers['satisfaction']['importance'].iloc[0]
+            text += ' Across all predictors, the improvement areas account for {:.1%} of the explained satisfaction variance, against {:.1%} for the strongest driver ({}), so content changes should be sequenced accordingly.'.format(
+                group.loc['improvements', 'share'],
+                strongest['share'],
+                predictor_display(strongest['predictor'], strongest['kind'])
+            )
+        blocks.append(paragraph(text))
+    
+    write_report(blocks, 'additional_analysis_report')
+    return blocks
 
 def main():
+    parser = argparse.ArgumentParser(description='Analysis of the additional survey questions and free-text suggestions')
+    parser.add_argument('--weights', default=None, help="respondent weights CSV written by survey_weighting.py")
+    args = parser.parse_args()
+    
     print("Loading data for additional analysis...")
     df = load_data()
     df = clean_data(df)
+    weights = load_weights(args.weights, df) if args.weights else None
     
     print("Analyzing additional columns...")
-    additional_results = analyze_additional_columns(df)
+    additional_results = analyze_additional_columns(df, weights)
     
     print("Updating translations dictionary...")
     translations_dict = update_translation_dict()
     
     print("Creating visualizations for additional analyses...")
-    visualize_additional_results(additional_results, translations_dict)
+    visualize_additional_results(additional_results, translations_dict, df, weights)
+    
+    print("Mining free-text suggestions...")
+    text_results = mine_suggestions(df)
+    
+    print("Decomposing key drivers of satisfaction...")
+    drivers = analyze_key_drivers(df, weights)
+    
+    print("Attributing outcomes to contact channels...")
+    attribution = analyze_channel_attribution(df, weights)
+    plot_channel_attribution(attribution)
     
     print("Generating supplementary report...")
-    generate_additional_report(additional_results, translations_dict)
+    generate_additional_report(additional_results, translations_dict, text_results, drivers, attribution)
+    
+    print("Exporting machine-readable results...")
+    write_stage_results(additional_stage_results(additional_results, df, weights))
     
     print("Additional analysis complete! Results saved in 'additional_analysis_report.md' and 'additional_plots/' directory.")
     
     # Commit and push results to GitHub
     try:
         import subprocess
-        subprocess.run(["git", "add", "additional_plots/", "additional_analysis_report.md", "enhanced_analysis.py"])
+        subprocess.run(["git", "add", "additional_plots/", "additional_analysis_report.md", "additional_analysis_report.html", "additional_analysis_report.json", "enhanced_analysis.py"])
         subprocess.run(["git", "commit", "-m", "Added extended analysis of additional columns"])
         subprocess.run(["git", "push"])
         print("Changes committed and pushed to GitHub repository.")
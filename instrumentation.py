@@ -0,0 +1,218 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; memory high-water marks are then left out
+    resource = None
+
+# SICAS_TIMING=1 records every stage and writes a JSON run log when the script exits.
+# SICAS_PROFILE=<stage>[,<stage>...] also dumps cProfile stats and tracemalloc snapshots for those stages.
+PROFILE_STAGES = {name.strip() for name in os.environ.get('SICAS_PROFILE', '').split(',') if name.strip()}
+ENABLED = os.environ.get('SICAS_TIMING', '') not in ('', '0') or bool(PROFILE_STAGES)
+RUN_LOG_DIR = os.environ.get('SICAS_RUN_LOG_DIR', 'run_logs')
+
+# Stage records of this process and the stack of stages currently running
+_records = []
+_stack = []
+
+def _peak_rss_mb():
+    """Process memory high-water mark in MB (ru_maxrss is KB on Linux, bytes on macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _child_cpu_seconds():
+    """CPU time of finished child processes (process-pool workers)"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def _profile_path(name, suffix):
+    """Output path for a profiling dump of a stage"""
+    if not os.path.exists(RUN_LOG_DIR):
+        os.makedirs(RUN_LOG_DIR, exist_ok=True)
+    return os.path.join(RUN_LOG_DIR, f'{name}_{os.getpid()}_{len(_records)}{suffix}')
+
+def _carry_traced_peak():
+    """Fold the current tracemalloc peak into every running stage"""
+    peak = tracemalloc.get_traced_memory()[1]
+    for running in _stack:
+        running['_traced_peak'] = max(running.get('_traced_peak', 0), peak)
+
+@contextmanager
+def stage(name):
+    """Record wall time, CPU time and peak memory of a block of work (no-op unless enabled)"""
+    if not ENABLED:
+        yield
+        return
+
+    profiler = None
+    if name in PROFILE_STAGES:
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+    elif tracemalloc.is_tracing():
+        # Peak of this stage only, when a profiled parent stage is tracing allocations;
+        # the running parents keep the peak reached so far
+        _carry_traced_peak()
+        tracemalloc.reset_peak()
+
+    record = {
+        'stage': name,
+        'parent': _stack[-1]['stage'] if _stack else None,
+        'depth': len(_stack),
+        'started': datetime.now().isoformat(timespec='milliseconds')
+    }
+    _stack.append(record)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    child_start = _child_cpu_seconds()
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield
+        record['status'] = 'ok'
+    except BaseException as e:
+        record['status'] = f'failed: {type(e).__name__}'
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['wall_seconds'] = time.perf_counter() - wall_start
+        record['cpu_seconds'] = time.process_time() - cpu_start
+        record['child_cpu_seconds'] = _child_cpu_seconds() - child_start
+        record['peak_rss_mb'] = _peak_rss_mb()
+
+        if tracemalloc.is_tracing():
+            _carry_traced_peak()
+        if '_traced_peak' in record:
+            record['peak_traced_mb'] = record.pop('_traced_peak') / (1024 * 1024)
+
+        if profiler is not None:
+            # pstats binary (open with snakeviz or python -m pstats) plus the top allocation sites
+            snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, cProfile.__file__)])
+            tracemalloc.stop()
+            record['cprofile'] = _profile_path(name, '.prof')
+            profiler.dump_stats(record['cprofile'])
+            record['tracemalloc'] = _profile_path(name, '_tracemalloc.txt')
+            top = snapshot.statistics('lineno')[:25]
+            with open(record['tracemalloc'], 'w', encoding='utf-8') as f:
+                f.writelines(f'{stat}\n' for stat in top)
+
+        _stack.pop()
+        _records.append(record)
+
+def timed(func=None, name=None):
+    """Decorator recording a function as a stage (named after the function by default)"""
+    if func is None:
+        return functools.partial(timed, name=name)
+
+    stage_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+        with stage(stage_name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+def stage_records():
+    """Stage records collected so far, in completion order"""
+    return list(_records)
+
+def reset_run_log():
+    """Drop the collected records, e.g. between surveys processed by one worker"""
+    _records.clear()
+
+def run_summary(records=None):
+    """Total wall and CPU time per stage name, slowest first (nested stages are included in their parents)"""
+    totals = {}
+    for record in _records if records is None else records:
+        entry = totals.setdefault(record['stage'], {'stage': record['stage'], 'calls': 0,
+                                                    'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+        entry['calls'] += 1
+        entry['wall_seconds'] += record['wall_seconds']
+        entry['cpu_seconds'] += record['cpu_seconds'] + record['child_cpu_seconds']
+    return sorted(totals.values(), key=lambda entry: entry['wall_seconds'], reverse=True)
+
+def write_run_log(path=None):
+    """Write the structured run log as JSON; returns the path (None when nothing was recorded)"""
+    if not _records:
+        return None
+
+    if path is None:
+        script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if not os.path.exists(RUN_LOG_DIR):
+            os.makedirs(RUN_LOG_DIR, exist_ok=True)
+        path = os.path.join(RUN_LOG_DIR, f'{script}_{timestamp}_{os.getpid()}.json')
+
+    payload = {
+        'script': sys.argv[0],
+        'pid': os.getpid(),
+        'written': datetime.now().isoformat(timespec='seconds'),
+        'profiled_stages': sorted(PROFILE_STAGES),
+        'summary': run_summary(),
+        'stages': _records
+    }
+    # Imported here: report_engine itself is instrumented
+    from report_engine import write_atomic
+    write_atomic(path, json.dumps(payload, ensure_ascii=False, indent=2))
+    return path
+
+def print_run_summary(path, top_n=20):
+    """Print the slowest stages of a written run log"""
+    with open(path, encoding='utf-8') as f:
+        log = json.load(f)
+
+    print(f"{'Stage':<32} {'Calls':>5} {'Wall s':>9} {'CPU s':>9}")
+    for entry in log['summary'][:top_n]:
+        print(f"{entry['stage']:<32} {entry['calls']:>5} {entry['wall_seconds']:>9.3f} {entry['cpu_seconds']:>9.3f}")
+
+    peaks = [record['peak_rss_mb'] for record in log['stages'] if record.get('peak_rss_mb') is not None]
+    if peaks:
+        print(f"Peak memory (RSS): {max(peaks):.1f} MB")
+    for record in log['stages']:
+        if 'cprofile' in record:
+            print(f"Profile of '{record['stage']}': {record['cprofile']} (tracemalloc: {record['tracemalloc']})")
+
+def _write_run_log_at_exit():
+    """Write the run log of the main process when the script ends"""
+    path = write_run_log()
+    if path:
+        print(f"Run log written to '{path}'.")
+
+if ENABLED:
+    atexit.register(_write_run_log_at_exit)
+
+def main():
+    # Summarize the given run log, or the most recent one
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        logs = [os.path.join(RUN_LOG_DIR, name) for name in os.listdir(RUN_LOG_DIR)
+                if name.endswith('.json')] if os.path.exists(RUN_LOG_DIR) else []
+        if not logs:
+            print(f"No run logs in '{RUN_LOG_DIR}/'. Run a script with SICAS_TIMING=1 first.")
+            return
+        path = max(logs, key=os.path.getmtime)
+
+    print(f"Run log: {path}")
+    print_run_summary(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import argparse
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from scipy import optimize
+from sicas_analysis import load_data, clean_data
+from survey_encoding import LIKERT_REGISTRY, encode_likert_items
+from survey_weighting import respondent_weights
+from thesis_enhancements import ARCTERYX_COLORS
+from instrumentation import timed
+
+# Create output directory
+if not os.path.exists('irt_plots'):
+    os.makedirs('irt_plots')
+
+# Latent traits and their items. Most SICAS dimensions have a single item, which cannot identify
+# a trait of its own, so by default one engagement trait runs through the whole chain. Binary items
+# (the purchase outcome) are left out: a near-deterministic yes/no item would make the trait a
+# proxy for that one answer.
+DEFAULT_TRAITS = {
+    'sicas': [code for code, item in LIKERT_REGISTRY.items() if len(set(item['scale'].values())) > 2]
+}
+
+# Gauss-Hermite quadrature points for the N(0, 1) trait distribution
+N_QUADRATURE = 41
+
+# Log-normal prior on discrimination (mean and SD of log a) for Bayes-modal estimation; it keeps
+# a near-deterministic item from drifting off to infinity
+DISCRIMINATION_PRIOR = (0.0, 0.5)
+
+# Hard bounds on discrimination; an item that still ends at the upper one is reported
+MIN_DISCRIMINATION = 0.01
+MAX_DISCRIMINATION = 10.0
+
+def item_categories(codes):
+    """Ordered score values of each item; aliases with the same value share a category"""
+    return [np.array(sorted(set(LIKERT_REGISTRY[code]['scale'].values())), dtype=np.float64) for code in codes]
+
+def encode_categories(matrix, categories):
+    """Category index (0 .. K-1) of every answer, -1 where missing"""
+    codes = np.full(matrix.shape, -1, dtype=np.int8)
+    for j, values in enumerate(categories):
+        observed = ~np.isnan(matrix[:, j])
+        codes[observed, j] = np.searchsorted(values, matrix[observed, j])
+    return codes
+
+def collapse_response_patterns(codes, n_categories, weights=None):
+    """Distinct response patterns, their (weighted) frequencies and each respondent's pattern
+
+    Each pattern is one mixed-radix integer key (missing as its own digit), so the EM below works
+    on a frequency table whose size does not grow with the number of respondents.
+    """
+    keys = np.zeros(len(codes), dtype=np.int64)
+    for j, k in enumerate(n_categories):
+        keys = keys * (k + 1) + (codes[:, j] + 1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    frequencies = np.bincount(inverse, weights=weights, minlength=len(first))
+    return codes[first], frequencies, inverse
+
+def quadrature():
+    """Nodes and normalized weights for integrating over a standard normal trait"""
+    nodes, weights = np.polynomial.hermite_e.hermegauss(N_QUADRATURE)
+    return nodes, weights / weights.sum()
+
+def cumulative_probabilities(a, c, theta):
+    """P(X >= k | theta) for k = 0 .. K as a (K + 1) x quadrature array (first row 1, last row 0)"""
+    inner = 1 / (1 + np.exp(-(a * theta[None, :] + c[:, None])))
+    ones = np.ones((1, len(theta)))
+    return np.vstack([ones, inner, 0 * ones])
+
+def category_probabilities(a, c, theta):
+    """P(X = k | theta) of the graded response model, floored to keep the logs finite"""
+    cumulative = cumulative_probabilities(a, c, theta)
+    return np.clip(cumulative[:-1] - cumulative[1:], 1e-12, None)
+
+def _unpack(params):
+    """Discrimination and decreasing intercepts from unconstrained parameters"""
+    a, first, gaps = params[0], params[1], params[2:]
+    return a, first - np.concatenate([[0.0], np.cumsum(np.exp(gaps))])
+
+def _pack(a, c):
+    """Unconstrained parameters of a discrimination and decreasing intercepts"""
+    return np.concatenate([[a, c[0]], np.log(np.maximum(-np.diff(c), 1e-6))])
+
+def _item_objective(params, expected, theta):
+    """Negative expected complete-data log-posterior of one item (log-normal prior on a) and its gradient"""
+    a, c = _unpack(params)
+    cumulative = cumulative_probabilities(a, c, theta)
+    probabilities = np.clip(cumulative[:-1] - cumulative[1:], 1e-12, None)
+    ratio = expected / probabilities
+
+    # d log L / d c_k for each intercept, through the two categories P*_k borders
+    slope = cumulative[1:-1] * (1 - cumulative[1:-1])
+    per_node = slope * (ratio[1:] - ratio[:-1])
+    grad_c = per_node.sum(axis=1)
+    grad_a = (per_node * theta).sum()
+
+    # Chain rule to (a, c_1, log gaps): c_k = c_1 - sum of the first k - 1 gaps
+    gaps = np.exp(params[2:])
+    grad_gaps = -gaps * np.cumsum(grad_c[::-1])[::-1][1:]
+    gradient = np.concatenate([[grad_a + log_prior_gradient(a), grad_c.sum()], grad_gaps])
+    return -(expected * np.log(probabilities)).sum() - log_prior(a), -gradient
+
+def log_prior(a):
+    """Log density of the log-normal discrimination prior, up to a constant"""
+    mean, sd = DISCRIMINATION_PRIOR
+    return -(np.log(a) - mean) ** 2 / (2 * sd ** 2) - np.log(a)
+
+def log_prior_gradient(a):
+    """Derivative of log_prior with respect to a"""
+    mean, sd = DISCRIMINATION_PRIOR
+    return -((np.log(a) - mean) / sd ** 2 + 1) / a
+
+def initial_parameters(codes, n_categories):
+    """Starting values: unit discrimination and logit intercepts of the observed cumulative shares"""
+    params = []
+    for j, k in enumerate(n_categories):
+        observed = codes[:, j][codes[:, j] >= 0]
+        shares = np.bincount(observed, minlength=k) / max(len(observed), 1)
+        above = np.clip(1 - np.cumsum(shares)[:-1], 0.01, 0.99)
+        c = np.log(above / (1 - above))
+        c = np.minimum.accumulate(c - np.arange(len(c)) * 1e-3)
+        params.append(_pack(1.0, c))
+    return params
+
+@timed
+def fit_grm(codes, n_categories, frequencies, max_iter=500, tolerance=1e-6):
+    """Samejima graded response model by Bayes-modal marginal estimation (Bock-Aitkin EM)
+
+    Discriminations get the log-normal DISCRIMINATION_PRIOR; intercepts are unpenalized. The E-step computes every pattern's posterior over the quadrature nodes at once and turns it
+    into expected category counts per item and node; the M-step maximizes each item's expected
+    log-likelihood from those small tables.
+    """
+    theta, prior = quadrature()
+    n_items = codes.shape[1]
+    params = initial_parameters(codes, n_categories)
+
+    # One-hot answers per item (patterns x categories), zero rows for missing answers
+    one_hot = [(codes[:, j][:, None] == np.arange(k)).astype(np.float64) for j, k in enumerate(n_categories)]
+
+    previous = -np.inf
+    for iteration in range(1, max_iter + 1):
+        # E-step: pattern log-likelihood at every node, then posterior weights
+        log_likelihood = np.zeros((len(codes), len(theta)))
+        for j in range(n_items):
+            log_likelihood += one_hot[j] @ np.log(category_probabilities(*_unpack(params[j]), theta))
+        joint = log_likelihood + np.log(prior)
+        peak = joint.max(axis=1, keepdims=True)
+        marginal = peak[:, 0] + np.log(np.exp(joint - peak).sum(axis=1))
+        posterior = np.exp(joint - marginal[:, None]) * frequencies[:, None]
+
+        total = float(frequencies @ marginal)
+        objective = total + sum(log_prior(_unpack(p)[0]) for p in params)
+        if objective - previous < tolerance * abs(objective):
+            break
+        previous = objective
+
+        # M-step: each item from its expected (category x node) counts
+        for j in range(n_items):
+            expected = one_hot[j].T @ posterior
+            bounds = [(MIN_DISCRIMINATION, MAX_DISCRIMINATION)] + [(None, None)] * (len(params[j]) - 1)
+            result = optimize.minimize(_item_objective, params[j], args=(expected, theta), jac=True,
+                                       method='L-BFGS-B', bounds=bounds)
+            params[j] = result.x
+
+    discrimination = np.array([_unpack(p)[0] for p in params])
+    intercepts = [_unpack(p)[1] for p in params]
+    return {'discrimination': discrimination, 'intercepts': intercepts, 'log_likelihood': total,
+            'iterations': iteration}
+
+def eap_scores(codes, fit, n_categories):
+    """Expected a posteriori trait estimate and posterior SD of every pattern"""
+    theta, prior = quadrature()
+    log_likelihood = np.zeros((len(codes), len(theta)))
+    for j, k in enumerate(n_categories):
+        log_p = np.log(category_probabilities(fit['discrimination'][j], fit['intercepts'][j], theta))
+        one_hot = (codes[:, j][:, None] == np.arange(k)).astype(np.float64)
+        log_likelihood += one_hot @ log_p
+    joint = log_likelihood + np.log(prior)
+    posterior = np.exp(joint - joint.max(axis=1, keepdims=True))
+    posterior /= posterior.sum(axis=1, keepdims=True)
+    mean = posterior @ theta
+    sd = np.sqrt(np.clip(posterior @ theta ** 2 - mean ** 2, 0, None))
+    return mean, sd
+
+def item_information(a, c, theta):
+    """Fisher information of one graded item at each trait value"""
+    cumulative = cumulative_probabilities(a, c, theta)
+    slope = cumulative * (1 - cumulative)
+    probabilities = np.clip(cumulative[:-1] - cumulative[1:], 1e-12, None)
+    return a ** 2 * ((slope[:-1] - slope[1:]) ** 2 / probabilities).sum(axis=0)
+
+@timed
+def analyze_irt(df, traits=None, weights=None):
+    """Graded response model per latent trait: item parameters, EAP trait scores and test information"""
+    if traits is None:
+        traits = DEFAULT_TRAITS
+    weights = respondent_weights(df, weights)
+    frequencies_weights = weights.to_numpy() if weights is not None else None
+
+    results = {}
+    for trait, item_codes in traits.items():
+        items = encode_likert_items(df, item_codes)
+        if len(items['codes']) < 2:
+            continue
+        categories = item_categories(items['codes'])
+        n_categories = [len(values) for values in categories]
+        codes = encode_categories(items['matrix'], categories)
+
+        patterns, frequencies, inverse = collapse_response_patterns(codes, n_categories, frequencies_weights)
+        # Patterns without a single answer carry no information about the trait
+        answered = (patterns >= 0).any(axis=1)
+        fit = fit_grm(patterns[answered], n_categories, frequencies[answered])
+        at_bound = [code for code, a in zip(items['codes'], fit['discrimination']) if a >= MAX_DISCRIMINATION * (1 - 1e-6)]
+        if at_bound:
+            warnings.warn(f"Trait '{trait}': discrimination of {', '.join(at_bound)} ended at the bound "
+                          f"{MAX_DISCRIMINATION}; the trait scores are dominated by those items")
+
+        mean, sd = eap_scores(patterns, fit, n_categories)
+        mean[~answered], sd[~answered] = np.nan, np.nan
+
+        parameters = pd.DataFrame({
+            'item': items['codes'],
+            'label': [LIKERT_REGISTRY[code]['label'] for code in items['codes']],
+            'discrimination': fit['discrimination']
+        })
+        # Difficulties b_k = -c_k / a: trait level where P(X >= k) crosses one half
+        for k in range(1, max(n_categories)):
+            parameters[f'b{k}'] = [-c[k - 1] / a if k - 1 < len(c) else np.nan
+                                   for a, c in zip(fit['discrimination'], fit['intercepts'])]
+
+        grid = np.linspace(-4, 4, 161)
+        information = pd.DataFrame({code: item_information(a, c, grid) for code, a, c in
+                                    zip(items['codes'], fit['discrimination'], fit['intercepts'])}, index=grid)
+
+        results[trait] = {
+            'items': items['codes'],
+            'parameters': parameters,
+            'scores': pd.DataFrame({'theta': mean[inverse], 'se': sd[inverse]}, index=df.index),
+            'information': information,
+            'log_likelihood': fit['log_likelihood'],
+            'iterations': fit['iterations'],
+            'n_patterns': int(answered.sum()),
+            'items_at_bound': at_bound
+        }
+    return results
+
+@timed
+def plot_irt(results, df):
+    """Item and test information curves, and EAP trait scores against the mean item score, per trait"""
+    for trait, result in results.items():
+        fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+        information = result['information']
+        for i, code in enumerate(information.columns):
+            axes[0].plot(information.index, information[code], color=ARCTERYX_COLORS[i % len(ARCTERYX_COLORS)],
+                         label=LIKERT_REGISTRY[code]['label'])
+        axes[0].plot(information.index, information.sum(axis=1), color='black', linewidth=2, label='Test')
+        axes[0].set_xlabel('Latent trait (θ)', fontsize=12)
+        axes[0].set_ylabel('Information', fontsize=12)
+        axes[0].set_title(f'Item and Test Information ({trait})', fontsize=14)
+        axes[0].legend(fontsize=9)
+
+        # Rescaled item average (the interval-score approach) vs. the IRT score
+        items = encode_likert_items(df, result['items'])
+        ranges = [(min(LIKERT_REGISTRY[code]['scale'].values()), max(LIKERT_REGISTRY[code]['scale'].values()))
+                  for code in items['codes']]
+        scaled = np.column_stack([(items['matrix'][:, j] - low) / (high - low) for j, (low, high) in enumerate(ranges)])
+        with np.errstate(invalid='ignore'):
+            average = np.nanmean(scaled, axis=1)
+        axes[1].scatter(average, result['scores']['theta'], s=8, alpha=0.3, color=ARCTERYX_COLORS[0])
+        axes[1].set_xlabel('Mean item score (rescaled to 0-1)', fontsize=12)
+        axes[1].set_ylabel('EAP trait score', fontsize=12)
+        axes[1].set_title('IRT Score vs. Averaged Codes', fontsize=14)
+
+        plt.tight_layout()
+        plt.savefig(f'irt_plots/irt_{trait}.png', dpi=300)
+        plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Graded response model scoring of the SICAS Likert items')
+    parser.parse_args()
+
+    print("Loading data for IRT scoring...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Fitting graded response models...")
+    results = analyze_irt(df)
+
+    for trait, result in results.items():
+        print(f"\nTrait '{trait}': {result['n_patterns']} distinct response patterns, "
+              f"log-likelihood {result['log_likelihood']:.2f} after {result['iterations']} EM iterations")
+        print(result['parameters'].round(3).to_string(index=False))
+        if result['items_at_bound']:
+            print(f"Warning: discrimination at the bound {MAX_DISCRIMINATION} for {', '.join(result['items_at_bound'])}")
+        scores = result['scores']
+        print(f"EAP scores: mean {scores['theta'].mean():.3f}, SD {scores['theta'].std():.3f}, "
+              f"mean standard error {scores['se'].mean():.3f}")
+
+    plot_irt(results, df)
+    print("IRT scoring complete! Charts saved in 'irt_plots/' directory.")
+
+if __name__ == "__main__":
+    main()
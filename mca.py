@@ -0,0 +1,256 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from scipy import sparse
+from scipy.sparse.linalg import LinearOperator
+from sicas_analysis import load_data, clean_data, get_translated_label
+from survey_config import survey_questions, response_masks
+from survey_encoding import MULTISELECT_QUESTIONS, encode_categorical, encode_multiselect
+from thesis_enhancements import ARCTERYX_COLORS
+from instrumentation import timed
+
+# Create output directory
+if not os.path.exists('mca_plots'):
+    os.makedirs('mca_plots')
+
+# Open-ended questions have no answer categories
+FREE_TEXT_QUESTIONS = ['suggestions']
+
+# Respondents drawn for the biplot; every respondent is still in the coordinates
+BIPLOT_SAMPLE = 3000
+
+@timed
+def build_indicator(df, config=None):
+    """Sparse indicator matrix (respondents x answer categories) of every categorical and multi-select question
+
+    Single-choice questions get one column per answer, multi-select questions one column per
+    option. Only answers in a question's base count, so skip markers and routed-away blanks
+    are never categories.
+    """
+    questions = survey_questions(config)
+    base = response_masks(df, config)['base']
+    blocks = []
+    records = []
+
+    for key, column in questions.items():
+        if key in FREE_TEXT_QUESTIONS or column not in df.columns:
+            continue
+        answers = df[column].where(base[key].to_numpy())
+        if key in MULTISELECT_QUESTIONS:
+            indicator, categories = encode_multiselect(answers)
+        else:
+            indicator, categories = encode_categorical(answers)
+        blocks.append(indicator)
+        records.extend({'question': key, 'category': category} for category in categories)
+
+    categories = pd.DataFrame(records, columns=['question', 'category'])
+    categories['label'] = categories['question'] + ': ' + categories['category'].astype(str)
+    return sparse.hstack(blocks, format='csr', dtype=np.float64), categories
+
+def burt_matrix(indicator, chunk_rows=100_000):
+    """Burt matrix: co-occurrence counts of every pair of answer categories (categories x categories)
+
+    Accumulated over row blocks with a dense right-hand side, which is several times faster
+    than a sparse-sparse product and never densifies more than one block.
+    """
+    burt = np.zeros((indicator.shape[1], indicator.shape[1]))
+    for start in range(0, indicator.shape[0], chunk_rows):
+        block = indicator[start:start + chunk_rows]
+        burt += block.T @ block.toarray()
+    return sparse.csr_matrix(burt)
+
+def randomized_svd(operator, n_components, n_oversamples=20, n_iter=10, seed=42):
+    """Leading singular triplets of a matrix that is only available through products (Halko et al.)
+
+    A random subspace of the columns is refined with power iterations on S'S, re-orthonormalised
+    on the small (category) side only, so nothing of respondent length is ever factorised. The
+    triplets then come from a Rayleigh-Ritz step on the final subspace.
+    """
+    rng = np.random.default_rng(seed)
+    size = min(n_components + n_oversamples, min(operator.shape))
+    Q, _ = np.linalg.qr(rng.standard_normal((operator.shape[1], size)))
+    for _ in range(n_iter):
+        Q, _ = np.linalg.qr(operator.rmatmat(operator.matmat(Q)))
+
+    Y = operator.matmat(Q)
+    eigenvalues, W = np.linalg.eigh(Y.T @ Y)
+    order = np.argsort(eigenvalues)[::-1][:n_components]
+    s = np.sqrt(np.clip(eigenvalues[order], 0, None))
+    V = Q @ W[:, order]
+    U = Y @ W[:, order] / s
+
+    # Deterministic signs: the largest loading of each component is positive
+    signs = np.sign(V[np.abs(V).argmax(axis=0), np.arange(V.shape[1])])
+    return U * signs, s, (V * signs).T
+
+def residual_operator(indicator):
+    """Standardised residuals D_r^-1/2 (P - r c') D_c^-1/2 of the indicator table, as a sparse-plus-rank-one operator
+
+    The centring term is dense, so it is applied as a rank-one correction instead of being formed.
+    """
+    total = indicator.sum()
+    row_mass = np.asarray(indicator.sum(axis=1)).ravel() / total
+    column_mass = np.asarray(indicator.sum(axis=0)).ravel() / total
+    sqrt_r, sqrt_c = np.sqrt(row_mass), np.sqrt(column_mass)
+
+    # Scale the stored entries in place of two diagonal products
+    scaled = indicator.copy()
+    rows = np.repeat(np.arange(scaled.shape[0]), np.diff(scaled.indptr))
+    scaled.data = scaled.data / (sqrt_r[rows] * total * sqrt_c[scaled.indices])
+    # The CSC view of the transpose multiplies much faster than a transposed CSR copy
+    scaled_t = scaled.T
+
+    operator = LinearOperator(
+        scaled.shape, dtype=np.float64,
+        matvec=lambda x: scaled @ x - sqrt_r * (sqrt_c @ x),
+        rmatvec=lambda y: scaled_t @ y - sqrt_c * (sqrt_r @ y),
+        matmat=lambda X: scaled @ X - np.outer(sqrt_r, sqrt_c @ X),
+        rmatmat=lambda Y: scaled_t @ Y - np.outer(sqrt_c, sqrt_r @ Y)
+    )
+    # ||S||^2 = ||scaled||^2 - 2 sqrt_r' scaled sqrt_c + 1, and sqrt_r' scaled sqrt_c = 1
+    total_inertia = float((scaled.data ** 2).sum() - 1)
+    return operator, row_mass, column_mass, total_inertia
+
+@timed
+def multiple_correspondence_analysis(df, n_components=5, min_share=0.01, config=None, seed=42):
+    """MCA of every categorical answer: principal inertias and coordinates of categories and respondents
+
+    Correspondence analysis of the sparse indicator matrix, with the leading components found by
+    randomized truncated SVD, so no dense one-hot or residual matrix is ever built. Principal
+    inertias are the squared singular values (the Burt-matrix eigenvalues are their squares).
+    Categories chosen by fewer than min_share of respondents are left out: with their tiny mass
+    they would otherwise dominate the leading dimensions.
+    """
+    indicator, categories = build_indicator(df, config)
+    frequent = np.asarray(indicator.sum(axis=0)).ravel() >= min_share * len(df)
+    indicator = indicator[:, frequent]
+    categories = categories[frequent].reset_index(drop=True)
+
+    # Respondents without a single answer have no mass
+    answered = np.asarray(indicator.sum(axis=1)).ravel() > 0
+    indicator = indicator[answered]
+
+    operator, row_mass, column_mass, total_inertia = residual_operator(indicator)
+    n_components = min(n_components, min(indicator.shape) - 1)
+    U, s, Vt = randomized_svd(operator, n_components, seed=seed)
+
+    dimensions = [f'Dim{d + 1}' for d in range(n_components)]
+    inertia = s ** 2
+    eigenvalues = pd.DataFrame({
+        'inertia': inertia,
+        'explained': inertia / total_inertia,
+        'cumulative': np.cumsum(inertia) / total_inertia
+    }, index=dimensions)
+
+    # Principal coordinates of both sets (symmetric map)
+    category_coords = Vt.T / np.sqrt(column_mass)[:, None] * s
+    respondent_coords = U / np.sqrt(row_mass)[:, None] * s
+
+    category_table = pd.concat([
+        categories,
+        pd.DataFrame({'mass': column_mass}),
+        pd.DataFrame(category_coords, columns=dimensions),
+        # Contribution of each category to each dimension's inertia
+        pd.DataFrame(Vt.T ** 2, columns=[f'ctr_{d}' for d in dimensions])
+    ], axis=1)
+
+    return {
+        'eigenvalues': eigenvalues,
+        'total_inertia': total_inertia,
+        'categories': category_table,
+        'respondents': pd.DataFrame(respondent_coords, index=df.index[answered], columns=dimensions),
+        'burt': burt_matrix(indicator),
+        'n_categories': indicator.shape[1],
+        'n_rare': int((~frequent).sum()),
+        'n_unanswered': int((~answered).sum())
+    }
+
+def translate_category(label):
+    """English label of an answer category ('question: answer')"""
+    question, _, category = label.partition(': ')
+    return f"{question}: {get_translated_label(category)}"
+
+@timed
+def plot_mca_biplot(result, top=30, seed=42):
+    """Respondents (sampled) and the answer categories contributing most to the first two dimensions"""
+    eigenvalues = result['eigenvalues']
+    respondents = result['respondents']
+    if len(respondents) > BIPLOT_SAMPLE:
+        respondents = respondents.sample(BIPLOT_SAMPLE, random_state=seed)
+
+    categories = result['categories']
+    categories = categories.loc[(categories['ctr_Dim1'] + categories['ctr_Dim2']).nlargest(top).index]
+    questions = list(dict.fromkeys(categories['question']))
+
+    plt.figure(figsize=(12, 10))
+    plt.scatter(respondents['Dim1'], respondents['Dim2'], s=6, alpha=0.2, color='gray', label='Respondents')
+    for i, question in enumerate(questions):
+        subset = categories[categories['question'] == question]
+        plt.scatter(subset['Dim1'], subset['Dim2'], s=40, marker='^',
+                    color=ARCTERYX_COLORS[i % len(ARCTERYX_COLORS)], label=question)
+        for _, row in subset.iterrows():
+            plt.annotate(get_translated_label(row['category']), (row['Dim1'], row['Dim2']), fontsize=8,
+                         xytext=(3, 3), textcoords='offset points')
+
+    plt.axhline(0, color='black', linewidth=0.5)
+    plt.axvline(0, color='black', linewidth=0.5)
+    plt.xlabel(f"Dim 1 ({eigenvalues.loc['Dim1', 'explained']:.1%} of inertia)", fontsize=12)
+    plt.ylabel(f"Dim 2 ({eigenvalues.loc['Dim2', 'explained']:.1%} of inertia)", fontsize=12)
+    plt.title('MCA Biplot: Respondents and Answer Categories', fontsize=14)
+    plt.legend(fontsize=8, loc='best')
+    plt.tight_layout()
+    plt.savefig('mca_plots/mca_biplot.png', dpi=300)
+    plt.close()
+
+@timed
+def plot_category_map(result):
+    """Every answer category on the first two dimensions, coloured by question"""
+    categories = result['categories']
+    plt.figure(figsize=(12, 10))
+    for i, (question, subset) in enumerate(categories.groupby('question', sort=False)):
+        plt.scatter(subset['Dim1'], subset['Dim2'], s=20 + 2000 * subset['mass'],
+                    color=ARCTERYX_COLORS[i % len(ARCTERYX_COLORS)], alpha=0.7, label=question)
+    plt.axhline(0, color='black', linewidth=0.5)
+    plt.axvline(0, color='black', linewidth=0.5)
+    plt.xlabel('Dim 1', fontsize=12)
+    plt.ylabel('Dim 2', fontsize=12)
+    plt.title('MCA Category Map (marker size = category mass)', fontsize=14)
+    plt.legend(fontsize=8, loc='best')
+    plt.tight_layout()
+    plt.savefig('mca_plots/mca_category_map.png', dpi=300)
+    plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Multiple correspondence analysis of all categorical answers')
+    parser.add_argument('--components', type=int, default=5)
+    parser.add_argument('--min-share', type=float, default=0.01, help='smallest share of respondents per category')
+    parser.add_argument('--top', type=int, default=10, help='categories listed per dimension')
+    args = parser.parse_args()
+
+    print("Loading data for MCA...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Running multiple correspondence analysis...")
+    result = multiple_correspondence_analysis(df, args.components, args.min_share)
+    print(f"{len(result['respondents'])} respondents ({result['n_unanswered']} without answers excluded), "
+          f"{result['n_categories']} answer categories ({result['n_rare']} rare ones left out), total inertia {result['total_inertia']:.3f}")
+    print(result['eigenvalues'].round(4).to_string())
+
+    for dimension in result['eigenvalues'].index[:2]:
+        top = result['categories'].nlargest(args.top, f'ctr_{dimension}')
+        print(f"\nCategories contributing most to {dimension}:")
+        print(pd.DataFrame({
+            'category': top['label'].map(translate_category),
+            'coordinate': top[dimension],
+            'contribution': top[f'ctr_{dimension}']
+        }).round(3).to_string(index=False))
+
+    plot_mca_biplot(result)
+    plot_category_map(result)
+    print("MCA complete! Charts saved in 'mca_plots/' directory.")
+
+if __name__ == "__main__":
+    main()
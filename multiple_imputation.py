@@ -0,0 +1,300 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy import stats
+from scipy.linalg import orthogonal_procrustes
+from factor_analyzer import FactorAnalyzer
+from factor_analyzer.factor_analyzer import calculate_kmo
+from sicas_analysis import load_data, clean_data
+from survey_encoding import item_correlation_matrix, dimension_scores
+from statistical_validation import map_questions_to_dimensions, calculate_cronbachs_alpha, get_item_block
+from instrumentation import timed
+
+# Completed datasets and chained-equation sweeps per dataset
+DEFAULT_IMPUTATIONS = 20
+MICE_ITERATIONS = 10
+
+# Predictive mean matching draws from this many closest donors
+PMM_DONORS = 5
+
+# Ridge term keeping the imputation regressions solvable when predictors are collinear
+RIDGE = 1e-6
+
+# Correlations are clipped before the Fisher z transform so perfect agreement stays finite
+MAX_CORRELATION = 0.9999
+
+def compact_items(items):
+    """Observed answers as one int8 matrix (-1 = missing) plus the coordinates of every missing cell
+
+    Every imputation shares this matrix and only stores its values for the missing cells.
+    Respondents who answered none of the items are left out, as there is nothing to condition on.
+    """
+    matrix = items['matrix']
+    answered = ~np.isnan(matrix).all(axis=1)
+    block = matrix[answered]
+    base = np.where(np.isnan(block), -1, block).astype(np.int8)
+
+    for j, code in enumerate(items['codes']):
+        if (base[:, j] >= 0).sum() < 2:
+            raise ValueError(f"Cannot impute item {code}: fewer than two observed answers")
+
+    rows, cols = np.nonzero(base < 0)
+    return {
+        'base': base,
+        'rows': rows.astype(np.int32),
+        'cols': cols.astype(np.int32),
+        'respondents': np.flatnonzero(answered),
+        'codes': items['codes']
+    }
+
+def predictive_mean_matching(X_obs, y_obs, X_mis, rng, n_donors=PMM_DONORS):
+    """Impute by drawing each missing answer from the observed answers of its closest donors
+
+    The regression coefficients used for the missing rows are drawn from their posterior, so the
+    imputations carry the uncertainty of the imputation model; donors are matched on the
+    least-squares predictions of the observed rows (type 1 matching). Imputed values are always
+    answers someone actually gave.
+    """
+    xtx = X_obs.T @ X_obs + RIDGE * np.eye(X_obs.shape[1])
+    beta = np.linalg.solve(xtx, X_obs.T @ y_obs)
+    residual = y_obs - X_obs @ beta
+    sigma = np.sqrt(residual @ residual / rng.chisquare(max(len(y_obs) - X_obs.shape[1], 1)))
+    beta_draw = beta + sigma * np.linalg.cholesky(np.linalg.inv(xtx)) @ rng.standard_normal(len(beta))
+
+    order = np.argsort(X_obs @ beta, kind='stable')
+    donors = (X_obs @ beta)[order]
+    target = X_mis @ beta_draw
+
+    # The n_donors nearest donors lie in a window of 2 * n_donors around each insertion point
+    n_donors = min(n_donors, len(order))
+    width = min(2 * n_donors, len(order))
+    start = np.clip(np.searchsorted(donors, target) - n_donors, 0, len(order) - width)
+    window = start[:, None] + np.arange(width)
+    nearest = np.argpartition(np.abs(donors[window] - target[:, None]), n_donors - 1, axis=1)[:, :n_donors]
+
+    rows = np.arange(len(target))
+    chosen = nearest[rows, rng.integers(n_donors, size=len(target))]
+    return y_obs[order[window[rows, chosen]]]
+
+def chained_equations(base, rows, cols, n_iter, rng):
+    """One MICE chain: every item with missing answers imputed by PMM on all other items, n_iter sweeps"""
+    completed = base.astype(np.float64)
+    missing = base < 0
+
+    # Start from random draws of each item's observed answers
+    items = np.unique(cols)
+    for j in items:
+        completed[missing[:, j], j] = rng.choice(base[~missing[:, j], j], size=missing[:, j].sum())
+
+    # Items with the fewest missing answers are imputed first in every sweep
+    items = items[np.argsort(missing[:, items].sum(axis=0), kind='stable')]
+    for _ in range(n_iter):
+        for j in items:
+            predictors = np.column_stack([np.ones(len(base)), np.delete(completed, j, axis=1)])
+            completed[missing[:, j], j] = predictive_mean_matching(
+                predictors[~missing[:, j]], completed[~missing[:, j], j], predictors[missing[:, j]], rng)
+
+    return completed[rows, cols].astype(np.int8)
+
+def completed_items(imputation, m):
+    """The m-th completed dataset in the item format of encode_likert_items (imputed respondents only)"""
+    matrix = imputation['base'].astype(np.float32)
+    matrix[imputation['rows'], imputation['cols']] = imputation['values'][m]
+    return {'matrix': matrix, 'missing': np.zeros(matrix.shape, dtype=bool), 'codes': imputation['codes']}
+
+def reliability_groups(dimensions):
+    """Item sets whose Cronbach's alpha is pooled: every multi-item dimension plus all items together"""
+    groups = {dimension: info['codes'] for dimension, info in dimensions.items() if len(info['codes']) >= 2}
+    all_codes = [code for info in dimensions.values() for code in info['codes']]
+    if len(all_codes) >= 2:
+        groups['overall'] = all_codes
+    return groups
+
+def _fisher_z(corr):
+    """Fisher z transform of correlations (clipped away from +-1)"""
+    return np.arctanh(np.clip(corr, -MAX_CORRELATION, MAX_CORRELATION))
+
+def imputation_estimates(items, dimensions):
+    """Reliability, validity and factor estimates of one completed dataset, on their pooling scales
+
+    Cronbach's alpha is kept as ln(1 - alpha) with Bonett's variance, correlations as Fisher z with
+    variance 1 / (n - 3). Factor loadings are fitted on the item correlations as in factor_analysis.
+    """
+    n = len(items['matrix'])
+    groups = reliability_groups(dimensions)
+    alphas = np.array([calculate_cronbachs_alpha(get_item_block(items, codes)) for codes in groups.values()])
+    sizes = np.array([len(codes) for codes in groups.values()])
+
+    scores, _ = dimension_scores(items, dimensions)
+    upper = np.triu_indices(scores.shape[1], k=1)
+    dimension_corr = item_correlation_matrix(scores)[upper]
+
+    all_codes = [code for info in dimensions.values() for code in info['codes']]
+    data = get_item_block(items, all_codes).astype(np.float64)
+    item_corr = item_correlation_matrix(data)
+
+    estimates = {
+        'alpha': np.log(1 - np.minimum(alphas, 1 - 1e-9)),
+        'alpha_variance': 2 * sizes / ((sizes - 1) * (n - 2)),
+        'dimension_z': _fisher_z(dimension_corr),
+        'item_z': _fisher_z(item_corr[np.triu_indices(len(all_codes), k=1)]),
+        'correlation_variance': 1 / (n - 3),
+        'kmo': calculate_kmo(data)[1]
+    }
+
+    if len(all_codes) >= 3:
+        fa = FactorAnalyzer(n_factors=min(5, len(all_codes)), rotation='varimax', is_corr_matrix=True)
+        fa.fit(item_corr)
+        estimates['loadings'] = fa.loadings_
+    return estimates
+
+# Worker-process state, set once per worker so the shared answer matrix is not re-sent per imputation
+_WORKER_DATA = {}
+
+def _init_worker(imputation, dimensions, n_iter):
+    """Store the observed answers, dimension map and chain length in the worker process"""
+    _WORKER_DATA['imputation'] = imputation
+    _WORKER_DATA['dimensions'] = dimensions
+    _WORKER_DATA['n_iter'] = n_iter
+
+def _run_imputation(seed):
+    """Process pool entry point: one MICE chain and the analyses of its completed dataset"""
+    imputation = _WORKER_DATA['imputation']
+    values = chained_equations(imputation['base'], imputation['rows'], imputation['cols'],
+                               _WORKER_DATA['n_iter'], np.random.default_rng(seed))
+    items = completed_items(dict(imputation, values=values[None, :]), 0)
+    return values, imputation_estimates(items, _WORKER_DATA['dimensions'])
+
+def rubin_pool(estimates, variances):
+    """Rubin's rules: pooled estimates, total variances, degrees of freedom and fraction of missing information"""
+    m = len(estimates)
+    pooled = estimates.mean(axis=0)
+    within = np.broadcast_to(np.reshape(variances, (m, -1)), estimates.shape).mean(axis=0)
+    between = estimates.var(axis=0, ddof=1) if m > 1 else np.zeros_like(pooled)
+    total = within + (1 + 1 / m) * between
+
+    # Relative increase in variance; no between-imputation spread means no missing information
+    increase = (1 + 1 / m) * between / within
+    with np.errstate(divide='ignore'):
+        dof = np.where(between > 1e-12 * within, (m - 1) * (1 + 1 / increase) ** 2, np.inf)
+    fmi = (increase + 2 / (dof + 3)) / (increase + 1)
+    return pooled, total, dof, fmi
+
+def pooled_interval(estimates, variances, inverse=None, confidence=0.95):
+    """Pooled estimate with its t-based confidence interval, mapped back through inverse if given"""
+    pooled, total, dof, fmi = rubin_pool(estimates, variances)
+    half_width = stats.t.ppf(0.5 + confidence / 2, dof) * np.sqrt(total)
+    bounds = np.stack([pooled - half_width, pooled + half_width])
+
+    if inverse is not None:
+        pooled, bounds = inverse(pooled), np.sort(inverse(bounds), axis=0)
+    return pd.DataFrame({'estimate': pooled, 'ci_lower': bounds[0], 'ci_upper': bounds[1], 'df': dof, 'fmi': fmi})
+
+@timed
+def multiple_imputation(items, dimensions, n_imputations=DEFAULT_IMPUTATIONS, n_iter=MICE_ITERATIONS, seed=42,
+                        n_jobs=None):
+    """Impute missing and skipped Likert answers by chained equations and pool the validation results
+
+    Each of the n_imputations chains runs in its own process with an independent random stream.
+    Reliability (Cronbach's alpha per multi-item dimension and overall), dimension correlations,
+    item correlations, KMO and factor loadings are computed on every completed dataset and pooled
+    with Rubin's rules; complete-case alphas are reported alongside for comparison.
+    """
+    imputation = compact_items(items)
+    seeds = np.random.SeedSequence(seed).spawn(n_imputations)
+
+    if n_jobs is None:
+        n_jobs = min(n_imputations, os.cpu_count() or 1)
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(imputation, dimensions, n_iter)) as executor:
+            runs = list(executor.map(_run_imputation, seeds))
+    else:
+        _init_worker(imputation, dimensions, n_iter)
+        runs = [_run_imputation(s) for s in seeds]
+
+    imputation['values'] = np.stack([values for values, _ in runs])
+    estimates = {key: np.stack([run[key] for _, run in runs]) for key in runs[0][1]}
+
+    # Reliability: pooled on ln(1 - alpha), next to the complete-case value the validation reports
+    groups = reliability_groups(dimensions)
+    reliability = pooled_interval(estimates['alpha'], estimates['alpha_variance'], lambda t: 1 - np.exp(t))
+    reliability.index = list(groups)
+    reliability.insert(0, 'complete_case', [calculate_cronbachs_alpha(get_item_block(items, codes))
+                                            for codes in groups.values()])
+    reliability.insert(1, 'n_complete', [int((~np.isnan(get_item_block(items, codes))).all(axis=1).sum())
+                                         for codes in groups.values()])
+
+    # Validity: pooled Fisher z correlations between dimension scores
+    _, score_names = dimension_scores(items, dimensions)
+    first, second = np.triu_indices(len(score_names), k=1)
+    dimension_correlations = pooled_interval(estimates['dimension_z'], estimates['correlation_variance'], np.tanh)
+    dimension_correlations.insert(0, 'dimension_1', [score_names[i] for i in first])
+    dimension_correlations.insert(1, 'dimension_2', [score_names[j] for j in second])
+
+    all_codes = [code for info in dimensions.values() for code in info['codes']]
+    pooled_z = rubin_pool(estimates['item_z'], estimates['correlation_variance'])[0]
+    item_correlations = np.eye(len(all_codes))
+    item_correlations[np.triu_indices(len(all_codes), k=1)] = np.tanh(pooled_z)
+    item_correlations = np.maximum(item_correlations, item_correlations.T)
+    item_correlations = pd.DataFrame(item_correlations, index=all_codes, columns=all_codes)
+
+    results = {
+        'imputation': imputation,
+        'n_imputations': n_imputations,
+        'n_respondents': len(imputation['base']),
+        'missing_rate': pd.Series((imputation['base'] < 0).mean(axis=0), index=imputation['codes']),
+        'reliability': reliability,
+        'dimension_correlations': dimension_correlations,
+        'item_correlations': item_correlations,
+        'kmo': float(estimates['kmo'].mean())
+    }
+
+    # Factor loadings: each imputation's solution is rotated onto the one of the pooled correlations
+    # (varimax factors come out in arbitrary order and sign) before averaging
+    if 'loadings' in estimates:
+        fa = FactorAnalyzer(n_factors=min(5, len(all_codes)), rotation='varimax', is_corr_matrix=True)
+        fa.fit(item_correlations.to_numpy())
+        aligned = np.stack([loadings @ orthogonal_procrustes(loadings, fa.loadings_)[0]
+                            for loadings in estimates['loadings']])
+        columns = [f'Factor {i+1}' for i in range(aligned.shape[2])]
+        results['loadings'] = pd.DataFrame(aligned.mean(axis=0), index=all_codes, columns=columns)
+        results['loading_sd'] = pd.DataFrame(aligned.std(axis=0, ddof=1) if len(aligned) > 1 else 0 * aligned[0],
+                                             index=all_codes, columns=columns)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Multiple imputation of missing Likert answers with pooled validation results')
+    parser.add_argument('--imputations', type=int, default=DEFAULT_IMPUTATIONS, help='number of completed datasets')
+    parser.add_argument('--iterations', type=int, default=MICE_ITERATIONS, help='chained-equation sweeps per dataset')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print("Loading data for multiple imputation...")
+    df = load_data()
+    df = clean_data(df)
+    items, dimensions = map_questions_to_dimensions(df)
+
+    print(f"Imputing {args.imputations} completed datasets by chained equations...")
+    results = multiple_imputation(items, dimensions, args.imputations, args.iterations, args.seed, args.jobs)
+
+    print(f"\n{results['n_respondents']} respondents; share of missing answers per item:")
+    print(results['missing_rate'].round(3).to_string())
+    print("\nCronbach's alpha, complete cases vs. pooled over imputations:")
+    print(results['reliability'].round(3).to_string())
+    print("\nPooled dimension correlations:")
+    print(results['dimension_correlations'].round(3).to_string(index=False))
+    print(f"\nPooled KMO: {results['kmo']:.3f}")
+    if 'loadings' in results:
+        print("\nPooled factor loadings:")
+        print(results['loadings'].round(3).to_string())
+
+    print("Multiple imputation complete!")
+
+if __name__ == "__main__":
+    main()
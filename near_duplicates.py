@@ -0,0 +1,136 @@
+import pandas as pd
+import numpy as np
+import re
+import zlib
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sicas_analysis import load_data, clean_data
+from instrumentation import timed
+
+# Largest prime below 2^32; shingle hashes are reduced modulo this prime
+MINHASH_PRIME = np.uint64(4294967291)
+
+# Documents per chunk when computing signatures (bounds the shingle x permutation buffer)
+SIGNATURE_CHUNK_SIZE = 20000
+
+def text_shingles(text, k=3):
+    """Hashed character k-shingles of a text (punctuation and whitespace removed)"""
+    text = re.sub(r'[^\w]', '', str(text))
+    if len(text) <= k:
+        grams = {text} if text else set()
+    else:
+        grams = {text[i:i + k] for i in range(len(text) - k + 1)}
+    return [zlib.crc32(gram.encode('utf-8')) for gram in grams]
+
+def minhash_signatures(texts, num_perm=128, k=3, seed=42):
+    """MinHash signature matrix (texts x permutations) computed chunk by chunk"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint64)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+
+    for start in range(0, len(texts), SIGNATURE_CHUNK_SIZE):
+        chunk = texts[start:start + SIGNATURE_CHUNK_SIZE]
+        shingles = [text_shingles(text, k) or [0] for text in chunk]
+        lengths = np.array([len(s) for s in shingles])
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        values = np.fromiter((h for s in shingles for h in s), dtype=np.uint64, count=lengths.sum()) % MINHASH_PRIME
+
+        # Universal hashing of every shingle, then the minimum per document
+        hashed = (values[:, None] * a[None, :] + b[None, :]) % MINHASH_PRIME
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(hashed, offsets, axis=0)
+
+    return signatures
+
+def lsh_clusters(signatures, bands=16, threshold=0.7):
+    """Group near-duplicate signatures with banded LSH and connected components"""
+    n_docs, num_perm = signatures.shape
+    rows_per_band = num_perm // bands
+    rng = np.random.default_rng(0)
+    multipliers = rng.integers(1, 2 ** 63, size=rows_per_band, dtype=np.uint64) | np.uint64(1)
+
+    edge_from, edge_to = [], []
+    for band in range(bands):
+        block = signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+
+        # Bucket key per document (wrapping multiply-add hash of the band rows)
+        with np.errstate(over='ignore'):
+            keys = (block * multipliers).sum(axis=1)
+
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        group_start = np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])
+        representative = order[np.maximum.accumulate(np.where(group_start, np.arange(n_docs), 0))]
+
+        # Link every bucket member to its bucket's first document
+        members = representative != order
+        edge_from.append(representative[members])
+        edge_to.append(order[members])
+
+    edge_from = np.concatenate(edge_from) if edge_from else np.zeros(0, dtype=np.int64)
+    edge_to = np.concatenate(edge_to) if edge_to else np.zeros(0, dtype=np.int64)
+
+    # Verify candidates with the estimated Jaccard similarity to drop false positives
+    if len(edge_from):
+        similarity = (signatures[edge_from] == signatures[edge_to]).mean(axis=1)
+        keep = similarity >= threshold
+        edge_from, edge_to = edge_from[keep], edge_to[keep]
+
+    graph = sparse.coo_matrix((np.ones(len(edge_from)), (edge_from, edge_to)), shape=(n_docs, n_docs))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+@timed
+def find_near_duplicates(series, num_perm=128, bands=16, threshold=0.7, k=3, seed=42):
+    """Per-response near-duplicate cluster IDs, cluster sizes and a duplicate quality flag"""
+    texts = series.dropna().astype(str)
+    if texts.empty:
+        return pd.DataFrame(columns=['cluster_id', 'cluster_size', 'is_near_duplicate'])
+
+    # Exact duplicates share a signature, so only distinct texts are hashed
+    text_codes, unique_texts = pd.factorize(texts)
+    signatures = minhash_signatures(list(unique_texts), num_perm, k, seed)
+    unique_clusters = lsh_clusters(signatures, bands, threshold)
+
+    cluster_id = unique_clusters[text_codes]
+    cluster_size = np.bincount(cluster_id)[cluster_id]
+
+    # The first response in each cluster is kept; later ones are flagged
+    first_in_cluster = ~pd.Series(cluster_id, index=texts.index).duplicated()
+
+    return pd.DataFrame({
+        'cluster_id': cluster_id,
+        'cluster_size': cluster_size,
+        'is_near_duplicate': ~first_in_cluster.to_numpy()
+    }, index=texts.index)
+
+def deduplicated_view(series, duplicates):
+    """Responses with near-duplicates collapsed to the first member of each cluster"""
+    keep = duplicates.index[~duplicates['is_near_duplicate']]
+    return series.loc[keep]
+
+def representative_view(series, duplicates):
+    """Every response replaced by the first member of its cluster, so each cluster keeps all its respondents"""
+    first = duplicates.loc[~duplicates['is_near_duplicate'], 'cluster_id']
+    representatives = pd.Series(series.loc[first.index].to_numpy(), index=first.to_numpy())
+    return pd.Series(representatives.loc[duplicates['cluster_id']].to_numpy(), index=series.index)
+
+def main():
+    from text_mining import get_suggestion_texts
+
+    print("Loading data for near-duplicate detection...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Building MinHash/LSH index over suggestion texts...")
+    texts = get_suggestion_texts(df)
+    duplicates = find_near_duplicates(texts)
+
+    n_flagged = int(duplicates['is_near_duplicate'].sum())
+    n_clusters = int((duplicates.groupby('cluster_id').size() > 1).sum())
+    print(f"{len(texts)} suggestions, {n_flagged} flagged as near-duplicates in {n_clusters} clusters.")
+    print(f"{len(deduplicated_view(texts, duplicates))} suggestions remain after deduplication.")
+
+if __name__ == "__main__":
+    main()
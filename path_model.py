@@ -0,0 +1,209 @@
+import pandas as pd
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from sicas_analysis import load_data, clean_data
+from survey_encoding import encode_likert_items
+from survey_weighting import respondent_weights, effective_weights
+from instrumentation import timed
+
+# Sequential SICAS chain: each stage is explained by every earlier stage
+SICAS_STAGES = [
+    ('sense', ['S1']),
+    ('interest', ['I1']),
+    ('communication', ['C1', 'C2']),
+    ('action', ['A1']),
+    ('share', ['S2'])
+]
+
+# Stages with a binary outcome get a logistic link
+BINARY_STAGES = ['action']
+
+STAGE_DISPLAY = {
+    'sense': 'Sense',
+    'interest': 'Interest',
+    'communication': 'Communication',
+    'action': 'Action',
+    'share': 'Share'
+}
+
+def build_stage_patterns(items, weights=None):
+    """Score each stage and collapse respondents into unique score patterns with (optionally weighted) counts"""
+
+    matrix = items['matrix']
+    stage_scores = []
+    for stage, codes in SICAS_STAGES:
+        columns = [items['codes'].index(code) for code in codes if code in items['codes']]
+        if not columns:
+            raise ValueError(f"No encoded items available for the {stage} stage")
+        stage_scores.append(np.nanmean(matrix[:, columns], axis=1) if len(columns) > 1 else matrix[:, columns[0]])
+
+    scores = np.column_stack(stage_scores).astype(np.float64)
+    complete = ~np.isnan(scores).any(axis=1)
+    scores = scores[complete]
+
+    # Estimation only needs the distinct patterns and how often they occur
+    if weights is None:
+        patterns, counts = np.unique(scores, axis=0, return_counts=True)
+        return patterns, counts.astype(np.float64)
+
+    # Weighted counts sum to the effective sample size, which also sizes the bootstrap resamples
+    patterns, inverse = np.unique(scores, axis=0, return_inverse=True)
+    counts = np.bincount(inverse.ravel(), weights=effective_weights(np.asarray(weights, dtype=np.float64)[complete]))
+    keep = counts > 0
+    return patterns[keep], counts[keep]
+
+def weighted_moments(patterns, counts):
+    """Mean vector and covariance matrix from pattern frequencies"""
+    n = counts.sum()
+    mean = counts @ patterns / n
+    centered = patterns - mean
+    covariance = (centered * counts[:, None]).T @ centered / (n - 1)
+    return mean, covariance
+
+def fit_grouped_logit(X, y, counts, max_iter=50, tol=1e-8):
+    """Logistic regression on grouped data by iteratively reweighted least squares"""
+    design = np.column_stack([np.ones(len(X)), X])
+    beta = np.zeros(design.shape[1])
+
+    for _ in range(max_iter):
+        eta = design @ beta
+        p = 1 / (1 + np.exp(-eta))
+        w = counts * np.clip(p * (1 - p), 1e-10, None)
+        hessian = (design * w[:, None]).T @ design + 1e-8 * np.eye(design.shape[1])
+        gradient = design.T @ (counts * (y - p))
+        step = np.linalg.solve(hessian, gradient)
+        beta = beta + step
+        if np.abs(step).max() < tol:
+            break
+
+    return beta
+
+def fit_sicas_path_model(patterns, counts):
+    """Fit the recursive SICAS path model and return standardized direct/indirect/total effects"""
+
+    n_stages = len(SICAS_STAGES)
+    stage_names = [stage for stage, _ in SICAS_STAGES]
+    mean, covariance = weighted_moments(patterns, counts)
+    sd = np.sqrt(np.diag(covariance))
+
+    direct = np.zeros((n_stages, n_stages))
+    r_squared = {}
+
+    for j in range(1, n_stages):
+        predictors = list(range(j))
+
+        if stage_names[j] in BINARY_STAGES:
+            # Logistic link, standardized on the latent-response scale
+            beta = fit_grouped_logit(patterns[:, predictors], patterns[:, j], counts)[1:]
+            explained = beta @ covariance[np.ix_(predictors, predictors)] @ beta
+            latent_sd = np.sqrt(explained + np.pi ** 2 / 3)
+            direct[j, predictors] = beta * sd[predictors] / latent_sd
+            r_squared[stage_names[j]] = explained / (explained + np.pi ** 2 / 3)
+        else:
+            # Linear equations only need the covariance matrix
+            sxx = covariance[np.ix_(predictors, predictors)]
+            sxy = covariance[predictors, j]
+            beta = np.linalg.solve(sxx, sxy)
+            direct[j, predictors] = beta * sd[predictors] / sd[j]
+            r_squared[stage_names[j]] = sxy @ beta / covariance[j, j]
+
+    # Path tracing: total effects of a recursive system are (I - B)^-1 - I
+    total = np.linalg.inv(np.eye(n_stages) - direct) - np.eye(n_stages)
+    indirect = total - direct
+
+    return {'direct': direct, 'indirect': indirect, 'total': total, 'r_squared': r_squared}
+
+def _bootstrap_chunk(task):
+    """Refit the path model on a chunk of multinomial bootstrap replicates"""
+    patterns, counts, n_replicates, seed = task
+    rng = np.random.default_rng(seed)
+    n = int(counts.sum())
+    probabilities = counts / counts.sum()
+
+    direct = np.empty((n_replicates, len(SICAS_STAGES), len(SICAS_STAGES)))
+    total = np.empty_like(direct)
+    for b in range(n_replicates):
+        # Resampling respondents is equivalent to redrawing the pattern counts
+        replicate_counts = rng.multinomial(n, probabilities).astype(np.float64)
+        keep = replicate_counts > 0
+        fit = fit_sicas_path_model(patterns[keep], replicate_counts[keep])
+        direct[b] = fit['direct']
+        total[b] = fit['total']
+
+    return direct, total
+
+def bootstrap_path_model(patterns, counts, n_bootstrap=1000, seed=42, n_jobs=None):
+    """Percentile bootstrap replicates of the direct, indirect and total effects"""
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, n_bootstrap))
+
+    chunk_sizes = [len(chunk) for chunk in np.array_split(np.arange(n_bootstrap), n_jobs)]
+    seeds = np.random.SeedSequence(seed).spawn(n_jobs)
+    tasks = [(patterns, counts, size, child) for size, child in zip(chunk_sizes, seeds)]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            chunks = list(executor.map(_bootstrap_chunk, tasks))
+    else:
+        chunks = [_bootstrap_chunk(task) for task in tasks]
+
+    direct = np.concatenate([chunk[0] for chunk in chunks])
+    total = np.concatenate([chunk[1] for chunk in chunks])
+
+    return {'direct': direct, 'indirect': total - direct, 'total': total}
+
+@timed
+def analyze_sicas_paths(df, n_bootstrap=1000, seed=42, n_jobs=None, weights=None):
+    """Fit the SICAS chain on the encoded item matrix with bootstrap confidence intervals"""
+
+    items = encode_likert_items(df)
+    patterns, counts = build_stage_patterns(items, respondent_weights(df, weights))
+
+    estimates = fit_sicas_path_model(patterns, counts)
+    replicates = bootstrap_path_model(patterns, counts, n_bootstrap, seed, n_jobs)
+
+    stage_names = [stage for stage, _ in SICAS_STAGES]
+    records = []
+    for j in range(1, len(stage_names)):
+        for i in range(j):
+            record = {'cause': stage_names[i], 'outcome': stage_names[j]}
+            for effect in ['direct', 'indirect', 'total']:
+                record[effect] = estimates[effect][j, i]
+                record[f'{effect}_ci_low'] = np.percentile(replicates[effect][:, j, i], 2.5)
+                record[f'{effect}_ci_high'] = np.percentile(replicates[effect][:, j, i], 97.5)
+            records.append(record)
+
+    return {
+        'effects': pd.DataFrame(records),
+        'r_squared': estimates['r_squared'],
+        # Effective sample size when weighted
+        'n_respondents': int(round(counts.sum())),
+        'n_patterns': len(patterns),
+        'n_bootstrap': n_bootstrap
+    }
+
+def format_effect(row, effect):
+    """Format an effect estimate with its bootstrap interval"""
+    return f"{row[effect]:.2f} [{row[f'{effect}_ci_low']:.2f}, {row[f'{effect}_ci_high']:.2f}]"
+
+def main():
+    print("Loading data for SICAS path analysis...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Fitting sequential SICAS path model with bootstrap confidence intervals...")
+    path_results = analyze_sicas_paths(df)
+
+    print(f"Respondents: {path_results['n_respondents']}, unique response patterns: {path_results['n_patterns']}")
+    for _, row in path_results['effects'].iterrows():
+        print(f"{STAGE_DISPLAY[row['cause']]} -> {STAGE_DISPLAY[row['outcome']]}: "
+              f"direct {format_effect(row, 'direct')}, indirect {format_effect(row, 'indirect')}, "
+              f"total {format_effect(row, 'total')}")
+    for stage, r2 in path_results['r_squared'].items():
+        print(f"R-squared ({STAGE_DISPLAY[stage]}): {r2:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from scipy import sparse
+from sicas_analysis import load_data, clean_data, get_translated_label
+from significance_testing import DEMOGRAPHIC_COLUMNS
+from sequential_funnel import analyze_sequential_funnel
+from survey_config import survey_routing
+from survey_encoding import LIKERT_REGISTRY, MULTISELECT_QUESTIONS, encode_likert_items, encode_multiselect
+from thesis_enhancements import ARCTERYX_COLORS
+from instrumentation import timed
+
+# Create output directory
+if not os.path.exists('persona_plots'):
+    os.makedirs('persona_plots')
+
+# Cluster counts searched by default, and random restarts per count
+DEFAULT_K_VALUES = [2, 3, 4, 5, 6, 7, 8]
+DEFAULT_RESTARTS = 10
+
+@timed
+def encode_persona_features(df):
+    """Integer-coded (respondents x features) int8 matrix for clustering; -1 marks a missing answer
+
+    Demographics are factorized, Likert items use their scale position, and every option of
+    the multi-select questions becomes a 0/1 feature. Questions routed on another answer
+    (purchase channels and barriers) are left out, since their skips only repeat that answer.
+    """
+    columns = []
+    features = []
+
+    for key, column in DEMOGRAPHIC_COLUMNS.items():
+        if column in df.columns:
+            codes, levels = pd.factorize(df[column])
+            columns.append(codes)
+            features.append({'feature': key, 'group': 'demographic', 'levels': list(levels)})
+
+    items = encode_likert_items(df)
+    for j, code in enumerate(items['codes']):
+        scale = LIKERT_REGISTRY[code]['scale']
+        values = sorted(set(scale.values()))
+        # First answer of each scale value names the level (aliases share a value)
+        labels = [next(answer for answer, value in scale.items() if value == v) for v in values]
+        positions = np.searchsorted(values, np.nan_to_num(items['matrix'][:, j], nan=values[0]))
+        columns.append(np.where(items['missing'][:, j], -1, positions))
+        features.append({'feature': LIKERT_REGISTRY[code]['label'], 'group': 'likert', 'levels': labels})
+
+    routed = set(survey_routing())
+    for key, column in MULTISELECT_QUESTIONS.items():
+        if key in routed or column not in df.columns:
+            continue
+        indicator, options = encode_multiselect(df[column])
+        indicator = indicator.toarray()
+        for j, option in enumerate(options):
+            columns.append(indicator[:, j])
+            features.append({'feature': f'{key}: {option}', 'group': key, 'levels': ['no', 'yes']})
+
+    X = np.ascontiguousarray(np.column_stack(columns), dtype=np.int8)
+    return X, features
+
+def pattern_ids(X, n_levels):
+    """Id of every respondent's answer pattern (0..patterns-1, in order of first appearance)
+
+    Each row is packed into an int64 key in mixed radix (one digit per feature, missing as 0);
+    whenever the next digit would overflow, the keys so far are re-numbered densely first.
+    """
+    keys = np.zeros(len(X), dtype=np.int64)
+    size = 1
+    for f, levels in enumerate(n_levels):
+        radix = int(levels) + 1
+        if size * radix >= 2 ** 62:
+            keys, uniques = pd.factorize(keys)
+            size = len(uniques)
+        keys = keys * radix + (X[:, f] + 1)
+        size *= radix
+    ids, uniques = pd.factorize(keys)
+    return ids, len(uniques)
+
+def collapse_patterns(X, n_levels):
+    """Distinct answer patterns with their respondent counts, and each respondent's pattern"""
+    ids, n_patterns = pattern_ids(X, n_levels)
+    _, first = np.unique(ids, return_index=True)
+    return X[first], np.bincount(ids, minlength=n_patterns).astype(np.float64), ids
+
+def build_design(X, n_levels):
+    """Float32 indicator columns that turn k-modes assignment and mode updates into matrix products
+
+    Complete 0/1 features (the multi-select options) keep a single column; every other
+    feature gets one column per level, all zero where the answer is missing.
+    """
+    binary = (n_levels == 2) & (X >= 0).all(axis=0)
+    column_feature = np.repeat(np.arange(len(n_levels)), np.where(binary, 1, n_levels))
+    column_level = np.concatenate([[1] if binary[f] else np.arange(levels) for f, levels in enumerate(n_levels)])
+    return {
+        'matrix': (X[:, column_feature] == column_level).astype(np.float32),
+        'feature': column_feature,
+        'level': column_level,
+        'binary': binary,
+        'n_levels': n_levels
+    }
+
+def mismatches(design, modes):
+    """(respondents x clusters) number of features differing from each cluster mode
+
+    Matches are one matrix product: a 0/1 feature matches when x * (2m - 1) + (1 - m) is 1,
+    any other feature when the indicator column of the mode's level is set. Missing answers
+    differ from every mode, which adds the same constant to all clusters of a respondent and
+    so never changes an assignment.
+    """
+    feature, level, binary = design['feature'], design['level'], design['binary']
+    selected = modes[:, feature] == level
+    column_binary = binary[feature]
+    weights = np.where(column_binary, 2 * selected - 1, selected).astype(np.float32)
+    offset = ((1 - selected) * column_binary).sum(axis=1)
+    matches = design['matrix'] @ weights.T + offset
+    return (len(binary) - matches).astype(np.int32)
+
+def update_modes(design, labels, weights, modes):
+    """Most frequent (weighted) level of every feature within each cluster; empty clusters keep their mode"""
+    k = len(modes)
+    n = len(labels)
+    membership = sparse.csr_matrix((weights.astype(np.float32), (labels, np.arange(n))), shape=(k, n))
+    counts = np.asarray(membership @ design['matrix'], dtype=np.float64)
+    sizes = np.bincount(labels, weights=weights, minlength=k)
+
+    new_modes = modes.copy()
+    feature = design['feature']
+    for f, levels in enumerate(design['n_levels']):
+        feature_counts = counts[:, feature == f]
+        if design['binary'][f]:
+            # Weighted 'yes' count against the rest; ties go to 'no' like argmax
+            new_modes[:, f] = 2 * feature_counts[:, 0] > sizes
+        else:
+            new_modes[:, f] = feature_counts.argmax(axis=1)
+
+    new_modes[sizes == 0] = modes[sizes == 0]
+    return new_modes
+
+def initial_modes(X, design, weights, k, rng):
+    """k-modes++ seeding: each new mode is a pattern drawn with probability proportional to its distance"""
+    modes = [X[rng.choice(len(X), p=weights / weights.sum())]]
+    nearest = mismatches(design, np.array(modes))[:, 0].astype(np.float64)
+    for _ in range(1, k):
+        probabilities = weights * nearest
+        if probabilities.sum() <= 0:
+            probabilities = weights
+        modes.append(X[rng.choice(len(X), p=probabilities / probabilities.sum())])
+        nearest = np.minimum(nearest, mismatches(design, np.array(modes[-1:]))[:, 0])
+    return np.array(modes)
+
+def fit_kmodes(X, weights, design, k, seed=42, max_iter=100):
+    """Weighted k-modes (Huang) from one random start; returns modes, cost and iterations"""
+    rng = np.random.default_rng(seed)
+    modes = initial_modes(X, design, weights, k, rng)
+    labels = None
+
+    for iteration in range(1, max_iter + 1):
+        distances = mismatches(design, modes)
+        new_labels = distances.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        modes = update_modes(design, labels, weights, modes)
+
+    # Observed answers that differ from their cluster's mode (missing answers are not counted)
+    missing = np.count_nonzero(X < 0, axis=1)
+    cost = float((weights * (distances[np.arange(len(X)), labels] - missing)).sum())
+    return {'k': k, 'seed': seed, 'modes': modes, 'cost': cost, 'iterations': iteration}
+
+# Worker-process state, set once per worker so the coded patterns are not re-sent (or re-encoded) per restart
+_WORKER_DATA = {}
+
+def _init_worker(X, weights, n_levels):
+    """Store the shared coded patterns and their indicator design in the worker process"""
+    _WORKER_DATA['X'] = X
+    _WORKER_DATA['weights'] = weights
+    _WORKER_DATA['design'] = build_design(X, n_levels)
+
+def _fit_restart(task):
+    """Process pool entry point for one (k, seed) restart"""
+    k, seed = task
+    return fit_kmodes(_WORKER_DATA['X'], _WORKER_DATA['weights'], _WORKER_DATA['design'], k, seed)
+
+def select_k(summary):
+    """Elbow of the cost curve: the k after which adding a cluster gains the least relative to the step before"""
+    costs = summary['best_cost'].to_numpy()
+    if len(costs) < 3:
+        return int(summary['k'].iloc[0])
+    curvature = costs[:-2] - 2 * costs[1:-1] + costs[2:]
+    return int(summary['k'].iloc[1 + int(np.argmax(curvature))])
+
+@timed
+def cluster_personas(df, k_values=None, n_restarts=DEFAULT_RESTARTS, seed=42, n_jobs=None, k=None):
+    """k-modes personas: every k and restart in a process pool, the best restart per k, and the elbow k
+
+    Respondents with identical answers are clustered once as a weighted pattern.
+    """
+    if k_values is None:
+        k_values = DEFAULT_K_VALUES if k is None else [k]
+
+    X, features = encode_persona_features(df)
+    n_levels = np.array([len(feature['levels']) for feature in features])
+    patterns, weights, inverse = collapse_patterns(X, n_levels)
+
+    k_values = [value for value in k_values if value <= len(patterns)]
+    tasks = [(value, seed + restart) for value in k_values for restart in range(n_restarts)]
+
+    if n_jobs is None:
+        n_jobs = min(len(tasks), os.cpu_count() or 1)
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(patterns, weights, n_levels)) as executor:
+            fits = list(executor.map(_fit_restart, tasks))
+    else:
+        _init_worker(patterns, weights, n_levels)
+        fits = [_fit_restart(task) for task in tasks]
+
+    runs = pd.DataFrame([{key: fit[key] for key in ('k', 'seed', 'cost', 'iterations')} for fit in fits])
+    summary = runs.groupby('k').agg(best_cost=('cost', 'min'), mean_cost=('cost', 'mean'),
+                                    restarts=('cost', 'size'), mean_iterations=('iterations', 'mean')).reset_index()
+    chosen = k if k is not None else select_k(summary)
+    best = min((fit for fit in fits if fit['k'] == chosen), key=lambda fit: fit['cost'])
+
+    labels = mismatches(build_design(patterns, n_levels), best['modes']).argmin(axis=1)[inverse]
+    return {
+        'features': features,
+        'X': X,
+        'k': chosen,
+        'modes': best['modes'],
+        'labels': pd.Series(labels + 1, index=df.index, name='persona'),
+        'summary': summary,
+        'runs': runs,
+        'n_patterns': len(patterns)
+    }
+
+def persona_profiles(personas, min_share=0.3, top_n=5):
+    """Size, modal answers and most over-represented answers (lift vs. the whole sample) of each persona"""
+    X, features = personas['X'], personas['features']
+    labels = personas['labels'].to_numpy()
+    records = []
+
+    for persona in np.unique(labels):
+        members = X[labels == persona]
+        distinctive = []
+        for f, feature in enumerate(features):
+            observed_all = X[:, f][X[:, f] >= 0]
+            observed = members[:, f][members[:, f] >= 0]
+            if len(observed) == 0:
+                continue
+            overall = np.bincount(observed_all, minlength=len(feature['levels'])) / len(observed_all)
+            share = np.bincount(observed, minlength=len(feature['levels'])) / len(observed)
+            for level, (s, o) in enumerate(zip(share, overall)):
+                # Absent options of multi-select questions are not a description
+                if feature['group'] not in ('demographic', 'likert') and level == 0:
+                    continue
+                if s >= min_share and o > 0:
+                    distinctive.append((s / o, feature['feature'], feature['levels'][level], s, o))
+
+        distinctive.sort(reverse=True)
+        for lift, feature, level, share, overall in distinctive[:top_n]:
+            records.append({
+                'persona': persona,
+                'size': int((labels == persona).sum()),
+                'feature': feature,
+                'level': level,
+                'share': share,
+                'overall_share': overall,
+                'lift': lift
+            })
+
+    return pd.DataFrame(records)
+
+def persona_modes(personas):
+    """Modal answer of every feature per persona (demographics and Likert items), translated"""
+    rows = {}
+    for c, mode in enumerate(personas['modes'], start=1):
+        rows[c] = {feature['feature']: get_translated_label(feature['levels'][mode[f]])
+                   for f, feature in enumerate(personas['features']) if feature['group'] in ('demographic', 'likert')}
+    return pd.DataFrame(rows).T.rename_axis('persona')
+
+def translate_feature(name):
+    """English label of a feature; multi-select features are named 'question: option'"""
+    question, separator, option = name.partition(': ')
+    return f"{question}: {get_translated_label(option)}" if separator else name
+
+@timed
+def persona_funnels(df, personas):
+    """Respondent-level SICAS funnel of each persona"""
+    funnel = analyze_sequential_funnel(df.assign(persona=personas['labels']), segments={'persona': 'persona'})
+    return funnel['segments'].drop(index='all', level='segment').droplevel('segment').sort_index()
+
+@timed
+def plot_persona_funnels(funnels):
+    """Cumulative funnel reach per persona"""
+    reach = funnels['reach']
+    plt.figure(figsize=(10, 6))
+    for i, (persona, row) in enumerate(reach.iterrows()):
+        size = int(funnels.loc[persona, ('n', 'respondents')])
+        plt.plot(row.index, row.to_numpy(), marker='o', linewidth=2, color=ARCTERYX_COLORS[i % len(ARCTERYX_COLORS)],
+                 label=f'Persona {persona} (n={size})')
+    plt.ylim(0, 1)
+    plt.title('SICAS Funnel by Persona', fontsize=14)
+    plt.ylabel('Share of respondents passing every stage so far', fontsize=12)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig('persona_plots/persona_funnels.png', dpi=300)
+    plt.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Cluster respondents into personas with k-modes')
+    parser.add_argument('--k', type=int, default=None, help='fixed number of personas (default: elbow of 2-8)')
+    parser.add_argument('--restarts', type=int, default=DEFAULT_RESTARTS)
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    print("Loading data for persona clustering...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Clustering respondents...")
+    personas = cluster_personas(df, n_restarts=args.restarts, n_jobs=args.jobs, k=args.k)
+    print(f"{len(personas['features'])} features, {personas['n_patterns']} distinct answer patterns")
+    print(personas['summary'].round(2).to_string(index=False))
+    print(f"Selected k = {personas['k']}")
+
+    print("\nPersona sizes:")
+    print(personas['labels'].value_counts().sort_index().to_string())
+
+    print("\nModal answers:")
+    print(persona_modes(personas).to_string())
+
+    print("\nMost distinctive answers:")
+    profiles = persona_profiles(personas)
+    profiles['feature'] = profiles['feature'].map(translate_feature)
+    profiles['level'] = profiles['level'].map(get_translated_label)
+    print(profiles.round(3).to_string(index=False))
+
+    print("\nPersona funnels:")
+    funnels = persona_funnels(df, personas)
+    print(funnels.round(3).to_string())
+    plot_persona_funnels(funnels)
+
+    print("Persona clustering complete! Chart saved in 'persona_plots/' directory.")
+
+if __name__ == "__main__":
+    main()
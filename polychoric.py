@@ -0,0 +1,181 @@
+import pandas as pd
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from scipy import stats, optimize
+from sicas_analysis import load_data, clean_data
+from survey_encoding import LIKERT_REGISTRY, encode_likert_items
+from instrumentation import timed
+
+# Thresholds are clipped so that open-ended categories stay finite in the integrand
+THRESHOLD_BOUND = 10.0
+RHO_BOUND = 0.995
+
+# Gauss-Legendre nodes on [0, 1] used to integrate the bivariate normal density over rho
+_GL_NODES, _GL_WEIGHTS = np.polynomial.legendre.leggauss(48)
+_GL_NODES = (_GL_NODES + 1) / 2
+_GL_WEIGHTS = _GL_WEIGHTS / 2
+
+def ordinal_category_codes(matrix):
+    """Convert each encoded item column to compact category codes 0..k-1 (-1 = missing)"""
+    codes = np.full(matrix.shape, -1, dtype=np.int64)
+    n_categories = []
+
+    for j in range(matrix.shape[1]):
+        column = matrix[:, j]
+        observed = ~np.isnan(column)
+        levels, inverse = np.unique(column[observed], return_inverse=True)
+        codes[observed, j] = inverse
+        n_categories.append(len(levels))
+
+    return codes, n_categories
+
+def estimate_thresholds(codes, n_categories, weights=None):
+    """Estimate the latent normal thresholds of every item from its (optionally weighted) marginal distribution"""
+    thresholds = []
+
+    for j, k in enumerate(n_categories):
+        column = codes[:, j]
+        observed = column >= 0
+        counts = np.bincount(column[observed], weights=weights[observed] if weights is not None else None,
+                             minlength=k)
+        cumulative = np.cumsum(counts)[:-1] / counts.sum()
+        inner = np.clip(stats.norm.ppf(cumulative), -THRESHOLD_BOUND, THRESHOLD_BOUND)
+        thresholds.append(np.concatenate([[-THRESHOLD_BOUND], inner, [THRESHOLD_BOUND]]))
+
+    return thresholds
+
+def contingency_tables(codes, n_categories, weights=None):
+    """Count the contingency table of every item pair from the category codes (weighted counts if given)"""
+    tables = {}
+    n_items = codes.shape[1]
+
+    for i in range(n_items):
+        for j in range(i + 1, n_items):
+            valid = (codes[:, i] >= 0) & (codes[:, j] >= 0)
+            cells = np.bincount(codes[valid, i] * n_categories[j] + codes[valid, j],
+                                weights=weights[valid] if weights is not None else None,
+                                minlength=n_categories[i] * n_categories[j])
+            tables[(i, j)] = cells.reshape(n_categories[i], n_categories[j])
+
+    return tables
+
+def bivariate_normal_density(h, k, rho):
+    """Standard bivariate normal density, which is also d/d rho of the CDF (broadcast over h, k and rho)"""
+    one_minus_r2 = 1 - rho ** 2
+    return np.exp(-(h ** 2 - 2 * rho * h * k + k ** 2) / (2 * one_minus_r2)) / (2 * np.pi * np.sqrt(one_minus_r2))
+
+def bivariate_normal_cdf(h, k, rho):
+    """Standard bivariate normal CDF via Plackett's identity, vectorized over h, k and (broadcastable) rho"""
+    h = np.asarray(h, dtype=float)[..., None]
+    k = np.asarray(k, dtype=float)[..., None]
+    rho = np.asarray(rho, dtype=float)[..., None]
+
+    # Integrate the density d/dr Phi2(h, k; r) from 0 to rho
+    density = bivariate_normal_density(h, k, rho * _GL_NODES)
+    integral = rho[..., 0] * (density * _GL_WEIGHTS).sum(axis=-1)
+
+    return stats.norm.cdf(h[..., 0]) * stats.norm.cdf(k[..., 0]) + integral
+
+def cell_differences(grid):
+    """Rectangle probabilities of the cells from a function evaluated on the (last two axes') threshold grid"""
+    return grid[..., 1:, 1:] - grid[..., :-1, 1:] - grid[..., 1:, :-1] + grid[..., :-1, :-1]
+
+def fit_polychoric_pair(table, row_thresholds, col_thresholds):
+    """Maximum likelihood correlation for one contingency table with fixed thresholds"""
+    table = np.asarray(table, dtype=float)
+    if table.sum() == 0 or table.shape[0] < 2 or table.shape[1] < 2:
+        return np.nan
+
+    h, k = np.meshgrid(row_thresholds, col_thresholds, indexing='ij')
+
+    def negative_log_likelihood(rho):
+        cell_probabilities = cell_differences(bivariate_normal_cdf(h, k, rho))
+        return -(table * np.log(np.maximum(cell_probabilities, 1e-300))).sum()
+
+    result = optimize.minimize_scalar(negative_log_likelihood, bounds=(-RHO_BOUND, RHO_BOUND),
+                                      method='bounded', options={'xatol': 1e-6})
+    return result.x
+
+def _fit_pair_task(task):
+    """Process pool entry point for one item pair"""
+    pair, table, row_thresholds, col_thresholds = task
+    return pair, fit_polychoric_pair(table, row_thresholds, col_thresholds)
+
+def nearest_correlation_matrix(corr):
+    """Clip negative eigenvalues so pairwise estimates form a valid correlation matrix"""
+    eigenvalues, eigenvectors = np.linalg.eigh(corr)
+    if eigenvalues.min() > 0:
+        return corr
+
+    smoothed = eigenvectors @ np.diag(np.maximum(eigenvalues, 1e-6)) @ eigenvectors.T
+    scale = np.sqrt(np.diag(smoothed))
+    smoothed = smoothed / np.outer(scale, scale)
+    np.fill_diagonal(smoothed, 1.0)
+
+    return smoothed
+
+@timed
+def polychoric_correlation_matrix(items, n_jobs=None, weights=None):
+    """Polychoric (tetrachoric for binary pairs) correlation matrix of the encoded items
+
+    Respondent weights (one per row of the item matrix) give pseudo-maximum-likelihood estimates.
+    """
+
+    codes, n_categories = ordinal_category_codes(items['matrix'])
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+    thresholds = estimate_thresholds(codes, n_categories, weights)
+    tables = contingency_tables(codes, n_categories, weights)
+
+    # Only the small per-pair tables are shipped to the workers
+    tasks = [(pair, table, thresholds[pair[0]], thresholds[pair[1]])
+             for pair, table in tables.items()]
+
+    if n_jobs is None:
+        n_jobs = min(len(tasks), os.cpu_count() or 1)
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            fitted = list(executor.map(_fit_pair_task, tasks))
+    else:
+        fitted = [_fit_pair_task(task) for task in tasks]
+
+    n_items = len(items['codes'])
+    corr = np.eye(n_items)
+    for (i, j), rho in fitted:
+        corr[i, j] = corr[j, i] = rho
+
+    if not np.isnan(corr).any():
+        corr = nearest_correlation_matrix(corr)
+
+    return pd.DataFrame(corr, index=items['codes'], columns=items['codes'])
+
+def correlation_types(items):
+    """Label each item pair as tetrachoric (binary x binary) or polychoric"""
+    _, n_categories = ordinal_category_codes(items['matrix'])
+    labels = pd.DataFrame('polychoric', index=items['codes'], columns=items['codes'])
+
+    for i, ki in enumerate(n_categories):
+        for j, kj in enumerate(n_categories):
+            if ki == 2 and kj == 2:
+                labels.iloc[i, j] = 'tetrachoric'
+
+    return labels
+
+def main():
+    print("Loading data for polychoric correlation analysis...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Encoding SICAS items...")
+    items = encode_likert_items(df)
+
+    print("Estimating polychoric correlation matrix...")
+    corr = polychoric_correlation_matrix(items)
+    corr.index = [LIKERT_REGISTRY[code]['label'] for code in corr.index]
+    corr.columns = corr.index
+    print(corr.round(3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import os
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score, log_loss
+from sklearn.model_selection import StratifiedKFold
+from sicas_analysis import load_data, clean_data, get_translated_label
+from significance_testing import DEMOGRAPHIC_COLUMNS
+from survey_encoding import (LIKERT_REGISTRY, MULTISELECT_QUESTIONS, encode_likert_items,
+                             encode_multiselect, encode_categorical)
+from instrumentation import timed
+
+# Create output directory
+if not os.path.exists('model_plots'):
+    os.makedirs('model_plots')
+
+# Likert predictors (the purchase item itself is the target)
+PREDICTOR_ITEMS = ['S1', 'I1', 'C1', 'C2', 'S2']
+
+# Multi-select predictors; purchase channels and barriers are routed on the target and excluded
+PREDICTOR_MULTISELECT = ['contact_channels', 'interaction_types', 'brand_impression', 'improvements']
+
+# Inverse regularization strengths searched by cross-validation
+DEFAULT_C_GRID = [0.01, 0.03, 0.1, 0.3, 1.0, 3.0, 10.0]
+
+@timed
+def build_design_matrix(df):
+    """Build the CSR design matrix and purchase target once for all folds"""
+
+    target = encode_likert_items(df, ['A1'])
+    if not target['codes']:
+        raise ValueError("Purchase question not found in the survey data")
+    y = target['matrix'][:, 0]
+    keep = ~np.isnan(y)
+
+    blocks = []
+    feature_names = []
+    feature_groups = []
+
+    # Demographics: one-hot indicators
+    for key, col in DEMOGRAPHIC_COLUMNS.items():
+        if col in df.columns:
+            one_hot, levels = encode_categorical(df[col])
+            blocks.append(one_hot)
+            feature_names.extend(levels)
+            feature_groups.extend([key] * len(levels))
+
+    # Likert items: centered codes, missing answers set to the mean (zero)
+    items = encode_likert_items(df, PREDICTOR_ITEMS)
+    if items['codes']:
+        matrix = items['matrix'][keep]
+        centered = items['matrix'] - np.nanmean(matrix, axis=0)
+        centered[items['missing']] = 0
+        blocks.append(sparse.csr_matrix(centered.astype(np.float64)))
+        feature_names.extend([LIKERT_REGISTRY[code]['label'] for code in items['codes']])
+        feature_groups.extend(['likert'] * len(items['codes']))
+
+    # Multi-select indicators
+    for key in PREDICTOR_MULTISELECT:
+        col = MULTISELECT_QUESTIONS[key]
+        if col in df.columns:
+            indicator, options = encode_multiselect(df[col])
+            blocks.append(indicator)
+            feature_names.extend(options)
+            feature_groups.extend([key] * len(options))
+
+    X = sparse.hstack(blocks, format='csr', dtype=np.float64)[np.flatnonzero(keep)]
+
+    return {
+        'X': X,
+        'y': y[keep].astype(np.int64),
+        'rows': np.flatnonzero(keep),
+        'feature_names': feature_names,
+        'feature_groups': feature_groups
+    }
+
+# Worker-process state, set once per worker so the design matrix is not re-sent per task
+_WORKER_DATA = {}
+
+def _init_worker(X, y):
+    """Store the shared design matrix in the worker process"""
+    _WORKER_DATA['X'] = X
+    _WORKER_DATA['y'] = y
+
+def _fit_fold(task):
+    """Fit one (C, fold) combination and score it on the held-out rows"""
+    C, fold, train_idx, test_idx = task
+    X, y = _WORKER_DATA['X'], _WORKER_DATA['y']
+
+    model = LogisticRegression(C=C, penalty='l2', solver='liblinear', max_iter=1000)
+    model.fit(X[train_idx], y[train_idx])
+    probabilities = model.predict_proba(X[test_idx])[:, 1]
+
+    return {
+        'C': C,
+        'fold': fold,
+        'auc': roc_auc_score(y[test_idx], probabilities),
+        'log_loss': log_loss(y[test_idx], probabilities, labels=[0, 1])
+    }
+
+def cross_validate_purchase_model(design, Cs=None, n_folds=5, seed=42, n_jobs=None):
+    """k-fold cross-validation over the regularization grid, folds fitted in parallel"""
+
+    if Cs is None:
+        Cs = DEFAULT_C_GRID
+
+    X, y = design['X'], design['y']
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    folds = list(splitter.split(np.zeros(len(y)), y))
+    tasks = [(C, fold, train_idx, test_idx) for C in Cs for fold, (train_idx, test_idx) in enumerate(folds)]
+
+    if n_jobs is None:
+        n_jobs = min(len(tasks), os.cpu_count() or 1)
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(X, y)) as executor:
+            scores = list(executor.map(_fit_fold, tasks))
+    else:
+        _init_worker(X, y)
+        scores = [_fit_fold(task) for task in tasks]
+
+    scores = pd.DataFrame(scores)
+    summary = scores.groupby('C').agg(auc=('auc', 'mean'), auc_sd=('auc', 'std'),
+                                      log_loss=('log_loss', 'mean')).reset_index()
+    return summary
+
+@timed
+def fit_purchase_model(df, Cs=None, n_folds=5, seed=42, n_jobs=None):
+    """Select the regularization strength by CV, refit, and summarize effects and segments"""
+
+    design = build_design_matrix(df)
+    cv_summary = cross_validate_purchase_model(design, Cs, n_folds, seed, n_jobs)
+    best = cv_summary.loc[cv_summary['auc'].idxmax()]
+
+    model = LogisticRegression(C=best['C'], penalty='l2', solver='liblinear', max_iter=1000)
+    model.fit(design['X'], design['y'])
+
+    # Per-feature effects on the log-odds of purchase
+    feature_effects = pd.DataFrame({
+        'feature': design['feature_names'],
+        'group': design['feature_groups'],
+        'coefficient': model.coef_[0],
+        'odds_ratio': np.exp(model.coef_[0])
+    }).sort_values('coefficient', key=np.abs, ascending=False).reset_index(drop=True)
+
+    # Observed vs. predicted conversion for every demographic segment
+    probabilities = model.predict_proba(design['X'])[:, 1]
+    segment_rows = []
+    for key, col in DEMOGRAPHIC_COLUMNS.items():
+        if col not in df.columns:
+            continue
+        segment = df[col].to_numpy()[design['rows']]
+        frame = pd.DataFrame({'level': segment, 'observed': design['y'], 'predicted': probabilities})
+        grouped = frame.groupby('level').agg(n=('observed', 'size'), observed_rate=('observed', 'mean'),
+                                             predicted_rate=('predicted', 'mean')).reset_index()
+        grouped.insert(0, 'segment', key)
+        segment_rows.append(grouped)
+
+    segment_predictions = pd.concat(segment_rows, ignore_index=True) if segment_rows else pd.DataFrame()
+
+    return {
+        'cv_summary': cv_summary,
+        'best_C': best['C'],
+        'cv_auc': best['auc'],
+        'feature_effects': feature_effects,
+        'segment_predictions': segment_predictions,
+        'n_respondents': len(design['y']),
+        'n_features': design['X'].shape[1]
+    }
+
+@timed
+def visualize_purchase_model(model_results, top_n=15):
+    """Plot the largest per-feature effects on purchase odds"""
+
+    effects = model_results['feature_effects'].head(top_n).iloc[::-1]
+    labels = [get_translated_label(name) for name in effects['feature']]
+    colors = ['#57A773' if value > 0 else '#E63946' for value in effects['coefficient']]
+
+    plt.figure(figsize=(12, 8))
+    plt.barh(labels, effects['coefficient'], color=colors)
+    plt.axvline(0, color='k', linewidth=0.8)
+    plt.title(f'Purchase Propensity Drivers (CV AUC = {model_results["cv_auc"]:.2f})', fontsize=16)
+    plt.xlabel('Log-odds coefficient', fontsize=14)
+    plt.tight_layout()
+    plt.savefig('model_plots/purchase_feature_effects.png')
+    plt.close()
+
+def main():
+    print("Loading data for purchase propensity modelling...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Training regularized logistic model with cross-validation...")
+    model_results = fit_purchase_model(df)
+
+    print(f"Best C = {model_results['best_C']}, cross-validated AUC = {model_results['cv_auc']:.3f} "
+          f"({model_results['n_respondents']} respondents, {model_results['n_features']} features)")
+    print(model_results['feature_effects'].head(10).to_string(index=False))
+    print(model_results['segment_predictions'].to_string(index=False))
+
+    print("Visualizing feature effects...")
+    visualize_purchase_model(model_results)
+
+    print("Purchase model complete! Plot saved in 'model_plots/' directory.")
+
+if __name__ == "__main__":
+    main()
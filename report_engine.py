@@ -0,0 +1,204 @@
+import html
+import json
+import os
+import re
+import tempfile
+from string import Template
+
+import numpy as np
+from instrumentation import timed
+
+# Reports are built as a list of blocks (the structured results model) and rendered
+# to every requested format in a single pass over the blocks.
+
+def heading(level, text):
+    """Section heading block"""
+    return {'type': 'heading', 'level': level, 'text': text}
+
+def paragraph(text):
+    """Paragraph block (inline Markdown such as **bold** is allowed)"""
+    return {'type': 'paragraph', 'text': text}
+
+def quote(text):
+    """Block quote, used for notes"""
+    return {'type': 'quote', 'text': text}
+
+def bullets(items, loose=False):
+    """Bulleted list; loose lists separate items with blank lines"""
+    return {'type': 'bullets', 'items': list(items), 'loose': loose}
+
+def image(alt, path):
+    """Image block referencing a chart file"""
+    return {'type': 'image', 'alt': alt, 'path': path}
+
+def table(headers, rows):
+    """Table block; cells are rendered as given"""
+    return {'type': 'table', 'headers': list(headers), 'rows': [list(row) for row in rows]}
+
+def series_table(series, headers=('Response', 'Proportion'), fmt='{:.3f}'):
+    """Table block from a pandas Series of proportions"""
+    return table(headers, [[str(index), fmt.format(value)] for index, value in series.items()])
+
+# Templates are compiled once at import time and reused for every report
+MARKDOWN_TEMPLATES = {
+    'heading': Template('$hashes $text\n\n'),
+    'paragraph': Template('$text\n\n'),
+    'quote': Template('> $text\n\n'),
+    'image': Template('![$alt]($path)\n\n'),
+    'bullet': Template('- $text\n'),
+    'loose_bullet': Template('- $text\n\n'),
+    'table_row': Template('| $cells |\n')
+}
+
+HTML_TEMPLATES = {
+    'document': Template(
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        '<title>$title</title>\n<style>$style</style>\n</head>\n<body>\n$body</body>\n</html>\n'
+    ),
+    'heading': Template('<h$level>$text</h$level>\n'),
+    'paragraph': Template('<p>$text</p>\n'),
+    'quote': Template('<blockquote><p>$text</p></blockquote>\n'),
+    'image': Template('<figure><img src="$src" alt="$alt"></figure>\n'),
+    'list': Template('<ul>\n$items</ul>\n'),
+    'list_item': Template('<li>$text</li>\n'),
+    'table': Template('<table>\n<thead><tr>$head</tr></thead>\n<tbody>\n$rows</tbody>\n</table>\n'),
+    'table_row': Template('<tr>$cells</tr>\n')
+}
+
+HTML_STYLE = (
+    'body{font-family:"Times New Roman",serif;max-width:960px;margin:2em auto;line-height:1.5;color:#222}'
+    'h1,h2,h3,h4{color:#2E6E91}img{max-width:100%}figure{margin:1em 0}'
+    'table{border-collapse:collapse;margin:1em 0}th,td{border:1px solid #ccc;padding:4px 8px}'
+    'th{background:#f0f4f7}blockquote{border-left:4px solid #9CCFE8;margin:1em 0;padding-left:1em;color:#555}'
+)
+
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_ITALIC = re.compile(r'\*(.+?)\*')
+_CODE = re.compile(r'`(.+?)`')
+
+def inline_html(text):
+    """Escape text and convert inline Markdown emphasis to HTML"""
+    text = html.escape(str(text), quote=False)
+    text = _BOLD.sub(r'<strong>\1</strong>', text)
+    text = _ITALIC.sub(r'<em>\1</em>', text)
+    return _CODE.sub(r'<code>\1</code>', text)
+
+def _markdown_table(block):
+    """Render a table block as Markdown"""
+    row = MARKDOWN_TEMPLATES['table_row']
+    lines = [row.substitute(cells=' | '.join(str(h) for h in block['headers']))]
+    lines.append('|' + '|'.join('-' * (len(str(h)) + 2) for h in block['headers']) + '|\n')
+    lines.extend(row.substitute(cells=' | '.join(str(c) for c in cells)) for cells in block['rows'])
+    return ''.join(lines) + '\n'
+
+def _html_table(block):
+    """Render a table block as HTML"""
+    row = HTML_TEMPLATES['table_row']
+    head = ''.join(f'<th>{inline_html(h)}</th>' for h in block['headers'])
+    rows = ''.join(row.substitute(cells=''.join(f'<td>{inline_html(c)}</td>' for c in cells))
+                   for cells in block['rows'])
+    return HTML_TEMPLATES['table'].substitute(head=head, rows=rows)
+
+def _render_block(block, formats, image_source):
+    """Render one block into each requested format"""
+    kind = block['type']
+    rendered = {}
+
+    if 'md' in formats:
+        md = MARKDOWN_TEMPLATES
+        if kind == 'heading':
+            rendered['md'] = md['heading'].substitute(hashes='#' * block['level'], text=block['text'])
+        elif kind in ('paragraph', 'quote'):
+            rendered['md'] = md[kind].substitute(text=block['text'])
+        elif kind == 'image':
+            rendered['md'] = md['image'].substitute(alt=block['alt'], path=block['path'])
+        elif kind == 'bullets':
+            item = md['loose_bullet'] if block['loose'] else md['bullet']
+            rendered['md'] = ''.join(item.substitute(text=text) for text in block['items'])
+            if not block['loose']:
+                rendered['md'] += '\n'
+        elif kind == 'table':
+            rendered['md'] = _markdown_table(block)
+
+    if 'html' in formats:
+        ht = HTML_TEMPLATES
+        if kind == 'heading':
+            rendered['html'] = ht['heading'].substitute(level=block['level'], text=inline_html(block['text']))
+        elif kind in ('paragraph', 'quote'):
+            rendered['html'] = ht[kind].substitute(text=inline_html(block['text']))
+        elif kind == 'image':
+            src = image_source(block['path']) if image_source else block['path']
+            rendered['html'] = ht['image'].substitute(src=src, alt=html.escape(block['alt']))
+        elif kind == 'bullets':
+            items = ''.join(ht['list_item'].substitute(text=inline_html(text)) for text in block['items'])
+            rendered['html'] = ht['list'].substitute(items=items)
+        elif kind == 'table':
+            rendered['html'] = _html_table(block)
+
+    return rendered
+
+def _json_default(value):
+    """Convert numpy scalars and arrays for JSON output"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+def report_title(blocks):
+    """Title of a report: the text of its first top-level heading"""
+    for block in blocks:
+        if block['type'] == 'heading' and block['level'] == 1:
+            return block['text']
+    return ''
+
+@timed
+def render_report(blocks, formats=('md', 'html', 'json'), image_source=None):
+    """Render the blocks to every requested format in one pass; returns {format: text}"""
+    fragments = {fmt: [] for fmt in formats if fmt != 'json'}
+
+    for block in blocks:
+        for fmt, text in _render_block(block, fragments, image_source).items():
+            fragments[fmt].append(text)
+
+    outputs = {}
+    title = report_title(blocks)
+    if 'md' in formats:
+        outputs['md'] = ''.join(fragments['md'])
+    if 'html' in formats:
+        outputs['html'] = HTML_TEMPLATES['document'].substitute(
+            title=html.escape(title), style=HTML_STYLE, body=''.join(fragments['html'])
+        )
+    if 'json' in formats:
+        outputs['json'] = json.dumps({'title': title, 'blocks': blocks},
+                                     ensure_ascii=False, indent=2, default=_json_default)
+
+    return outputs
+
+# Process umask, so atomically written files get the same permissions as a plain open()
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def write_atomic(path, text, encoding='utf-8', buffer_size=1 << 20):
+    """Write text (or bytes) through a large buffer into a temporary file, then atomically replace"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix=os.path.basename(path))
+    try:
+        if isinstance(text, bytes):
+            f = os.fdopen(fd, 'wb', buffering=buffer_size)
+        else:
+            f = os.fdopen(fd, 'w', encoding=encoding, buffering=buffer_size)
+        with f:
+            f.write(text)
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def write_report(blocks, basename, formats=('md', 'html', 'json'), image_source=None):
+    """Render a report and write one file per format (basename + extension)"""
+    outputs = render_report(blocks, formats, image_source)
+    for fmt, text in outputs.items():
+        write_atomic(f'{basename}.{fmt}', text)
+    return outputs
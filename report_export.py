@@ -0,0 +1,214 @@
+import base64
+import io
+import os
+import re
+import textwrap
+import numpy as np
+from PIL import Image
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.backends.backend_pdf import PdfPages
+from report_engine import report_title, write_report, write_atomic
+from instrumentation import timed
+
+# A4 portrait page geometry, in inches
+PAGE_SIZE = (8.27, 11.69)
+PAGE_MARGIN = 0.8
+
+# Font sizes per block type (headings by level)
+HEADING_SIZES = {1: 18, 2: 15, 3: 13, 4: 12}
+BODY_SIZE = 10
+TABLE_SIZE = 8.5
+PDF_DPI = 150
+
+# Charts are downscaled to this width before inlining; 300 dpi originals are far larger than needed
+MAX_IMAGE_WIDTH = 1400
+
+# Decoded and compressed charts, keyed by (path, modification time, width) and shared by all exports
+_IMAGE_CACHE = {}
+
+_INLINE_MARKUP = re.compile(r'\*\*|`')
+
+def load_chart_image(path, max_width=MAX_IMAGE_WIDTH):
+    """Load a chart once: downscale, palette-compress, and keep both the PNG bytes and the pixels"""
+    if not os.path.exists(path):
+        return None
+
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns, max_width)
+    if key not in _IMAGE_CACHE:
+        with Image.open(path) as img:
+            img = img.convert('RGB')
+            if img.width > max_width:
+                img = img.resize((max_width, round(img.height * max_width / img.width)), Image.LANCZOS)
+
+        # Charts use few colors, so a 256-color palette PNG is much smaller and visually identical
+        compressed = img.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+        buffer = io.BytesIO()
+        compressed.save(buffer, format='PNG', optimize=True)
+
+        _IMAGE_CACHE[key] = {
+            'data_uri': 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'),
+            'pixels': np.asarray(compressed.convert('RGB'))
+        }
+
+    return _IMAGE_CACHE[key]
+
+def inline_image_source(path):
+    """Image source for HTML output: an embedded data URI, or the path if the chart is missing"""
+    chart = load_chart_image(path)
+    return chart['data_uri'] if chart else path
+
+def plain_text(text):
+    """Strip inline Markdown markup for PDF text"""
+    return _INLINE_MARKUP.sub('', str(text))
+
+def _wrap(text, font_size, width_inches, indent=0):
+    """Wrap text to the printable width for the given font size"""
+    # Average serif glyph width is a little over half the font size; CJK glyphs are full width
+    text = plain_text(text)
+    wide = sum(1 for ch in text if ord(ch) > 0x2E80)
+    factor = 0.55 + 0.45 * wide / max(len(text), 1)
+    chars = max(10, int((width_inches - indent) * 72 / (font_size * factor)))
+    return textwrap.wrap(text, chars) or ['']
+
+def _save_page(layout):
+    """Write the current page; fixed settings so global savefig rcParams (tight bbox, dpi) cannot crop pages"""
+    layout['pdf'].savefig(layout['figure'], bbox_inches=None, dpi=PDF_DPI)
+
+def _new_page(layout):
+    """Flush the current page to the PDF and start a blank one"""
+    if layout['figure'] is not None:
+        _save_page(layout)
+    layout['figure'] = Figure(figsize=PAGE_SIZE)
+    layout['y'] = PAGE_SIZE[1] - PAGE_MARGIN
+
+def _ensure_space(layout, height):
+    """Start a new page if the next element does not fit"""
+    if layout['figure'] is None or layout['y'] - height < PAGE_MARGIN:
+        _new_page(layout)
+
+def _draw_lines(layout, lines, font_size, indent=0, first_prefix='', **style):
+    """Draw wrapped lines of text, breaking pages as needed"""
+    line_height = font_size * 1.45 / 72
+    for i, line in enumerate(lines):
+        _ensure_space(layout, line_height)
+        layout['y'] -= line_height
+        x = PAGE_MARGIN + indent
+        if i == 0 and first_prefix:
+            layout['figure'].text((x - 0.18) / PAGE_SIZE[0], layout['y'] / PAGE_SIZE[1], first_prefix,
+                                  fontsize=font_size, va='bottom')
+        layout['figure'].text(x / PAGE_SIZE[0], layout['y'] / PAGE_SIZE[1], line,
+                              fontsize=font_size, va='bottom', **style)
+
+def _image_size(chart, width):
+    """Printed size of a chart: the text width, capped at half a page high"""
+    aspect = chart['pixels'].shape[0] / chart['pixels'].shape[1]
+    max_height = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) / 2
+    image_width = min(width, max_height / aspect)
+    return image_width, image_width * aspect
+
+def _draw_image(layout, block, width):
+    """Draw a chart centered on the text column"""
+    chart = load_chart_image(block['path'])
+    if chart is None:
+        _draw_lines(layout, [f'[missing figure: {block["path"]}]'], BODY_SIZE, color='#8D99AE')
+        return
+
+    pixels = chart['pixels']
+    image_width, image_height = _image_size(chart, width)
+
+    _ensure_space(layout, image_height)
+    layout['y'] -= image_height
+    left = PAGE_MARGIN + (width - image_width) / 2
+    ax = layout['figure'].add_axes([left / PAGE_SIZE[0], layout['y'] / PAGE_SIZE[1],
+                                    image_width / PAGE_SIZE[0], image_height / PAGE_SIZE[1]])
+    # No interpolation: the PDF embeds the cached pixels as-is instead of resampling them
+    ax.imshow(pixels, interpolation='none')
+    ax.axis('off')
+
+def _draw_table(layout, block, width):
+    """Draw a table with column widths proportional to their content"""
+    rows = [[plain_text(cell) for cell in row] for row in [block['headers']] + block['rows']]
+    n_cols = len(block['headers'])
+    lengths = np.array([[len(row[j]) if j < len(row) else 0 for j in range(n_cols)] for row in rows])
+    weights = np.clip(lengths.max(axis=0), 4, 40).astype(float)
+    col_widths = width * weights / weights.sum()
+    col_x = PAGE_MARGIN + np.concatenate([[0], np.cumsum(col_widths)[:-1]])
+
+    line_height = TABLE_SIZE * 1.6 / 72
+    char_width = TABLE_SIZE * 0.55 / 72
+    for r, row in enumerate(rows):
+        _ensure_space(layout, line_height)
+        layout['y'] -= line_height
+        for j in range(n_cols):
+            cell = row[j] if j < len(row) else ''
+            max_chars = max(3, int(col_widths[j] / char_width) - 1)
+            if len(cell) > max_chars:
+                cell = cell[:max_chars - 1] + '…'
+            layout['figure'].text(col_x[j] / PAGE_SIZE[0], layout['y'] / PAGE_SIZE[1], cell, fontsize=TABLE_SIZE,
+                                  va='bottom', fontweight='bold' if r == 0 else 'normal')
+        if r == 0:
+            y = (layout['y'] - 0.03) / PAGE_SIZE[1]
+            layout['figure'].add_artist(Line2D([PAGE_MARGIN / PAGE_SIZE[0], (PAGE_MARGIN + width) / PAGE_SIZE[0]],
+                                               [y, y], color='#2E6E91', linewidth=0.6))
+
+@timed
+def render_pdf(blocks):
+    """Lay out report blocks on A4 pages with matplotlib and return the PDF bytes"""
+    width = PAGE_SIZE[0] - 2 * PAGE_MARGIN
+    buffer = io.BytesIO()
+
+    with PdfPages(buffer, metadata={'Title': plain_text(report_title(blocks))}) as pdf:
+        layout = {'pdf': pdf, 'figure': None, 'y': 0}
+
+        for i, block in enumerate(blocks):
+            kind = block['type']
+            if kind == 'heading':
+                size = HEADING_SIZES.get(block['level'], BODY_SIZE)
+                # Keep headings with what follows: a whole chart, or a few lines of text
+                following = blocks[i + 1] if i + 1 < len(blocks) else None
+                chart = load_chart_image(following['path']) if following and following['type'] == 'image' else None
+                keep = _image_size(chart, width)[1] if chart else 3 * BODY_SIZE * 1.45 / 72
+                _ensure_space(layout, 2 * size / 72 + keep)
+                layout['y'] -= size * 0.6 / 72
+                _draw_lines(layout, _wrap(block['text'], size, width), size, fontweight='bold', color='#2E6E91')
+            elif kind == 'paragraph':
+                text = block['text']
+                # Figure captions are written as *italic* paragraphs
+                italic = text.startswith('*') and text.endswith('*') and not text.startswith('**')
+                if italic:
+                    text = text.strip('*')
+                _draw_lines(layout, _wrap(text, BODY_SIZE, width), BODY_SIZE,
+                            fontstyle='italic' if italic else 'normal')
+            elif kind == 'quote':
+                _draw_lines(layout, _wrap(block['text'], BODY_SIZE, width, indent=0.3), BODY_SIZE,
+                            indent=0.3, color='#555555')
+            elif kind == 'bullets':
+                for item in block['items']:
+                    _draw_lines(layout, _wrap(item, BODY_SIZE, width, indent=0.3), BODY_SIZE,
+                                indent=0.3, first_prefix='•')
+                    if block['loose']:
+                        layout['y'] -= BODY_SIZE * 0.5 / 72
+            elif kind == 'image':
+                _draw_image(layout, block, width)
+            elif kind == 'table':
+                _draw_table(layout, block, width)
+
+            # Paragraph spacing
+            layout['y'] -= BODY_SIZE * 0.7 / 72
+
+        if layout['figure'] is not None:
+            _save_page(layout)
+
+    return buffer.getvalue()
+
+def export_report(blocks, basename, formats=('md', 'html', 'json', 'pdf')):
+    """Write a report with self-contained HTML (inlined charts) and a PDF, sharing decoded charts"""
+    text_formats = tuple(fmt for fmt in formats if fmt != 'pdf')
+    outputs = write_report(blocks, basename, text_formats, image_source=inline_image_source)
+
+    if 'pdf' in formats:
+        outputs['pdf'] = render_pdf(blocks)
+        write_atomic(f'{basename}.pdf', outputs['pdf'])
+
+    return outputs
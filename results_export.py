@@ -0,0 +1,306 @@
+import io
+import json
+import os
+from dataclasses import dataclass, field
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from report_engine import write_atomic
+from significance_testing import DEMOGRAPHIC_COLUMNS
+from survey_config import DEFAULT_QUESTIONS, response_masks
+from survey_encoding import LIKERT_REGISTRY, MULTISELECT_QUESTIONS, MULTISELECT_SEPARATOR
+from survey_weighting import respondent_weights, question_confidence_intervals
+from instrumentation import timed
+
+# Bump whenever a column is added, removed, renamed or changes type
+SCHEMA_VERSION = 3
+
+RESULTS_DIR = 'results'
+
+# Every stage is exported as the same three long-format tables
+TABLE_SCHEMAS = {
+    # Answer distributions: one row per answer level. rate is the share of the question's base
+    # respondents (equal to proportion except for multi-select options, whose proportion is a share of
+    # mentions); ci_low/ci_high are its Wilson interval on the base's (Kish) effective sample size.
+    # Weighted results store the effective count (rate x n_effective) over the effective base, so
+    # count/base stay a valid input for count-based tests
+    'distributions': pa.schema([
+        ('stage', pa.string()),
+        ('group', pa.string()),
+        ('metric', pa.string()),
+        ('level', pa.string()),
+        ('proportion', pa.float64()),
+        ('count', pa.float64()),
+        ('base', pa.float64()),
+        ('rate', pa.float64()),
+        ('ci_low', pa.float64()),
+        ('ci_high', pa.float64()),
+        ('n_effective', pa.float64())
+    ]),
+    # Scalar results (alphas, KMO, test statistics); text holds non-numeric values such as "Single item"
+    'statistics': pa.schema([
+        ('stage', pa.string()),
+        ('group', pa.string()),
+        ('metric', pa.string()),
+        ('value', pa.float64()),
+        ('text', pa.string())
+    ]),
+    # Matrices (correlations, loadings) in long format
+    'matrices': pa.schema([
+        ('stage', pa.string()),
+        ('matrix', pa.string()),
+        ('row', pa.string()),
+        ('column', pa.string()),
+        ('value', pa.float64())
+    ])
+}
+
+# Questions behind each analyze_sicas distribution, used to recover counts and bases
+SICAS_METRIC_QUESTIONS = {
+    ('sense', 'awareness'): LIKERT_REGISTRY['S1']['question'],
+    ('interest', 'attraction'): LIKERT_REGISTRY['I1']['question'],
+    ('communication', 'interaction'): LIKERT_REGISTRY['C1']['question'],
+    ('communication', 'interaction_types'): MULTISELECT_QUESTIONS['interaction_types'],
+    ('action', 'purchase'): LIKERT_REGISTRY['A1']['question'],
+    ('action', 'channels'): MULTISELECT_QUESTIONS['purchase_channels'],
+    ('action', 'barriers'): MULTISELECT_QUESTIONS['purchase_barriers'],
+    ('share', 'satisfaction'): LIKERT_REGISTRY['S2']['question'],
+    ('share', 'improvements'): MULTISELECT_QUESTIONS['improvements']
+}
+
+# Logical question key of every reference column
+QUESTION_KEYS = {column: key for key, column in DEFAULT_QUESTIONS.items()}
+
+# Questions behind each analyze_additional_columns distribution, and whether they are multi-select
+ADDITIONAL_QUESTIONS = {
+    'brand_contact_channels': (MULTISELECT_QUESTIONS['contact_channels'], True),
+    'interaction_experience': (LIKERT_REGISTRY['C2']['question'], False),
+    'brand_impression': (MULTISELECT_QUESTIONS['brand_impression'], True),
+    'increased_understanding': (DEFAULT_QUESTIONS['increased_understanding'], False)
+}
+
+# Nullable pandas dtypes, so integer columns with missing values stay integers
+PANDAS_TYPES = {pa.int64(): pd.Int64Dtype(), pa.string(): pd.StringDtype()}
+
+def empty_table(name):
+    """Empty DataFrame with the columns and dtypes of an export table"""
+    return TABLE_SCHEMAS[name].empty_table().to_pandas(types_mapper=PANDAS_TYPES.get)
+
+def _typed_table(name, records):
+    """DataFrame for an export table, with columns and dtypes fixed by its schema"""
+    schema = TABLE_SCHEMAS[name]
+    frame = pd.DataFrame(records, columns=schema.names)
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False).to_pandas(types_mapper=PANDAS_TYPES.get)
+
+@dataclass
+class StageResults:
+    """Aggregated results of one analysis stage in the stable export schema"""
+    stage: str
+    distributions: pd.DataFrame = field(default_factory=lambda: empty_table('distributions'))
+    statistics: pd.DataFrame = field(default_factory=lambda: empty_table('statistics'))
+    matrices: pd.DataFrame = field(default_factory=lambda: empty_table('matrices'))
+    schema_version: int = SCHEMA_VERSION
+
+    def tables(self):
+        """The three export tables by name"""
+        return {'distributions': self.distributions, 'statistics': self.statistics, 'matrices': self.matrices}
+
+def response_base(df, column, multiselect=False, mask=None):
+    """Denominator behind a value_counts(normalize=True): answers, or mentions for multi-select questions,
+    of the respondents in mask (all respondents by default)"""
+    if df is None or column not in df.columns:
+        return None
+    answers = df[column] if mask is None else df[column][mask]
+    answers = answers.dropna()
+    if multiselect:
+        return int(answers.astype(str).str.count(MULTISELECT_SEPARATOR).sum() + len(answers))
+    return len(answers)
+
+def response_intervals(df, column, multiselect=False, mask=None, weights=None):
+    """Respondent-level rates and confidence intervals of one question over the respondents in mask"""
+    if df is None or column not in df.columns:
+        return None
+    answers = df[column] if mask is None else df[column][mask]
+    return question_confidence_intervals(answers, respondent_weights(df, weights), multiselect)
+
+def distribution_records(stage, group, metric, series, base=None, intervals=None, weighted=False):
+    """Long-format rows for one proportion Series, with the level's interval row if given
+
+    Weighted rows count the level over the effective sample size of the base instead of the raw base,
+    since a weighted share of the raw base overstates the information behind it.
+    """
+    records = []
+    for level, proportion in series.items():
+        interval = intervals.loc[level] if intervals is not None and level in intervals.index else None
+        if weighted and interval is not None:
+            count = float(interval['proportion'] * interval['n_effective'])
+            level_base = float(interval['n_effective'])
+        else:
+            count = float(round(proportion * base)) if base is not None else None
+            level_base = base
+        records.append({
+            'stage': stage,
+            'group': group,
+            'metric': metric,
+            'level': str(level),
+            'proportion': float(proportion),
+            'count': count,
+            'base': level_base,
+            'rate': float(interval['proportion']) if interval is not None else None,
+            'ci_low': float(interval['ci_low']) if interval is not None else None,
+            'ci_high': float(interval['ci_high']) if interval is not None else None,
+            'n_effective': float(interval['n_effective']) if interval is not None else None
+        })
+    return records
+
+def matrix_records(stage, name, matrix):
+    """Long-format rows for a labelled matrix"""
+    values = matrix.to_numpy(dtype=np.float64)
+    return [{
+        'stage': stage,
+        'matrix': name,
+        'row': str(row),
+        'column': str(column),
+        'value': values[i, j]
+    } for i, row in enumerate(matrix.index) for j, column in enumerate(matrix.columns)]
+
+def statistic_record(stage, group, metric, value):
+    """One scalar result; strings go to the text column"""
+    if isinstance(value, str):
+        return {'stage': stage, 'group': group, 'metric': metric, 'value': None, 'text': value}
+    return {'stage': stage, 'group': group, 'metric': metric, 'value': float(value), 'text': None}
+
+def sicas_stage_results(results, df=None, weights=None):
+    """Export object for analyze_sicas results (intervals use the same respondent weights as the analysis)"""
+    records = []
+    # Same eligible, answered respondents analyze_sicas computed the proportions over
+    base_masks = response_masks(df)['base'] if df is not None else None
+    for component, data in results.items():
+        for key, series in data.items():
+            column = SICAS_METRIC_QUESTIONS.get((component, key))
+            multiselect = column in MULTISELECT_QUESTIONS.values()
+            mask = base_masks[QUESTION_KEYS[column]] if base_masks is not None and column in df.columns else None
+            base = response_base(df, column, multiselect, mask)
+            intervals = response_intervals(df, column, multiselect, mask, weights)
+            records.extend(distribution_records('sicas', component, key, series, base, intervals,
+                                                weights is not None))
+
+    statistics = [statistic_record('sicas', 'sample', 'n_respondents', len(df))] if df is not None else []
+    return StageResults('sicas', distributions=_typed_table('distributions', records),
+                        statistics=_typed_table('statistics', statistics))
+
+def demographic_stage_results(demographics, df=None, weights=None):
+    """Export object for perform_demographic_analysis results"""
+    records = []
+    for key, series in demographics.items():
+        base = response_base(df, DEMOGRAPHIC_COLUMNS.get(key))
+        intervals = response_intervals(df, DEMOGRAPHIC_COLUMNS.get(key), weights=weights)
+        records.extend(distribution_records('demographics', 'demographics', key, series, base, intervals,
+                                            weights is not None))
+    return StageResults('demographics', distributions=_typed_table('distributions', records))
+
+def additional_stage_results(additional_results, df=None, weights=None):
+    """Export object for analyze_additional_columns results (aggregates only, no raw suggestion texts)"""
+    records = []
+    statistics = []
+    base_masks = response_masks(df)['base'] if df is not None else None
+    for key, value in additional_results.items():
+        if key == 'suggestion_count':
+            statistics.append(statistic_record('additional', 'suggestions', 'suggestion_count', value))
+        elif key == 'suggestion_duplicates':
+            statistics.append(statistic_record('additional', 'suggestions', 'n_near_duplicates',
+                                               int(value['is_near_duplicate'].sum())))
+        elif key in ('suggestions', 'suggestions_deduplicated'):
+            continue
+        elif isinstance(value, pd.Series):
+            column, multiselect = ADDITIONAL_QUESTIONS.get(key, (None, False))
+            mask = base_masks[QUESTION_KEYS[column]] if base_masks is not None and column in df.columns else None
+            base = response_base(df, column, multiselect, mask)
+            intervals = response_intervals(df, column, multiselect, mask, weights)
+            records.extend(distribution_records('additional', 'additional', key, value, base, intervals,
+                                                weights is not None))
+
+    return StageResults('additional', distributions=_typed_table('distributions', records),
+                        statistics=_typed_table('statistics', statistics))
+
+def validation_stage_results(reliability_results, validity_results, factor_results):
+    """Export object for the reliability, validity and factor analysis results"""
+    statistics = [statistic_record('validation', 'reliability', dimension, alpha)
+                  for dimension, alpha in reliability_results.items()]
+    matrices = []
+
+    if isinstance(validity_results.get('correlation_matrix'), pd.DataFrame):
+        matrices.extend(matrix_records('validation', 'item_correlations', validity_results['correlation_matrix']))
+    if isinstance(validity_results.get('dimension_correlations'), pd.DataFrame):
+        matrices.extend(matrix_records('validation', 'dimension_correlations', validity_results['dimension_correlations']))
+    # p/q-values and bootstrap interval bounds, one matrix each, labelled with the correlation
+    # estimator they belong to (polychoric or Pearson) and the test behind the p-values
+    for name, key in (('item_correlation', 'item_significance'), ('dimension_correlation', 'dimension_significance')):
+        if key in validity_results:
+            for statistic in ('p_value', 'q_value', 'ci_lower', 'ci_upper'):
+                matrices.extend(matrix_records('validation', f'{name}_{statistic}', validity_results[key][statistic]))
+            statistics.append(statistic_record('validation', f'{name}_significance', 'method', validity_results[key]['method']))
+            statistics.append(statistic_record('validation', f'{name}_significance', 'test', validity_results[key]['test']))
+
+    if 'error' in factor_results:
+        statistics.append(statistic_record('validation', 'factor_analysis', 'error', factor_results['error']))
+    if 'kmo' in factor_results:
+        statistics.append(statistic_record('validation', 'factor_analysis', 'kmo', factor_results['kmo']))
+    if 'bartlett' in factor_results:
+        for name, value in factor_results['bartlett'].items():
+            statistics.append(statistic_record('validation', 'bartlett', name, value))
+    for key in ('eigenvalues', 'variance_explained', 'pca_variance_ratio', 'pca_cumulative_variance'):
+        if key in factor_results:
+            statistics.extend(statistic_record('validation', key, str(i + 1), value)
+                              for i, value in enumerate(np.ravel(factor_results[key])))
+    if 'communalities' in factor_results:
+        statistics.extend(statistic_record('validation', 'communalities', code, value)
+                          for code, value in factor_results['communalities'].items())
+    if 'loadings' in factor_results:
+        matrices.extend(matrix_records('validation', 'factor_loadings', factor_results['loadings']))
+
+    return StageResults('validation', statistics=_typed_table('statistics', statistics),
+                        matrices=_typed_table('matrices', matrices))
+
+def _json_value(value):
+    """JSON-safe scalar: numpy types unwrapped, NaN/NA as null"""
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+        return None
+    if isinstance(value, np.generic):
+        return _json_value(value.item())
+    return value
+
+@timed
+def write_stage_results(stage_results, directory=RESULTS_DIR):
+    """Write a stage as <stage>.json plus one Parquet file per table, atomically"""
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    payload = {'schema_version': stage_results.schema_version, 'stage': stage_results.stage}
+    for name, frame in stage_results.tables().items():
+        payload[name] = [{key: _json_value(value) for key, value in record.items()}
+                         for record in frame.to_dict(orient='records')]
+
+        table = pa.Table.from_pandas(frame, schema=TABLE_SCHEMAS[name], preserve_index=False)
+        table = table.replace_schema_metadata({
+            'schema_version': str(stage_results.schema_version),
+            'stage': stage_results.stage
+        })
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        write_atomic(os.path.join(directory, f'{stage_results.stage}_{name}.parquet'), buffer.getvalue())
+
+    write_atomic(os.path.join(directory, f'{stage_results.stage}.json'),
+                 json.dumps(payload, ensure_ascii=False, indent=2))
+
+def load_stage_results(stage, directory=RESULTS_DIR):
+    """Load a stage written by write_stage_results, checking the schema version"""
+    tables = {}
+    for name, schema in TABLE_SCHEMAS.items():
+        table = pq.read_table(os.path.join(directory, f'{stage}_{name}.parquet'))
+        version = int((table.schema.metadata or {}).get(b'schema_version', b'0'))
+        if version != SCHEMA_VERSION:
+            raise ValueError(f"Results for stage '{stage}' use schema version {version}, expected {SCHEMA_VERSION}")
+        tables[name] = table.cast(schema).to_pandas(types_mapper=PANDAS_TYPES.get)
+    return StageResults(stage, **tables)
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from sicas_analysis import load_data, clean_data, get_translated_label
+from significance_testing import DEMOGRAPHIC_COLUMNS, SICAS_COLUMNS, STAGE_PASS_LEVELS
+from survey_config import response_masks
+from survey_weighting import respondent_weights
+from instrumentation import timed
+
+# Funnel stages in order; bit j of a respondent's flags is set when they pass stage j
+FUNNEL_STAGES = [
+    ('awareness', 'Sense'),
+    ('attraction', 'Interest'),
+    ('interaction', 'Communication'),
+    ('purchase', 'Action'),
+    ('satisfaction', 'Share')
+]
+
+N_PATTERNS = 1 << len(FUNNEL_STAGES)
+
+# Bit set of the first k stages, for k = 1..5
+CUMULATIVE_MASKS = [(1 << (k + 1)) - 1 for k in range(len(FUNNEL_STAGES))]
+
+def stage_flags(df):
+    """Per-respondent stage-pass bits packed into one uint8, and whether every stage was answered"""
+    base = response_masks(df)['base']
+    flags = np.zeros(len(df), dtype=np.uint8)
+    complete = np.ones(len(df), dtype=bool)
+
+    for j, (key, _) in enumerate(FUNNEL_STAGES):
+        column = SICAS_COLUMNS[key]
+        if column not in df.columns:
+            raise ValueError(f"Funnel stage question missing from the survey: {column}")
+        passed = df[column].isin(STAGE_PASS_LEVELS[key]).to_numpy()
+        flags |= passed.astype(np.uint8) << np.uint8(j)
+        complete &= base[key].to_numpy()
+
+    return flags, complete
+
+def superset_counts(histogram):
+    """Respondents passing at least the stages of every bit set: sum of histogram[p] over patterns p containing m
+
+    Works on (segments x patterns) arrays; one pass per stage bit (sum over supersets transform).
+    """
+    counts = np.array(histogram, dtype=np.float64)
+    patterns = np.arange(N_PATTERNS)
+    for bit in range(len(FUNNEL_STAGES)):
+        without = patterns[(patterns >> bit) & 1 == 0]
+        counts[..., without] += counts[..., without | (1 << bit)]
+    return counts
+
+def segment_histograms(flags, segment_codes, n_segments, weights=None):
+    """Stage-pattern counts (segments x patterns) from a single bincount"""
+    cells = segment_codes.astype(np.int64) * N_PATTERNS + flags
+    return np.bincount(cells, weights=weights, minlength=n_segments * N_PATTERNS).reshape(n_segments, N_PATTERNS)
+
+def conditional_paths(supersets):
+    """P(stage | every stage in a given set was passed) for every set of earlier stages and every stage"""
+    names = [display for _, display in FUNNEL_STAGES]
+    records = []
+    for given in range(N_PATTERNS):
+        for k, stage in enumerate(names):
+            if given >> k & 1:
+                continue
+            reached = supersets[given]
+            records.append({
+                'given': ' & '.join(names[j] for j in range(len(names)) if given >> j & 1) or '(all respondents)',
+                'stage': stage,
+                'n_given': reached,
+                'rate': supersets[given | (1 << k)] / reached if reached > 0 else np.nan
+            })
+    return pd.DataFrame(records)
+
+def funnel_rates(supersets):
+    """Cumulative reach, conditional conversion and marginal pass rate of each stage, from superset counts"""
+    supersets = np.asarray(supersets, dtype=np.float64)
+    total = supersets[..., 0:1]
+    cumulative = supersets[..., CUMULATIVE_MASKS]
+    previous = np.concatenate([total, cumulative[..., :-1]], axis=-1)
+    marginal = supersets[..., [1 << k for k in range(len(FUNNEL_STAGES))]]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'reach': cumulative / total,
+            'conditional': cumulative / previous,
+            'marginal': marginal / total
+        }
+
+@timed
+def analyze_sequential_funnel(df, weights=None, segments=None):
+    """Respondent-level SICAS funnel: true stage-to-stage conversion overall and per demographic segment
+
+    Only respondents who answered every funnel stage are counted. All demographic segments are
+    counted with one bincount over the packed stage flags.
+    """
+    if segments is None:
+        segments = DEMOGRAPHIC_COLUMNS
+    weights = respondent_weights(df, weights)
+
+    flags, complete = stage_flags(df)
+    flags = flags[complete]
+    cell_weights = weights.to_numpy()[complete] if weights is not None else None
+
+    # Segment codes of every demographic, offset so all levels share one code space; slot 0 is the total
+    levels = [('all', 'All respondents')]
+    codes = [np.zeros(len(flags), dtype=np.int64)]
+    for key, column in segments.items():
+        if column not in df.columns:
+            continue
+        segment_codes, segment_levels = pd.factorize(df[column].to_numpy()[complete])
+        observed = segment_codes >= 0
+        codes.append(np.where(observed, segment_codes + len(levels), -1))
+        levels.extend((key, level) for level in segment_levels)
+
+    code_matrix = np.column_stack(codes)
+    observed = code_matrix >= 0
+    histogram = segment_histograms(
+        np.broadcast_to(flags[:, None], code_matrix.shape)[observed],
+        code_matrix[observed],
+        len(levels),
+        np.broadcast_to(cell_weights[:, None], code_matrix.shape)[observed] if cell_weights is not None else None
+    )
+
+    supersets = superset_counts(histogram)
+    rates = funnel_rates(supersets)
+    names = [display for _, display in FUNNEL_STAGES]
+
+    index = pd.MultiIndex.from_tuples(levels, names=['segment', 'level'])
+    by_segment = pd.concat({
+        'n': pd.DataFrame({'respondents': supersets[:, 0]}, index=index),
+        'reach': pd.DataFrame(rates['reach'], index=index, columns=names),
+        'conditional': pd.DataFrame(rates['conditional'], index=index, columns=names)
+    }, axis=1)
+
+    return {
+        'stages': names,
+        'n_respondents': supersets[0, 0],
+        'n_incomplete': int((~complete).sum()),
+        'reach': pd.Series(rates['reach'][0], index=names),
+        'conditional': pd.Series(rates['conditional'][0], index=names),
+        'marginal': pd.Series(rates['marginal'][0], index=names),
+        'paths': conditional_paths(supersets[0]),
+        'segments': by_segment,
+        'histogram': pd.DataFrame(histogram, index=index)
+    }
+
+def weakest_transition(funnel):
+    """The stage with the lowest conversion from the previous stages, and the share of respondents lost there"""
+    losses = 1 - funnel['conditional'].iloc[1:]
+    stage = losses.idxmax()
+    previous = funnel['stages'][funnel['stages'].index(stage) - 1]
+    return previous, stage, losses[stage]
+
+def segment_conversion_extremes(funnel, min_respondents=30):
+    """Segment levels with the highest and lowest full-funnel conversion (levels with enough respondents only)"""
+    segments = funnel['segments'].drop(index='all', level='segment')
+    segments = segments[segments[('n', 'respondents')] >= min_respondents]
+    if segments.empty:
+        return None
+    full = segments[('reach', funnel['stages'][-1])]
+    return full.idxmax(), full.max(), full.idxmin(), full.min()
+
+def main():
+    print("Loading data for the sequential funnel...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Building respondent-level stage flags...")
+    funnel = analyze_sequential_funnel(df)
+    print(f"Respondents with every stage answered: {funnel['n_respondents']:.0f} "
+          f"({funnel['n_incomplete']} incomplete excluded)")
+
+    print("\nSequential funnel:")
+    print(pd.DataFrame({
+        'marginal': funnel['marginal'],
+        'reach': funnel['reach'],
+        'conditional': funnel['conditional']
+    }).round(3).to_string())
+
+    previous, stage, loss = weakest_transition(funnel)
+    print(f"\nWeakest transition: {previous} -> {stage} ({loss:.1%} of respondents lost)")
+
+    print("\nConditional conversion given every earlier stage (stage paths):")
+    paths = funnel['paths']
+    print(paths.sort_values(['stage', 'given']).round(3).to_string(index=False))
+
+    print("\nFull-funnel reach by segment:")
+    segments = funnel['segments'][[('n', 'respondents'), ('reach', funnel['stages'][-1])]].copy()
+    segments.index = [f"{segment}: {get_translated_label(level)}" for segment, level in segments.index]
+    print(segments.round(3).to_string())
+
+    print("Sequential funnel analysis complete!")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -5,6 +6,10 @@ import numpy as np
 import os
 import matplotlib as mpl
 from matplotlib.font_manager import FontProperties
+from report_engine import heading, bullets, image, series_table, write_report
+from survey_config import survey_questions, response_masks, routing_diagnostics
+from survey_weighting import respondent_weights, load_weights, weighted_value_counts, multiselect_value_counts
+from instrumentation import timed
 
 # Create plots directory at the beginning
 if not os.path.exists('plots'):
@@ -157,6 +162,7 @@ def get_translated_label(chinese_label):
 # S - Share/Satisfaction
 
 # Load the data
+@timed
 def load_data(file_path='data.csv'):
     # Handle potential encoding issues with Chinese characters
     encodings = ['utf-8', 'gbk', 'gb18030', 'utf-16', 'cp936', 'iso-8859-1']
@@ -182,6 +188,7 @@ def load_data(file_path='data.csv'):
         print(f"Fatal error: Unable to load CSV file: {str(e)}")
         raise
 
+@timed
 def clean_data(df):
     # Clean column names - removing question numbers and special characters
     columns = df.columns.tolist()
@@ -203,7 +210,20 @@ def clean_data(df):
     df.columns = clean_columns
     return df
 
-def analyze_sicas(df):
+@timed
+def analyze_sicas(df, config=None, weights=None):
+    # Column names for this questionnaire (reference survey by default)
+    questions = survey_questions(config)
+    
+    # Optional respondent weights (e.g. from survey_weighting.rake_weights)
+    weights = respondent_weights(df, weights)
+    
+    # Eligible, answered respondents of every question: routed-away and blank answers never count
+    base = response_masks(df, config)['base']
+    
+    def answers(key):
+        return df[questions[key]][base[key]]
+    
     # Initialize results dictionary
     results = {
         'sense': {},
@@ -214,73 +234,43 @@ def analyze_sicas(df):
     }
     
     # S - Sense (Brand Awareness)
-    awareness_col = '您是否了解始祖鸟（Arc\'teryx）品牌？'
-    if awareness_col in df.columns:
-        results['sense']['awareness'] = df[awareness_col].value_counts(normalize=True)
+    if 'awareness' in base.columns:
+        results['sense']['awareness'] = weighted_value_counts(answers('awareness'), weights)
     
     # I - Interest
-    interest_col = '始祖鸟的社交媒体内容对您的吸引力如何?'
-    if interest_col in df.columns:
-        results['interest']['attraction'] = df[interest_col].value_counts(normalize=True)
+    if 'attraction' in base.columns:
+        results['interest']['attraction'] = weighted_value_counts(answers('attraction'), weights)
     
     # C - Communication
-    interaction_col = '您是否曾与始祖鸟的社交媒体账号互动?'
-    if interaction_col in df.columns:
-        results['communication']['interaction'] = df[interaction_col].value_counts(normalize=True)
+    if 'interaction' in base.columns:
+        results['communication']['interaction'] = weighted_value_counts(answers('interaction'), weights)
     
-    interaction_type_col = '您更倾向于哪种互动方式？（可多选）'
-    if interaction_type_col in df.columns:
+    if 'interaction_types' in base.columns:
         # For multi-select questions, count occurrences of each option
-        interaction_types = []
-        for response in df[interaction_type_col].dropna():
-            types = response.split('┋')
-            interaction_types.extend(types)
-        
-        results['communication']['interaction_types'] = pd.Series(interaction_types).value_counts(normalize=True)
+        results['communication']['interaction_types'] = multiselect_value_counts(answers('interaction_types'), weights)
     
     # A - Action (Purchase)
-    purchase_col = '您是否因社交媒体内容购买过始祖鸟产品？'
-    if purchase_col in df.columns:
-        results['action']['purchase'] = df[purchase_col].value_counts(normalize=True)
-    
-    # Additional purchase channels analysis
-    channel_col = '您最常通过以下哪种途径购买？（可多选）'
-    if channel_col in df.columns and '(跳过)' not in df[channel_col].unique():
-        channels = []
-        for response in df[channel_col].dropna():
-            if response != '(跳过)':
-                types = response.split('┋')
-                channels.extend(types)
-        
-        results['action']['channels'] = pd.Series(channels).value_counts(normalize=True)
-    
-    # Purchase barriers
-    barrier_col = '阻碍您购买的原因是什么？（可多选）'
-    if barrier_col in df.columns and '(跳过)' not in df[barrier_col].unique():
-        barriers = []
-        for response in df[barrier_col].dropna():
-            if response != '(跳过)':
-                types = response.split('┋')
-                barriers.extend(types)
-        
-        results['action']['barriers'] = pd.Series(barriers).value_counts(normalize=True)
+    if 'purchase' in base.columns:
+        results['action']['purchase'] = weighted_value_counts(answers('purchase'), weights)
+    
+    # Purchase channels (asked of purchasers only)
+    if 'purchase_channels' in base.columns:
+        results['action']['channels'] = multiselect_value_counts(answers('purchase_channels'), weights)
+    
+    # Purchase barriers (asked of non-purchasers only)
+    if 'purchase_barriers' in base.columns:
+        results['action']['barriers'] = multiselect_value_counts(answers('purchase_barriers'), weights)
     
     # S - Share/Satisfaction
-    satisfaction_col = '您对始祖鸟社交媒体的整体满意度如何？'
-    if satisfaction_col in df.columns:
-        results['share']['satisfaction'] = df[satisfaction_col].value_counts(normalize=True)
-    
-    improvement_col = '您认为始祖鸟社交媒体内容有哪些需要改进的地方？（可多选）'
-    if improvement_col in df.columns:
-        improvements = []
-        for response in df[improvement_col].dropna():
-            types = response.split('┋')
-            improvements.extend(types)
-        
-        results['share']['improvements'] = pd.Series(improvements).value_counts(normalize=True)
+    if 'satisfaction' in base.columns:
+        results['share']['satisfaction'] = weighted_value_counts(answers('satisfaction'), weights)
+    
+    if 'improvements' in base.columns:
+        results['share']['improvements'] = multiselect_value_counts(answers('improvements'), weights)
     
     return results
 
+@timed
 def visualize_sicas(results):
     # Set style
     sns.set(style="whitegrid")
@@ -309,34 +299,41 @@ def visualize_sicas(results):
                 plt.savefig(f'plots/{component}_{key}.png', dpi=300)  # Higher DPI for better quality
                 plt.close()
 
-def perform_demographic_analysis(df):
+@timed
+def perform_demographic_analysis(df, config=None, weights=None):
+    # Column names for this questionnaire (reference survey by default)
+    questions = survey_questions(config)
+    
+    # Optional respondent weights (e.g. from survey_weighting.rake_weights)
+    weights = respondent_weights(df, weights)
+    
     # Analyze demographic information
     demographics = {}
     
     # Gender distribution
-    gender_col = '您的性别'
+    gender_col = questions['gender']
     if gender_col in df.columns:
-        demographics['gender'] = df[gender_col].value_counts(normalize=True)
+        demographics['gender'] = weighted_value_counts(df[gender_col], weights)
     
     # Age distribution
-    age_col = '您的年龄'
+    age_col = questions['age']
     if age_col in df.columns:
-        demographics['age'] = df[age_col].value_counts(normalize=True)
+        demographics['age'] = weighted_value_counts(df[age_col], weights)
     
     # Occupation distribution
-    occupation_col = '您的职业'
+    occupation_col = questions['occupation']
     if occupation_col in df.columns:
-        demographics['occupation'] = df[occupation_col].value_counts(normalize=True)
+        demographics['occupation'] = weighted_value_counts(df[occupation_col], weights)
     
     # Income distribution
-    income_col = '您的月收入（人民币）'
+    income_col = questions['income']
     if income_col in df.columns:
-        demographics['income'] = df[income_col].value_counts(normalize=True)
+        demographics['income'] = weighted_value_counts(df[income_col], weights)
     
     # Social media usage
-    usage_col = '您每天使用社交媒体的时长大约是多少？'
+    usage_col = questions['social_media_usage']
     if usage_col in df.columns:
-        demographics['social_media_usage'] = df[usage_col].value_counts(normalize=True)
+        demographics['social_media_usage'] = weighted_value_counts(df[usage_col], weights)
     
     # Visualize demographics
     for key, value in demographics.items():
@@ -362,36 +359,45 @@ def perform_demographic_analysis(df):
     
     return demographics
 
-def generate_sicas_funnel(results):
+@timed
+def generate_sicas_funnel(results, funnel=None):
     # Create SICAS funnel visualization
     funnel_data = []
-    
-    # Sense - Brand awareness (using "非常了解" + "略有了解")
-    if 'awareness' in results['sense']:
-        aware_rate = results['sense']['awareness'].get('非常了解', 0) + results['sense']['awareness'].get('略有了解', 0)
-        funnel_data.append(('Sense\n(Awareness)', aware_rate))
-    
-    # Interest - Content attraction (using "非常吸引" + "比较吸引")
-    if 'attraction' in results['interest']:
-        interest_rate = results['interest']['attraction'].get('非常吸引', 0) + results['interest']['attraction'].get('比较吸引', 0)
-        funnel_data.append(('Interest', interest_rate))
-    
-    # Communication - Interaction (using "经常互动" + "偶尔互动" + "很少互动")
-    if 'interaction' in results['communication']:
-        comm_rate = results['communication']['interaction'].get('经常互动(点赞、评论、分享等)', 0) + \
-                   results['communication']['interaction'].get('偶尔互动', 0) + \
-                   results['communication']['interaction'].get('很少互动', 0)
-        funnel_data.append(('Communication', comm_rate))
-    
-    # Action - Purchase rate
-    if 'purchase' in results['action']:
-        action_rate = results['action']['purchase'].get('是', 0)
-        funnel_data.append(('Action\n(Purchase)', action_rate))
-    
-    # Share - Satisfaction (using "非常满意" + "比较满意")
-    if 'satisfaction' in results['share']:
-        share_rate = results['share']['satisfaction'].get('非常满意', 0) + results['share']['satisfaction'].get('比较满意', 0)
-        funnel_data.append(('Share/\nSatisfaction', share_rate))
+    conversions = []
+    
+    if funnel is not None:
+        # Respondent-level funnel (sequential_funnel.analyze_sequential_funnel): share of respondents
+        # passing every stage so far, annotated with the conversion from the previous stage
+        labels = ['Sense\n(Awareness)', 'Interest', 'Communication', 'Action\n(Purchase)', 'Share/\nSatisfaction']
+        funnel_data = list(zip(labels, funnel['reach']))
+        conversions = list(funnel['conditional'])
+    else:
+        # Sense - Brand awareness (using "非常了解" + "略有了解")
+        if 'awareness' in results['sense']:
+            aware_rate = results['sense']['awareness'].get('非常了解', 0) + results['sense']['awareness'].get('略有了解', 0)
+            funnel_data.append(('Sense\n(Awareness)', aware_rate))
+    
+        # Interest - Content attraction (using "非常吸引" + "比较吸引")
+        if 'attraction' in results['interest']:
+            interest_rate = results['interest']['attraction'].get('非常吸引', 0) + results['interest']['attraction'].get('比较吸引', 0)
+            funnel_data.append(('Interest', interest_rate))
+    
+        # Communication - Interaction (using "经常互动" + "偶尔互动" + "很少互动")
+        if 'interaction' in results['communication']:
+            comm_rate = results['communication']['interaction'].get('经常互动(点赞、评论、分享等)', 0) + \
+                       results['communication']['interaction'].get('偶尔互动', 0) + \
+                       results['communication']['interaction'].get('很少互动', 0)
+            funnel_data.append(('Communication', comm_rate))
+    
+        # Action - Purchase rate
+        if 'purchase' in results['action']:
+            action_rate = results['action']['purchase'].get('是', 0)
+            funnel_data.append(('Action\n(Purchase)', action_rate))
+    
+        # Share - Satisfaction (using "非常满意" + "比较满意")
+        if 'satisfaction' in results['share']:
+            share_rate = results['share']['satisfaction'].get('非常满意', 0) + results['share']['satisfaction'].get('比较满意', 0)
+            funnel_data.append(('Share/\nSatisfaction', share_rate))
     
     # Plot funnel
     if funnel_data:
@@ -407,94 +413,121 @@ def generate_sicas_funnel(results):
         for i, v in enumerate(values):
             plt.text(i, v + 0.02, f'{v:.2f}', ha='center', fontsize=10)
         
+        # Conversion from the previous stage
+        for i, rate in enumerate(conversions[1:], start=1):
+            plt.text(i, values[i] / 2, f'{rate:.0%} of\nprevious', ha='center', va='center', fontsize=9)
+        
+        if funnel is not None:
+            plt.ylabel('Share of respondents passing every stage so far', fontsize=12)
+        
         plt.tight_layout()
         plt.savefig('plots/sicas_funnel.png', dpi=300)  # Higher DPI for better quality
         plt.close()
 
+@timed
 def generate_report(results, demographics):
-    with open('sicas_analysis_report.md', 'w', encoding='utf-8') as f:
-        f.write('# Arc\'teryx (始祖鸟) Social Media Marketing Analysis Report\n\n')
-        f.write('## SICAS Model Analysis\n\n')
-        
-        # Write SICAS components
-        for component, data in results.items():
-            f.write(f'### {component.capitalize()}\n\n')
-            for key, value in data.items():
-                f.write(f'#### {key.capitalize()}\n\n')
-                f.write('```\n')
-                f.write(str(value))
-                f.write('\n```\n\n')
-                f.write(f'![{component}_{key}](plots/{component}_{key}.png)\n\n')
-        
-        # Write demographics
-        f.write('## Demographic Analysis\n\n')
-        for key, value in demographics.items():
-            f.write(f'### {key.capitalize()}\n\n')
-            f.write('```\n')
-            f.write(str(value))
-            f.write('\n```\n\n')
-            f.write(f'![demographic_{key}](plots/demographic_{key}.png)\n\n')
-        
-        # Write SICAS funnel
-        f.write('## SICAS Funnel\n\n')
-        f.write('![sicas_funnel](plots/sicas_funnel.png)\n\n')
-        
-        # Write recommendations
-        f.write('## Recommendations\n\n')
-        
-        # Sense recommendations
-        f.write('### Improving Brand Awareness\n\n')
-        f.write('- Consider expanding social media presence on platforms with high user engagement\n')
-        f.write('- Develop targeted content that highlights the unique features of Arc\'teryx products\n')
-        f.write('- Collaborate with outdoor influencers and communities to increase brand visibility\n\n')
-        
-        # Interest recommendations
-        f.write('### Enhancing Content Interest\n\n')
-        f.write('- Create more interactive and engaging content formats\n')
-        f.write('- Showcase real customer experiences and testimonials\n')
-        f.write('- Develop educational content about outdoor activities and equipment usage\n\n')
-        
-        # Communication recommendations
-        f.write('### Improving User Interaction\n\n')
-        f.write('- Implement more interactive features in social media posts\n')
-        f.write('- Respond promptly to user comments and messages\n')
-        f.write('- Host live events, Q&A sessions, and contests to encourage participation\n\n')
-        
-        # Action recommendations
-        f.write('### Driving Purchase Decisions\n\n')
-        f.write('- Address price concerns by highlighting product durability and value\n')
-        f.write('- Provide clear information about product features and benefits\n')
-        f.write('- Create exclusive social media promotions and discounts\n\n')
-        
-        # Share recommendations
-        f.write('### Enhancing User Satisfaction and Sharing\n\n')
-        f.write('- Encourage users to share their experiences with Arc\'teryx products\n')
-        f.write('- Create shareable content formats like challenges and user-generated content campaigns\n')
-        f.write('- Reward and recognize users who engage with and share brand content\n\n')
+    """Build the SICAS analysis report and write it as Markdown, HTML and JSON"""
+    blocks = [
+        heading(1, 'Arc\'teryx (始祖鸟) Social Media Marketing Analysis Report'),
+        heading(2, 'SICAS Model Analysis')
+    ]
+    
+    # SICAS components
+    for component, data in results.items():
+        blocks.append(heading(3, component.capitalize()))
+        for key, value in data.items():
+            blocks.append(heading(4, key.capitalize()))
+            blocks.append(series_table(value))
+            blocks.append(image(f'{component}_{key}', f'plots/{component}_{key}.png'))
+    
+    # Demographics
+    blocks.append(heading(2, 'Demographic Analysis'))
+    for key, value in demographics.items():
+        blocks.append(heading(3, key.capitalize()))
+        blocks.append(series_table(value))
+        blocks.append(image(f'demographic_{key}', f'plots/demographic_{key}.png'))
+    
+    # SICAS funnel
+    blocks.append(heading(2, 'SICAS Funnel'))
+    blocks.append(image('sicas_funnel', 'plots/sicas_funnel.png'))
+    
+    # Recommendations, one list per SICAS stage
+    blocks.append(heading(2, 'Recommendations'))
+    recommendations = [
+        ('Improving Brand Awareness', [
+            'Consider expanding social media presence on platforms with high user engagement',
+            'Develop targeted content that highlights the unique features of Arc\'teryx products',
+            'Collaborate with outdoor influencers and communities to increase brand visibility'
+        ]),
+        ('Enhancing Content Interest', [
+            'Create more interactive and engaging content formats',
+            'Showcase real customer experiences and testimonials',
+            'Develop educational content about outdoor activities and equipment usage'
+        ]),
+        ('Improving User Interaction', [
+            'Implement more interactive features in social media posts',
+            'Respond promptly to user comments and messages',
+            'Host live events, Q&A sessions, and contests to encourage participation'
+        ]),
+        ('Driving Purchase Decisions', [
+            'Address price concerns by highlighting product durability and value',
+            'Provide clear information about product features and benefits',
+            'Create exclusive social media promotions and discounts'
+        ]),
+        ('Enhancing User Satisfaction and Sharing', [
+            'Encourage users to share their experiences with Arc\'teryx products',
+            'Create shareable content formats like challenges and user-generated content campaigns',
+            'Reward and recognize users who engage with and share brand content'
+        ])
+    ]
+    for title, items in recommendations:
+        blocks.append(heading(3, title))
+        blocks.append(bullets(items))
+    
+    write_report(blocks, 'sicas_analysis_report')
+    return blocks
 
 def main():
+    parser = argparse.ArgumentParser(description='SICAS analysis of the survey export')
+    parser.add_argument('--weights', default=None, help="respondent weights CSV written by survey_weighting.py")
+    args = parser.parse_args()
+    
     print("Loading data...")
     df = load_data()
     
     print("Cleaning data...")
     df = clean_data(df)
+    weights = load_weights(args.weights, df) if args.weights else None
+    
+    print("Checking survey routing...")
+    print(routing_diagnostics(response_masks(df)).to_string())
     
     print("Analyzing SICAS components...")
-    sicas_results = analyze_sicas(df)
+    sicas_results = analyze_sicas(df, weights=weights)
     
     print("Performing demographic analysis...")
-    demographics = perform_demographic_analysis(df)
+    demographics = perform_demographic_analysis(df, weights=weights)
     
     print("Visualizing SICAS components...")
     visualize_sicas(sicas_results)
     
+    # Imported here: sequential_funnel builds on this module
+    from sequential_funnel import analyze_sequential_funnel
+    
     print("Generating SICAS funnel...")
-    generate_sicas_funnel(sicas_results)
+    generate_sicas_funnel(sicas_results, analyze_sequential_funnel(df, weights))
     
     print("Generating report...")
     generate_report(sicas_results, demographics)
     
-    print("Analysis complete! Results saved in 'sicas_analysis_report.md' and 'plots/' directory.")
+    # Imported here: results_export depends on significance_testing, which imports this module
+    from results_export import sicas_stage_results, demographic_stage_results, write_stage_results
+    
+    print("Exporting machine-readable results...")
+    write_stage_results(sicas_stage_results(sicas_results, df, weights))
+    write_stage_results(demographic_stage_results(demographics, df, weights))
+    
+    print("Analysis complete! Results saved in 'sicas_analysis_report.md' (plus .html/.json), 'plots/' and 'results/' directories.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,283 @@
+import pandas as pd
+import numpy as np
+from scipy import stats
+from sicas_analysis import load_data, clean_data, get_translated_label
+from survey_config import DEFAULT_QUESTIONS
+from survey_weighting import respondent_weights, effective_weights
+from instrumentation import timed
+
+# Demographic segments used for cross-analysis (cleaned column names)
+DEMOGRAPHIC_COLUMNS = {key: DEFAULT_QUESTIONS[key] for key in
+                       ['gender', 'age', 'occupation', 'income', 'social_media_usage']}
+
+# SICAS outcome questions compared across segments
+SICAS_COLUMNS = {key: DEFAULT_QUESTIONS[key] for key in
+                 ['awareness', 'attraction', 'interaction', 'purchase', 'satisfaction']}
+
+# Answers counted as "passing" each SICAS stage (same definitions as the funnel)
+STAGE_PASS_LEVELS = {
+    'awareness': ['非常了解', '略有了解'],
+    'attraction': ['非常吸引', '比较吸引'],
+    'interaction': ['经常互动(点赞、评论、分享等)', '偶尔互动', '很少互动'],
+    'purchase': ['是'],
+    'satisfaction': ['非常满意', '比较满意']
+}
+
+def build_contingency_cache(df, weights=None):
+    """Count every demographic x SICAS crosstab once into a padded 3-D array
+
+    With respondent weights the cells hold weighted counts scaled to the Kish effective
+    sample size, so the count-based tests below account for the design effect.
+    """
+    cell_weights = effective_weights(respondent_weights(df, weights)) if weights is not None else None
+
+    # Factorize each column a single time; -1 marks missing answers
+    factorized = {}
+    for key, col in {**DEMOGRAPHIC_COLUMNS, **SICAS_COLUMNS}.items():
+        if col in df.columns:
+            codes, levels = pd.factorize(df[col])
+            factorized[key] = (codes, list(levels))
+
+    pairs = [(demo, outcome) for demo in DEMOGRAPHIC_COLUMNS for outcome in SICAS_COLUMNS
+             if demo in factorized and outcome in factorized]
+
+    if not pairs:
+        return {'pairs': [], 'counts': np.zeros((0, 0, 0), dtype=np.int64 if weights is None else np.float64),
+                'row_levels': [], 'col_levels': []}
+
+    max_rows = max(len(factorized[demo][1]) for demo, _ in pairs)
+    max_cols = max(len(factorized[outcome][1]) for _, outcome in pairs)
+    counts = np.zeros((len(pairs), max_rows, max_cols), dtype=np.int64 if weights is None else np.float64)
+
+    for t, (demo, outcome) in enumerate(pairs):
+        row_codes, row_levels = factorized[demo]
+        col_codes, col_levels = factorized[outcome]
+        valid = (row_codes >= 0) & (col_codes >= 0)
+
+        # One bincount over the combined cell index gives the whole table
+        n_cols = len(col_levels)
+        cells = np.bincount(row_codes[valid] * n_cols + col_codes[valid],
+                            weights=cell_weights[valid] if cell_weights is not None else None,
+                            minlength=len(row_levels) * n_cols)
+        counts[t, :len(row_levels), :n_cols] = cells.reshape(len(row_levels), n_cols)
+
+    return {
+        'pairs': pairs,
+        'counts': counts,
+        'row_levels': [factorized[demo][1] for demo, _ in pairs],
+        'col_levels': [factorized[outcome][1] for _, outcome in pairs]
+    }
+
+def chi_square_tests(counts):
+    """Pearson chi-square test of independence for a stack of padded tables"""
+    counts = counts.astype(float)
+    row_totals = counts.sum(axis=2)
+    col_totals = counts.sum(axis=1)
+    n = row_totals.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = row_totals[:, :, None] * col_totals[:, None, :] / n[:, None, None]
+        contributions = np.where(expected > 0, (counts - expected) ** 2 / expected, 0.0)
+    chi2 = contributions.sum(axis=(1, 2))
+
+    # Padding rows/columns have zero margins and do not count towards the dof
+    n_rows = (row_totals > 0).sum(axis=1)
+    n_cols = (col_totals > 0).sum(axis=1)
+    dof = (n_rows - 1) * (n_cols - 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_values = np.where(dof > 0, stats.chi2.sf(chi2, np.maximum(dof, 1)), np.nan)
+        cramers_v = np.sqrt(chi2 / (n * np.maximum(np.minimum(n_rows, n_cols) - 1, 1)))
+
+    min_expected = np.where(expected > 0, expected, np.inf).min(axis=(1, 2))
+
+    return {'chi2': chi2, 'dof': dof, 'p_value': p_values,
+            'cramers_v': cramers_v, 'min_expected': min_expected}
+
+def fisher_exact_tests(tables):
+    """Two-sided Fisher exact test for a stack of 2x2 tables (weighted counts are rounded)"""
+    tables = np.rint(np.asarray(tables)).astype(np.int64)
+    if len(tables) == 0:
+        return np.zeros(0)
+
+    a = tables[:, 0, 0]
+    row1 = tables[:, 0, :].sum(axis=1)
+    col1 = tables[:, :, 0].sum(axis=1)
+    n = tables.sum(axis=(1, 2))
+
+    # Enumerate the support of cell a for every table on one shared grid
+    low = np.maximum(0, row1 + col1 - n)
+    high = np.minimum(row1, col1)
+    grid = low[:, None] + np.arange((high - low).max() + 1)[None, :]
+    in_support = grid <= high[:, None]
+
+    log_pmf = stats.hypergeom.logpmf(grid, n[:, None], row1[:, None], col1[:, None])
+    observed = stats.hypergeom.logpmf(a, n, row1, col1)
+
+    # Sum the probabilities of all tables at least as extreme as the observed one
+    extreme = in_support & (log_pmf <= observed[:, None] + 1e-7)
+    p_values = np.where(extreme, np.exp(log_pmf), 0.0).sum(axis=1)
+
+    return np.minimum(p_values, 1.0)
+
+def two_proportion_z_tests(successes, totals):
+    """Two-proportion z-test of each segment level against all other respondents"""
+    successes = successes.astype(float)
+    totals = totals.astype(float)
+
+    all_successes = successes.sum(axis=1, keepdims=True)
+    all_totals = totals.sum(axis=1, keepdims=True)
+    rest_successes = all_successes - successes
+    rest_totals = all_totals - totals
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        level_rate = successes / totals
+        rest_rate = rest_successes / rest_totals
+        pooled = all_successes / all_totals
+        se = np.sqrt(pooled * (1 - pooled) * (1 / totals + 1 / rest_totals))
+        z = (level_rate - rest_rate) / se
+
+    valid = (totals > 0) & (rest_totals > 0) & (se > 0)
+    z = np.where(valid, z, np.nan)
+    p_values = np.where(valid, 2 * stats.norm.sf(np.abs(z)), np.nan)
+
+    return {'z': z, 'p_value': p_values, 'level_rate': level_rate, 'rest_rate': rest_rate}
+
+def benjamini_hochberg(p_values):
+    """Benjamini-Hochberg adjusted p-values (q-values); NaNs are left out"""
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full_like(p_values, np.nan)
+
+    valid = ~np.isnan(p_values)
+    m = valid.sum()
+    if m == 0:
+        return q_values
+
+    p = p_values[valid]
+    order = np.argsort(p)
+    ranked = p[order] * m / np.arange(1, m + 1)
+
+    # Enforce monotonicity from the largest p-value downwards
+    ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+    adjusted = np.empty(m)
+    adjusted[order] = np.minimum(ranked, 1.0)
+    q_values[valid] = adjusted
+
+    return q_values
+
+@timed
+def run_segment_tests(df, alpha=0.05, cache=None, weights=None):
+    """Test every demographic x SICAS crosstab and control the false discovery rate"""
+
+    if cache is None:
+        cache = build_contingency_cache(df, weights)
+
+    pairs = cache['pairs']
+    counts = cache['counts']
+    if not pairs:
+        return pd.DataFrame()
+
+    records = []
+
+    # Omnibus tests: chi-square, or Fisher exact for sparse 2x2 tables
+    chi = chi_square_tests(counts)
+    n_rows = (counts.sum(axis=2) > 0).sum(axis=1)
+    n_cols = (counts.sum(axis=1) > 0).sum(axis=1)
+    use_fisher = (n_rows == 2) & (n_cols == 2) & (chi['min_expected'] < 5)
+
+    fisher_p = np.full(len(pairs), np.nan)
+    if use_fisher.any():
+        # Compact the padded tables down to their non-empty 2x2 cells
+        fisher_tables = []
+        for t in np.flatnonzero(use_fisher):
+            table = counts[t]
+            table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+            fisher_tables.append(table)
+        fisher_p[use_fisher] = fisher_exact_tests(np.stack(fisher_tables))
+
+    for t, (demo, outcome) in enumerate(pairs):
+        records.append({
+            'segment': demo,
+            'outcome': outcome,
+            'test': 'fisher_exact' if use_fisher[t] else 'chi_square',
+            'level': None,
+            'statistic': np.nan if use_fisher[t] else chi['chi2'][t],
+            'effect': chi['cramers_v'][t],
+            'level_rate': np.nan,
+            'rest_rate': np.nan,
+            'p_value': fisher_p[t] if use_fisher[t] else chi['p_value'][t]
+        })
+
+    # Stage-pass rates per segment level, tested level-vs-rest in one pass
+    pass_mask = np.zeros(counts.shape[0::2], dtype=bool)
+    for t, (_, outcome) in enumerate(pairs):
+        levels = cache['col_levels'][t]
+        for j, level in enumerate(levels):
+            pass_mask[t, j] = level in STAGE_PASS_LEVELS.get(outcome, [])
+
+    successes = (counts * pass_mask[:, None, :]).sum(axis=2)
+    totals = counts.sum(axis=2)
+    z_tests = two_proportion_z_tests(successes, totals)
+
+    for t, (demo, outcome) in enumerate(pairs):
+        for i, level in enumerate(cache['row_levels'][t]):
+            records.append({
+                'segment': demo,
+                'outcome': outcome,
+                'test': 'two_proportion_z',
+                'level': level,
+                'statistic': z_tests['z'][t, i],
+                'effect': z_tests['level_rate'][t, i] - z_tests['rest_rate'][t, i],
+                'level_rate': z_tests['level_rate'][t, i],
+                'rest_rate': z_tests['rest_rate'][t, i],
+                'p_value': z_tests['p_value'][t, i]
+            })
+
+    results = pd.DataFrame(records)
+
+    # Benjamini-Hochberg correction across all tests at once
+    results['q_value'] = benjamini_hochberg(results['p_value'].to_numpy())
+    results['significant'] = results['q_value'] < alpha
+
+    return results
+
+def summarize_significant_findings(test_results, max_findings=3):
+    """Describe the strongest significant level-vs-rest differences in plain text"""
+
+    if test_results is None or test_results.empty:
+        return []
+
+    findings = test_results[
+        (test_results['test'] == 'two_proportion_z') & test_results['significant']
+    ].sort_values('q_value')
+
+    summaries = []
+    for _, row in findings.head(max_findings).iterrows():
+        direction = 'higher' if row['effect'] > 0 else 'lower'
+        summaries.append("{} respondents ({}) show a {} {} rate ({:.1f}% vs. {:.1f}% for all others, q = {:.3f})".format(
+            get_translated_label(row['level']),
+            row['segment'].replace('_', ' '),
+            direction,
+            row['outcome'],
+            row['level_rate'] * 100,
+            row['rest_rate'] * 100,
+            row['q_value']
+        ))
+
+    return summaries
+
+def main():
+    print("Loading data for segment significance testing...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Running significance tests for demographic x SICAS crosstabs...")
+    test_results = run_segment_tests(df)
+
+    significant = test_results[test_results['significant']] if not test_results.empty else test_results
+    print(f"{len(significant)} of {len(test_results)} tests significant after Benjamini-Hochberg correction.")
+    for summary in summarize_significant_findings(test_results):
+        print(f"- {summary}")
+
+if __name__ == "__main__":
+    main()
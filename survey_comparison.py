@@ -0,0 +1,274 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import seaborn as sns
+from scipy import stats
+from significance_testing import STAGE_PASS_LEVELS, benjamini_hochberg
+from results_export import load_stage_results
+from report_engine import heading, paragraph, bullets, image, table, write_report
+from thesis_enhancements import ARCTERYX_COLORS
+from instrumentation import timed
+
+# Create output directories
+if not os.path.exists('comparison_plots'):
+    os.makedirs('comparison_plots')
+
+# Funnel stages in order: (analyze_sicas component, metric, display name)
+FUNNEL_STAGES = [
+    ('sense', 'awareness', 'Sense'),
+    ('interest', 'attraction', 'Interest'),
+    ('communication', 'interaction', 'Communication'),
+    ('action', 'purchase', 'Action'),
+    ('share', 'satisfaction', 'Share')
+]
+
+def discover_result_dirs(root):
+    """Survey name -> results directory, for every batch_runner output folder under root with stored aggregates"""
+    surveys = {}
+    if not os.path.isdir(root):
+        return surveys
+    for name in sorted(os.listdir(root)):
+        results_dir = os.path.join(root, name, 'results')
+        if os.path.exists(os.path.join(results_dir, 'sicas_distributions.parquet')):
+            surveys[name] = results_dir
+    return surveys
+
+@timed
+def load_survey_distributions(result_dirs):
+    """Stacked SICAS distributions of several surveys, read from their stored results (no raw data needed)"""
+    frames = []
+    for name, directory in result_dirs.items():
+        distributions = load_stage_results('sicas', directory).distributions
+        frames.append(distributions.assign(survey=name))
+    return pd.concat(frames, ignore_index=True)
+
+def align_levels(distributions, surveys=None):
+    """Count cube (survey x level) per metric, with answer levels aligned across surveys
+
+    Levels missing from a survey count as zero. Weighted surveys contribute their effective counts and
+    bases, so their tests carry the design effect. Returns {metric: (counts DataFrame, bases Series)}.
+    """
+    if surveys is None:
+        surveys = list(dict.fromkeys(distributions['survey']))
+
+    aligned = {}
+    for (component, metric), rows in distributions.groupby(['group', 'metric'], sort=False):
+        counts = rows.pivot_table(index='survey', columns='level', values='count', aggfunc='sum')
+        counts = counts.reindex(index=surveys).fillna(0).astype(np.float64)
+        bases = rows.groupby('survey')['base'].first().reindex(surveys).fillna(0).astype(np.float64)
+        aligned[(component, metric)] = (counts, bases)
+    return aligned
+
+def stage_rate_arrays(aligned, stages=FUNNEL_STAGES):
+    """Funnel stage successes and bases as (survey x stage) arrays"""
+    surveys = next(iter(aligned.values()))[0].index
+    successes = np.zeros((len(surveys), len(stages)))
+    bases = np.zeros((len(surveys), len(stages)))
+
+    for j, (component, metric, _) in enumerate(stages):
+        if (component, metric) not in aligned:
+            continue
+        counts, base = aligned[(component, metric)]
+        passing = [level for level in STAGE_PASS_LEVELS[metric] if level in counts.columns]
+        successes[:, j] = counts[passing].sum(axis=1).to_numpy()
+        bases[:, j] = base.to_numpy()
+
+    return successes, bases
+
+def pairwise_proportion_tests(successes, bases):
+    """Two-proportion z-tests between every pair of surveys, for every stage at once
+
+    Inputs are (survey x stage); outputs are (survey x survey x stage) arrays of
+    differences (row survey minus column survey), z statistics and p-values.
+    """
+    successes = successes.astype(float)
+    bases = bases.astype(float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates = successes / bases
+        difference = rates[:, None, :] - rates[None, :, :]
+        pooled = (successes[:, None, :] + successes[None, :, :]) / (bases[:, None, :] + bases[None, :, :])
+        se = np.sqrt(pooled * (1 - pooled) * (1 / bases[:, None, :] + 1 / bases[None, :, :]))
+        z = difference / se
+
+    valid = (bases[:, None, :] > 0) & (bases[None, :, :] > 0) & (se > 0)
+    z = np.where(valid, z, np.nan)
+    p_values = np.where(valid, 2 * stats.norm.sf(np.abs(z)), np.nan)
+
+    return {'rate': rates, 'difference': difference, 'z': z, 'p_value': p_values}
+
+@timed
+def compare_surveys(distributions, alpha=0.05, surveys=None):
+    """Stage rates of every survey and all pairwise differences with BH-adjusted significance"""
+    aligned = align_levels(distributions, surveys)
+    successes, bases = stage_rate_arrays(aligned)
+    names = list(next(iter(aligned.values()))[0].index)
+    tests = pairwise_proportion_tests(successes, bases)
+
+    stage_names = [display for _, _, display in FUNNEL_STAGES]
+    rates = pd.DataFrame(tests['rate'], index=names, columns=stage_names)
+
+    # Each unordered pair once (upper triangle), adjusted together across pairs and stages
+    first, second = np.triu_indices(len(names), k=1)
+    p_values = tests['p_value'][first, second, :]
+    q_values = benjamini_hochberg(p_values.ravel()).reshape(p_values.shape)
+
+    pairs = pd.DataFrame({
+        'survey_a': np.repeat(np.array(names, dtype=object)[first], len(stage_names)),
+        'survey_b': np.repeat(np.array(names, dtype=object)[second], len(stage_names)),
+        'stage': np.tile(stage_names, len(first)),
+        'rate_a': tests['rate'][first, :].ravel(),
+        'rate_b': tests['rate'][second, :].ravel(),
+        'difference': tests['difference'][first, second, :].ravel(),
+        'z': tests['z'][first, second, :].ravel(),
+        'p_value': p_values.ravel(),
+        'q_value': q_values.ravel()
+    })
+    pairs['significant'] = pairs['q_value'] < alpha
+
+    return {
+        'aligned': aligned,
+        'rates': rates,
+        'bases': pd.DataFrame(bases, index=names, columns=stage_names),
+        'tests': tests,
+        'pairs': pairs
+    }
+
+def level_comparison(aligned, component, metric):
+    """Answer shares of one question side by side for every survey, on the aligned levels"""
+    counts, bases = aligned[(component, metric)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = counts.div(bases.replace(0, np.nan), axis=0)
+    return shares.T
+
+@timed
+def plot_stage_rates(comparison):
+    """Grouped bar chart of funnel stage rates per survey"""
+    rates = comparison['rates']
+    colors = (ARCTERYX_COLORS * (len(rates) // len(ARCTERYX_COLORS) + 1))[:len(rates)]
+
+    plt.figure(figsize=(12, 7))
+    rates.T.plot(kind='bar', color=colors, ax=plt.gca(), width=0.8)
+    plt.ylim(0, 1)
+    plt.title('SICAS Funnel by Survey', fontsize=18, pad=20)
+    plt.ylabel('Proportion', fontsize=14)
+    plt.xticks(rotation=0)
+    plt.legend(title='Survey', bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.tight_layout()
+    plt.savefig('comparison_plots/stage_rates.png', dpi=300)
+    plt.close()
+
+@timed
+def plot_reference_differences(comparison, reference):
+    """Heatmap of stage-rate differences against a reference survey; * marks BH-significant differences"""
+    rates = comparison['rates']
+    names = list(rates.index)
+    ref = names.index(reference)
+    others = [i for i in range(len(names)) if i != ref]
+    if not others:
+        return
+
+    difference = comparison['tests']['difference'][others, ref, :]
+    pairs = comparison['pairs']
+    significant = np.zeros_like(difference, dtype=bool)
+    for row, i in enumerate(others):
+        rows = pairs[((pairs['survey_a'] == names[i]) & (pairs['survey_b'] == reference)) |
+                     ((pairs['survey_a'] == reference) & (pairs['survey_b'] == names[i]))]
+        significant[row] = rows['significant'].to_numpy()
+
+    labels = np.where(significant, np.char.add(np.char.mod('%+.3f', difference), '*'),
+                      np.char.mod('%+.3f', difference))
+
+    plt.figure(figsize=(10, 1.2 + 0.6 * len(others)))
+    sns.heatmap(
+        pd.DataFrame(difference, index=[names[i] for i in others], columns=rates.columns),
+        cmap=sns.diverging_palette(20, 230, as_cmap=True),
+        center=0,
+        annot=labels,
+        fmt='',
+        linewidths=.5,
+        cbar_kws={'label': f'Difference vs {reference}'}
+    )
+    plt.title(f'Stage Rate Differences vs {reference}', fontsize=16, pad=15)
+    plt.tight_layout()
+    plt.savefig('comparison_plots/reference_differences.png', dpi=300)
+    plt.close()
+
+@timed
+def generate_comparison_report(comparison, reference):
+    """Build the cross-survey comparison report and write it as Markdown, HTML and JSON"""
+    rates = comparison['rates']
+    bases = comparison['bases']
+    pairs = comparison['pairs']
+    significant = pairs[pairs['significant']]
+
+    blocks = [
+        heading(1, 'Cross-Survey SICAS Comparison'),
+        paragraph(f'Surveys compared: {len(rates)}. Stage rates use the same "passing" answers as the SICAS funnel; '
+                  f'differences are tested with two-proportion z-tests and Benjamini-Hochberg adjusted across all '
+                  f'survey pairs and stages. Weighted surveys are tested on their effective sample sizes.'),
+        heading(2, 'Stage Rates'),
+        table(['Survey'] + list(rates.columns),
+              [[name] + [f'{rate:.3f} (n={base:.0f})' for rate, base in zip(rates.loc[name], bases.loc[name])]
+               for name in rates.index]),
+        image('Stage rates by survey', 'comparison_plots/stage_rates.png'),
+        heading(2, f'Differences vs {reference}')
+    ]
+
+    if len(rates) > 1:
+        blocks.append(image(f'Differences vs {reference}', 'comparison_plots/reference_differences.png'))
+
+    blocks.append(heading(2, 'Significant Differences'))
+    if significant.empty:
+        blocks.append(paragraph('No stage rate differs significantly between any pair of surveys.'))
+    else:
+        blocks.append(bullets(
+            f"**{row.stage}**: {row.survey_a} {row.rate_a:.1%} vs {row.survey_b} {row.rate_b:.1%} "
+            f"({row.difference:+.1%}, q = {row.q_value:.4f})"
+            for row in significant.itertuples()
+        ))
+
+    blocks.append(heading(2, 'All Pairwise Tests'))
+    blocks.append(table(
+        ['Survey A', 'Survey B', 'Stage', 'Difference', 'z', 'p', 'q'],
+        [[row.survey_a, row.survey_b, row.stage, f'{row.difference:+.3f}', f'{row.z:.2f}',
+          f'{row.p_value:.4f}', f'{row.q_value:.4f}'] for row in pairs.itertuples()]
+    ))
+
+    write_report(blocks, 'survey_comparison_report')
+    return blocks
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare SICAS funnels across surveys from their stored results')
+    parser.add_argument('root', nargs='?', default='batch_output', help='batch_runner output directory')
+    parser.add_argument('--reference', default=None, help='survey the others are compared against (default: first)')
+    args = parser.parse_args()
+
+    print("Loading stored survey aggregates...")
+    result_dirs = discover_result_dirs(args.root)
+    if not result_dirs:
+        print(f"No stored results found under '{args.root}'.")
+        return
+    distributions = load_survey_distributions(result_dirs)
+
+    print("Comparing stage rates across surveys...")
+    comparison = compare_surveys(distributions)
+    reference = args.reference or comparison['rates'].index[0]
+    if reference not in comparison['rates'].index:
+        print(f"Reference survey '{reference}' not found; available: {', '.join(comparison['rates'].index)}.")
+        return
+
+    print("Creating comparison charts...")
+    plot_stage_rates(comparison)
+    plot_reference_differences(comparison, reference)
+
+    print("Generating comparison report...")
+    generate_comparison_report(comparison, reference)
+
+    print(comparison['rates'].round(3).to_string())
+    print("Comparison complete! Results saved in 'survey_comparison_report.md' (plus .html/.json) and 'comparison_plots/' directory.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import json
+import numpy as np
+import pandas as pd
+from survey_encoding import LIKERT_REGISTRY, MULTISELECT_QUESTIONS, SKIP_MARKERS
+
+# Logical question keys mapped to the cleaned column names of the reference (始祖鸟) survey
+DEFAULT_QUESTIONS = {
+    # Demographics
+    'gender': '您的性别',
+    'age': '您的年龄',
+    'occupation': '您的职业',
+    'income': '您的月收入（人民币）:',
+    'social_media_usage': '您每天使用社交媒体的时长大约是多少？',
+
+    # SICAS items
+    'awareness': LIKERT_REGISTRY['S1']['question'],
+    'attraction': LIKERT_REGISTRY['I1']['question'],
+    'interaction': LIKERT_REGISTRY['C1']['question'],
+    'interaction_experience': LIKERT_REGISTRY['C2']['question'],
+    'purchase': LIKERT_REGISTRY['A1']['question'],
+    'satisfaction': LIKERT_REGISTRY['S2']['question'],
+
+    # Multi-select questions
+    **MULTISELECT_QUESTIONS,
+
+    # Other questions
+    'increased_understanding': '始祖鸟社交媒体是否增加了您对品牌的了解？',
+    'suggestions': '您对始祖鸟社交媒体营销有哪些建议或想法？请简要描述。'
+}
+
+# Routed questions: logical key -> (key of the routing question, answers that route a respondent to it)
+DEFAULT_ROUTING = {
+    'purchase_channels': ('purchase', ['是']),
+    'purchase_barriers': ('purchase', ['否'])
+}
+
+DEFAULT_CONFIG = {
+    'name': 'arcteryx',
+    'brand_zh': '始祖鸟',
+    'brand_en': 'Arc\'teryx',
+    'questions': DEFAULT_QUESTIONS,
+    'routing': DEFAULT_ROUTING
+}
+
+def load_survey_config(path=None):
+    """Load a questionnaire config; brand names are substituted into the reference questions and
+    any explicit 'questions' entries override the result"""
+    if path is None:
+        return dict(DEFAULT_CONFIG)
+
+    with open(path, encoding='utf-8') as f:
+        overrides = json.load(f)
+
+    brand_zh = overrides.get('brand_zh', DEFAULT_CONFIG['brand_zh'])
+    brand_en = overrides.get('brand_en', DEFAULT_CONFIG['brand_en'])
+    questions = {
+        key: question.replace(DEFAULT_CONFIG['brand_zh'], brand_zh).replace(DEFAULT_CONFIG['brand_en'], brand_en)
+        for key, question in DEFAULT_QUESTIONS.items()
+    }
+    questions.update(overrides.get('questions', {}))
+
+    routing = {key: tuple(rule) for key, rule in overrides.get('routing', DEFAULT_ROUTING).items()}
+
+    unknown = (set(questions) | set(routing) | {condition for condition, _ in routing.values()}) - set(DEFAULT_QUESTIONS)
+    if unknown:
+        raise ValueError(f"Unknown question keys in {path}: {', '.join(sorted(unknown))}")
+
+    return {
+        'name': overrides.get('name', DEFAULT_CONFIG['name']),
+        'brand_zh': brand_zh,
+        'brand_en': brand_en,
+        'questions': questions,
+        'routing': routing
+    }
+
+def survey_questions(config=None):
+    """Logical question key -> column name for a survey (the reference survey by default)"""
+    return DEFAULT_QUESTIONS if config is None else config['questions']
+
+def survey_routing(config=None):
+    """Routed question key -> (routing question key, routing answers) for a survey"""
+    return DEFAULT_ROUTING if config is None else config.get('routing', DEFAULT_ROUTING)
+
+def response_masks(df, config=None):
+    """Boolean masks (respondents x question keys) for every question present, built in one pass
+
+    'answered' is a real answer (not blank, not a skip marker), 'eligible' means the routing sent the
+    respondent to the question, and 'base' is both: the respondents every proportion of that question
+    is computed over.
+    """
+    questions = survey_questions(config)
+    keys = [key for key, column in questions.items() if column in df.columns]
+
+    # Column by column into one array: much faster than isna/isin on a wide object frame
+    answered = np.empty((len(df), len(keys)), dtype=bool)
+    for j, key in enumerate(keys):
+        answered[:, j] = ~df[questions[key]].isin(SKIP_MARKERS + [np.nan]).to_numpy()
+
+    eligible = np.ones_like(answered)
+    for key, (condition, answers) in survey_routing(config).items():
+        if key in keys and questions[condition] in df.columns:
+            eligible[:, keys.index(key)] = df[questions[condition]].isin(answers).to_numpy()
+
+    return {
+        'answered': pd.DataFrame(answered, index=df.index, columns=keys),
+        'eligible': pd.DataFrame(eligible, index=df.index, columns=keys),
+        'base': pd.DataFrame(answered & eligible, index=df.index, columns=keys)
+    }
+
+def routing_diagnostics(masks, config=None):
+    """Per routed question: eligible respondents, the answered base, and answers that break the routing"""
+    answered, eligible = masks['answered'], masks['eligible']
+    routed = [key for key in survey_routing(config) if key in answered.columns]
+    return pd.DataFrame({
+        'eligible': eligible[routed].sum(),
+        'base': (answered[routed] & eligible[routed]).sum(),
+        'skipped_while_eligible': (~answered[routed] & eligible[routed]).sum(),
+        'answered_while_ineligible': (answered[routed] & ~eligible[routed]).sum()
+    })
+
+def missing_questions(df, config=None):
+    """Logical keys whose column is not present in the survey export"""
+    return [key for key, col in survey_questions(config).items() if col not in df.columns]
+
+def canonicalize_columns(df, config=None):
+    """Rename a survey's columns to the reference column names, so registry-based analyses can run on it"""
+    questions = survey_questions(config)
+    renames = {questions[key]: DEFAULT_QUESTIONS[key] for key in DEFAULT_QUESTIONS
+               if questions[key] in df.columns and questions[key] != DEFAULT_QUESTIONS[key]}
+    return df.rename(columns=renames)
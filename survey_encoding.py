@@ -0,0 +1,232 @@
+import pandas as pd
+import numpy as np
+from scipy import sparse
+from instrumentation import timed
+
+# Single registry of ordinal item encodings, keyed by question ID.
+# Scales are listed from the lowest to the highest answer; aliases share a value.
+LIKERT_REGISTRY = {
+    'S1': {
+        'dimension': 'sense',
+        'label': 'Brand_Awareness',
+        'question': '您是否了解始祖鸟（Arc\'teryx）品牌？',
+        'scale': {
+            '完全不了解': 1,
+            '不太了解': 2,
+            '略有了解': 3,
+            '非常了解': 4
+        }
+    },
+    'I1': {
+        'dimension': 'interest',
+        'label': 'Content_Attraction',
+        'question': '始祖鸟的社交媒体内容对您的吸引力如何?',
+        'scale': {
+            '完全不吸引': 1,
+            '不太吸引': 2,
+            '一般': 3,
+            '比较吸引': 4,
+            '非常吸引': 5
+        }
+    },
+    'C1': {
+        'dimension': 'communication',
+        'label': 'Interaction_Level',
+        'question': '您是否曾与始祖鸟的社交媒体账号互动?',
+        'scale': {
+            '从未互动': 1,
+            '很少互动': 2,
+            '偶尔互动': 3,
+            '经常互动(点赞、评论、分享等)': 4
+        }
+    },
+    'C2': {
+        'dimension': 'communication',
+        'label': 'Interaction_Experience',
+        'question': '您认为始祖鸟社交媒体互动的体验如何？',
+        'scale': {
+            '非常差': 1,
+            '较差': 2,
+            '一般': 3,
+            '比较好': 4,
+            '非常好': 5
+        }
+    },
+    'A1': {
+        'dimension': 'action',
+        'label': 'Purchase',
+        'question': '您是否因社交媒体内容购买过始祖鸟产品？',
+        'scale': {
+            '否': 0,
+            '是': 1
+        }
+    },
+    'S2': {
+        'dimension': 'share',
+        'label': 'Satisfaction',
+        'question': '您对始祖鸟社交媒体的整体满意度如何？',
+        'scale': {
+            '非常不满意': 1,
+            '很不满意': 1,
+            '不太满意': 2,
+            '一般': 3,
+            '比较满意': 4,
+            '非常满意': 5
+        }
+    }
+}
+
+def get_item_codes(dimension=None):
+    """Return registry question IDs, optionally restricted to one SICAS dimension"""
+    return [code for code, item in LIKERT_REGISTRY.items()
+            if dimension is None or item['dimension'] == dimension]
+
+@timed
+def encode_likert_items(df, codes=None):
+    """Encode registry items into one contiguous float32 matrix plus a missing-value mask"""
+
+    if codes is None:
+        codes = get_item_codes()
+
+    # Only keep items whose question is present in this survey export
+    codes = [code for code in codes if LIKERT_REGISTRY[code]['question'] in df.columns]
+
+    matrix = np.empty((len(df), len(codes)), dtype=np.float32)
+
+    for j, code in enumerate(codes):
+        item = LIKERT_REGISTRY[code]
+        levels = list(item['scale'].keys())
+
+        # Unknown labels and blanks map to category -1, i.e. the trailing NaN slot
+        lookup = np.array(list(item['scale'].values()) + [np.nan], dtype=np.float32)
+        category_codes = pd.Categorical(df[item['question']], categories=levels).codes
+        matrix[:, j] = lookup[category_codes]
+
+    return {
+        'matrix': matrix,
+        'missing': np.isnan(matrix),
+        'codes': codes
+    }
+
+def item_correlation_matrix(matrix, missing=None, weights=None):
+    """Pearson correlations over pairwise-complete observations, computed with matrix products
+
+    With respondent weights every row counts with its weight (weighted Pearson correlations).
+    """
+
+    if missing is None:
+        missing = np.isnan(matrix)
+
+    observed = (~missing).astype(np.float64)
+    values = np.where(missing, 0.0, matrix).astype(np.float64)
+    weighted = observed if weights is None else observed * np.asarray(weights, dtype=np.float64)[:, None]
+
+    # Sufficient statistics for every item pair restricted to rows where both are observed
+    n = weighted.T @ observed
+    sum_x = (values * weighted).T @ observed
+    sum_xx = (values ** 2 * weighted).T @ observed
+    sum_xy = (values * weighted).T @ values
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = n * sum_xy - sum_x * sum_x.T
+        variance = n * sum_xx - sum_x ** 2
+        corr = covariance / np.sqrt(variance * variance.T)
+
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+def dimension_scores(items, dimensions):
+    """Average each dimension's items into a score matrix (one column per dimension)
+
+    Scores are per respondent, so weights do not enter here; pass them to whatever summarizes the
+    scores (e.g. item_correlation_matrix).
+    """
+
+    matrix = items['matrix']
+    score_names = []
+    scores = []
+
+    for dimension, info in dimensions.items():
+        columns = [items['codes'].index(code) for code in info['codes'] if code in items['codes']]
+        if columns:
+            with np.errstate(invalid='ignore'):
+                block = matrix[:, columns]
+                observed = (~np.isnan(block)).sum(axis=1)
+                total = np.where(np.isnan(block), 0, block).sum(axis=1)
+                scores.append(np.where(observed > 0, total / np.maximum(observed, 1), np.nan))
+            score_names.append(f'{dimension}_score')
+
+    if not scores:
+        return np.empty((len(matrix), 0), dtype=np.float32), score_names
+
+    return np.ascontiguousarray(np.column_stack(scores), dtype=np.float32), score_names
+
+# Multi-select questions; options are separated by '┋'
+MULTISELECT_QUESTIONS = {
+    'contact_channels': '您通过以下哪些渠道接触过始祖鸟品牌?',
+    'interaction_types': '您更倾向于哪种互动方式？（可多选）',
+    'brand_impression': '您对始祖鸟品牌的印象如何？（可多选）',
+    'purchase_channels': '您最常通过以下哪种途径购买？（可多选）',
+    'purchase_barriers': '阻碍您购买的原因是什么？（可多选）',
+    'improvements': '您认为始祖鸟社交媒体内容有哪些需要改进的地方？（可多选）'
+}
+
+MULTISELECT_SEPARATOR = '┋'
+
+# Survey platform markers for routed-away and blank answers
+SKIP_MARKERS = ['(跳过)', '(空)']
+
+# The 'other' option; its free-text write-ins ('其他：〖价格〗') are variants of it
+OTHER_OPTION = '其他'
+
+def encode_multiselect(series):
+    """Sparse 0/1 indicator matrix (respondents x options) for a multi-select question"""
+
+    # Split each distinct answer string once, then index the combinations per respondent
+    codes, answers = pd.factorize(series)
+    option_index = {}
+    rows, cols = [], []
+
+    for u, answer in enumerate(answers):
+        if answer in SKIP_MARKERS:
+            continue
+        for option in str(answer).split(MULTISELECT_SEPARATOR):
+            option = option.strip()
+            if option:
+                rows.append(u)
+                cols.append(option_index.setdefault(option, len(option_index)))
+
+    # The extra trailing row is the empty combination used for missing answers
+    combinations = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int8), (rows, cols)),
+        shape=(len(answers) + 1, len(option_index))
+    )
+    combinations.data[:] = 1
+
+    indicator = combinations[np.where(codes < 0, len(answers), codes)]
+    return indicator.tocsr(), list(option_index.keys())
+
+def collapse_write_ins(indicator, options):
+    """Merge the 'other' option and every write-in variant of it into one OTHER_OPTION column
+
+    Write-ins are mostly picked by a single respondent, so as separate options (predictors,
+    channels) they only split the 'other' answers into noise.
+    """
+    other = [j for j, option in enumerate(options)
+             if option == OTHER_OPTION or option.startswith(OTHER_OPTION + '：')]
+    if not other:
+        return indicator, options
+    keep = [j for j in range(len(options)) if j not in other]
+    merged = sparse.csr_matrix((indicator[:, other].sum(axis=1) > 0).astype(np.int8))
+    return sparse.hstack([indicator[:, keep], merged], format='csr'), [options[j] for j in keep] + [OTHER_OPTION]
+
+def encode_categorical(series):
+    """Sparse one-hot matrix (respondents x levels) for a single-choice question"""
+    codes, levels = pd.factorize(series)
+    valid = codes >= 0
+
+    one_hot = sparse.csr_matrix(
+        (np.ones(valid.sum(), dtype=np.int8), (np.flatnonzero(valid), codes[valid])),
+        shape=(len(series), len(levels))
+    )
+    return one_hot, list(levels)
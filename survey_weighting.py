@@ -0,0 +1,275 @@
+import argparse
+import json
+import numpy as np
+import pandas as pd
+from scipy import stats
+from survey_config import survey_questions
+from survey_encoding import MULTISELECT_SEPARATOR, SKIP_MARKERS, encode_multiselect
+from instrumentation import timed
+
+def kish_design_effect(weights):
+    """Kish design effect due to unequal weighting: n * sum(w^2) / sum(w)^2"""
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights[~np.isnan(weights)]
+    if len(weights) == 0 or weights.sum() <= 0:
+        return np.nan
+    return len(weights) * np.square(weights).sum() / weights.sum() ** 2
+
+def effective_sample_size(weights):
+    """Kish effective sample size: sum(w)^2 / sum(w^2)"""
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights[~np.isnan(weights)]
+    return weights.sum() ** 2 / np.square(weights).sum() if len(weights) else 0.0
+
+def effective_weights(weights):
+    """Weights rescaled to sum to the effective sample size
+
+    Weighted counts then carry the information of the design-effect-adjusted sample, so count-based tests
+    (chi-square, z-tests, multinomial bootstraps) stay valid without further changes.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights * effective_sample_size(weights) / np.nansum(weights)
+
+def respondent_weights(df, weights=None):
+    """Weight vector aligned with the rows of df, or None for an unweighted analysis"""
+    if weights is None:
+        return None
+    if isinstance(weights, pd.Series):
+        return weights.reindex(df.index).astype(np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(weights) != len(df):
+        raise ValueError(f"Got {len(weights)} weights for {len(df)} respondents")
+    return pd.Series(weights, index=df.index)
+
+def load_weights(path, df):
+    """Respondent weights saved by this module's main (weights.csv), aligned with the rows of df"""
+    weights = pd.read_csv(path, index_col=0).iloc[:, 0]
+    missing = df.index.difference(weights.index)
+    if len(missing):
+        raise ValueError(f"'{path}' has no weight for {len(missing)} of {len(df)} respondents")
+    return weights.reindex(df.index).astype(np.float64)
+
+def weighted_value_counts(values, weights=None):
+    """Answer shares like value_counts(normalize=True), each answer counted with its respondent's weight"""
+    values = values.dropna()
+    if weights is None:
+        return values.value_counts(normalize=True)
+
+    totals = weights.reindex(values.index).groupby(values.to_numpy()).sum()
+    totals = totals[totals > 0].sort_values(ascending=False)
+    shares = totals / totals.sum()
+    shares.name = values.name
+    return shares
+
+def multiselect_value_counts(values, weights=None, skip=()):
+    """Option shares of a multi-select question (each mention carries its respondent's weight)"""
+    values = values.dropna()
+    values = values[~values.isin(skip)]
+    mentions = values.str.split(MULTISELECT_SEPARATOR).explode()
+    return weighted_value_counts(mentions, weights)
+
+def weighted_crosstab(rows, columns, weights=None, normalize=False):
+    """pd.crosstab with each respondent counted by their weight"""
+    if weights is None:
+        return pd.crosstab(rows, columns, normalize=normalize)
+    return pd.crosstab(rows, columns, values=weights.reindex(rows.index), aggfunc='sum',
+                       normalize=normalize).fillna(0)
+
+def proportion_confidence_intervals(shares, weights=None, n=None, confidence=0.95):
+    """Wilson intervals for answer shares, on the Kish effective sample size when weighted
+
+    weights (or n) must describe the respondents the shares are computed over, i.e. the question's base.
+    """
+    n_eff = effective_sample_size(weights.dropna()) if weights is not None else n
+    z = stats.norm.ppf(0.5 + confidence / 2)
+    p = shares.to_numpy(dtype=np.float64)
+
+    denominator = 1 + z ** 2 / n_eff
+    center = (p + z ** 2 / (2 * n_eff)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / n_eff + z ** 2 / (4 * n_eff ** 2)) / denominator
+
+    return pd.DataFrame({
+        'proportion': p,
+        'ci_low': np.clip(center - half_width, 0, 1),
+        'ci_high': np.clip(center + half_width, 0, 1),
+        'n_effective': n_eff
+    }, index=shares.index)
+
+def question_confidence_intervals(answers, weights=None, multiselect=False, confidence=0.95):
+    """Wilson intervals for one question over its base: the respondents in answers with a real answer
+
+    The effective sample size comes from the weights of those respondents only, so routed questions
+    get their own (smaller) base. Multi-select options are rated per respondent (share of the base
+    choosing the option), since mention shares have no respondent denominator.
+    """
+    answers = answers.dropna()
+    answers = answers[~answers.isin(SKIP_MARKERS)]
+    base_weights = weights.reindex(answers.index) if weights is not None else None
+
+    if multiselect:
+        indicator, options = encode_multiselect(answers)
+        row_weights = base_weights.to_numpy() if base_weights is not None else np.ones(len(answers))
+        chosen = np.asarray(indicator.T @ row_weights).ravel()
+        rates = pd.Series(chosen / row_weights.sum(), index=options).sort_values(ascending=False)
+    else:
+        rates = weighted_value_counts(answers, base_weights)
+
+    return proportion_confidence_intervals(rates, base_weights, n=len(answers), confidence=confidence)
+
+def load_target_margins(path):
+    """Read population margins: {question key: {answer level: population share}}"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def raking_codes(df, targets, config=None):
+    """Code matrix (respondents x variables) against the target levels; the last code of each variable is 'missing'
+
+    Respondents with a blank answer keep their observed share of that variable, so raking does not
+    push weight onto or away from non-response.
+    """
+    questions = survey_questions(config)
+    codes = np.empty((len(df), len(targets)), dtype=np.int64)
+    target_shares = []
+
+    for j, (key, margin) in enumerate(targets.items()):
+        column = df[questions[key]]
+        levels = list(margin)
+        unknown = set(column.dropna().unique()) - set(levels)
+        if unknown:
+            raise ValueError(f"Answers without a target share for '{key}': {', '.join(map(str, sorted(unknown)))}")
+
+        category_codes = pd.Categorical(column, categories=levels).codes
+        codes[:, j] = np.where(category_codes < 0, len(levels), category_codes)
+
+        shares = np.array([margin[level] for level in levels], dtype=np.float64)
+        missing_share = column.isna().mean()
+        target_shares.append(np.append(shares / shares.sum() * (1 - missing_share), missing_share))
+
+    return codes, target_shares
+
+def rake(codes, target_shares, base_weights=None, max_iter=100, tol=1e-6):
+    """Iterative proportional fitting on the cross-classified cell cube of the raking variables
+
+    Each iteration rescales the whole cube to one margin at a time, so the loop costs
+    O(cells) per variable regardless of the sample size. Returns per-respondent weights.
+    """
+    n = len(codes)
+    base = np.ones(n) if base_weights is None else np.asarray(base_weights, dtype=np.float64)
+    shape = tuple(len(shares) for shares in target_shares)
+
+    # Weighted sample count in every cell of the demographic cube
+    cells = np.ravel_multi_index(codes.T, shape)
+    observed = np.bincount(cells, weights=base, minlength=int(np.prod(shape))).reshape(shape)
+    total = observed.sum()
+    fitted = observed.copy()
+
+    converged = False
+    for iteration in range(1, max_iter + 1):
+        max_change = 0.0
+        for axis, shares in enumerate(target_shares):
+            other_axes = tuple(a for a in range(len(shape)) if a != axis)
+            margin = fitted.sum(axis=other_axes)
+            factor = np.divide(shares * total, margin, out=np.ones_like(margin), where=margin > 0)
+            fitted *= np.expand_dims(factor, other_axes)
+            max_change = max(max_change, np.abs(factor[margin > 0] - 1).max())
+        if max_change < tol:
+            converged = True
+            break
+
+    # Each respondent's weight scales by the adjustment of their cell
+    adjustment = np.divide(fitted, observed, out=np.zeros_like(fitted), where=observed > 0)
+    weights = base * adjustment.ravel()[cells]
+
+    # Margins that cannot be met (a target level with no respondents) are reported, not hidden
+    margin_error = max(
+        np.abs(np.bincount(codes[:, j], weights=weights, minlength=len(shares)) / weights.sum() - shares).max()
+        for j, shares in enumerate(target_shares)
+    )
+
+    return {'weights': weights, 'iterations': iteration, 'converged': converged, 'max_margin_error': margin_error}
+
+@timed
+def rake_weights(df, targets, config=None, base_weights=None, max_iter=100, tol=1e-6, max_weight=None):
+    """Raking weights (mean 1) matching the target margins, with optional trimming of extreme weights"""
+    codes, target_shares = raking_codes(df, targets, config)
+    fit = rake(codes, target_shares, base_weights, max_iter, tol)
+    weights = fit['weights'] / fit['weights'].mean()
+
+    if max_weight is not None:
+        # Trim and re-rake until no weight exceeds the cap (margins stay matched when possible)
+        for _ in range(max_iter):
+            if weights.max() <= max_weight * (1 + tol):
+                break
+            fit = rake(codes, target_shares, np.minimum(weights, max_weight), max_iter, tol)
+            weights = fit['weights'] / fit['weights'].mean()
+
+    return {
+        'weights': pd.Series(weights, index=df.index, name='weight'),
+        'iterations': fit['iterations'],
+        'converged': fit['converged'],
+        'max_margin_error': fit['max_margin_error'],
+        'design_effect': kish_design_effect(weights),
+        'effective_sample_size': effective_sample_size(weights)
+    }
+
+def margin_comparison(df, weights, targets, config=None):
+    """Sample, weighted and target shares of every raking variable"""
+    questions = survey_questions(config)
+    records = []
+    for key, margin in targets.items():
+        column = df[questions[key]]
+        sample = weighted_value_counts(column)
+        weighted = weighted_value_counts(column, weights)
+        total = sum(margin.values())
+        for level, share in margin.items():
+            records.append({
+                'variable': key,
+                'level': level,
+                'sample': sample.get(level, 0.0),
+                'weighted': weighted.get(level, 0.0),
+                'target': share / total
+            })
+    return pd.DataFrame(records)
+
+def main():
+    # Imported here: sicas_analysis imports this module for the weighted counts
+    from sicas_analysis import load_data, clean_data
+    from survey_config import response_masks
+    from results_export import SICAS_METRIC_QUESTIONS, QUESTION_KEYS
+    from survey_encoding import MULTISELECT_QUESTIONS
+
+    parser = argparse.ArgumentParser(description='Rake survey weights to population margins')
+    parser.add_argument('targets', help='JSON file of population margins, e.g. {"gender": {"男": 0.51, "女": 0.49}}')
+    parser.add_argument('--max-weight', type=float, default=None, help='trim weights above this multiple of the mean')
+    parser.add_argument('--output', default='weights.csv', help='where to write the respondent weights')
+    args = parser.parse_args()
+
+    print("Loading data for weighting...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Raking to target margins...")
+    targets = load_target_margins(args.targets)
+    raking = rake_weights(df, targets, max_weight=args.max_weight)
+    print(f"{'Converged' if raking['converged'] else 'Did not converge'} after {raking['iterations']} iterations "
+          f"(max margin error {raking['max_margin_error']:.2e})")
+    print(f"Design effect {raking['design_effect']:.3f}, effective sample size "
+          f"{raking['effective_sample_size']:.1f} of {len(df)}")
+    print(margin_comparison(df, raking['weights'], targets).round(3).to_string(index=False))
+
+    print("Weighted SICAS funnel inputs (respondent-level rates over each question's base):")
+    base = response_masks(df)['base']
+    for (component, key), column in SICAS_METRIC_QUESTIONS.items():
+        if column not in df.columns:
+            continue
+        answers = df[column][base[QUESTION_KEYS[column]]]
+        intervals = question_confidence_intervals(answers, raking['weights'],
+                                                  multiselect=column in MULTISELECT_QUESTIONS.values())
+        print(f"\n{component} - {key}")
+        print(intervals.round(3).to_string())
+
+    raking['weights'].to_csv(args.output, index_label='respondent')
+    print(f"Weighting complete! Respondent weights saved in '{args.output}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import pandas as pd
+import numpy as np
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import normalize
+from sicas_analysis import load_data, clean_data
+from survey_encoding import SKIP_MARKERS, encode_likert_items
+from near_duplicates import find_near_duplicates, representative_view
+from instrumentation import timed
+
+SUGGESTION_COL = '您对始祖鸟社交媒体营销有哪些建议或想法？请简要描述。'
+
+# Answers that carry no suggestion content
+NO_CONTENT_ANSWERS = ['无', '没有', '暂无', '无建议', '没有建议', '没', '不知道']
+
+# Below this many distinct texts the process pool costs more than it saves
+MIN_PARALLEL_TEXTS = 2000
+
+def get_suggestion_texts(df):
+    """Substantive free-text suggestions, with skip markers and empty answers removed"""
+    if SUGGESTION_COL not in df.columns:
+        return pd.Series(dtype=object)
+
+    texts = df[SUGGESTION_COL].dropna().astype(str).str.strip()
+    texts = texts[~texts.isin(SKIP_MARKERS + NO_CONTENT_ANSWERS) & (texts != '')]
+    return texts
+
+def char_ngrams(text, ngram_range=(2, 3)):
+    """Character n-grams of a Chinese text (punctuation and whitespace removed)"""
+    text = re.sub(r'[^\w]', '', text)
+    if len(text) < ngram_range[0]:
+        return [text] if text else []
+
+    tokens = []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        tokens.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    return tokens
+
+def _tokenize_batch(task):
+    """Process pool entry point: tokenize one batch of texts"""
+    texts, ngram_range = task
+    return [char_ngrams(text, ngram_range) for text in texts]
+
+def tokenize_texts(texts, ngram_range=(2, 3), batch_size=500, n_jobs=None):
+    """Tokenize texts in batches, using a process pool for large inputs"""
+    texts = list(texts)
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+
+    batches = [(texts[i:i + batch_size], ngram_range) for i in range(0, len(texts), batch_size)]
+
+    if n_jobs > 1 and len(texts) >= MIN_PARALLEL_TEXTS:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            tokenized = list(executor.map(_tokenize_batch, batches))
+    else:
+        tokenized = [_tokenize_batch(batch) for batch in batches]
+
+    return [tokens for batch in tokenized for tokens in batch]
+
+def build_term_matrix(tokenized):
+    """Sparse document x term count matrix from token lists"""
+    vocabulary = {}
+    rows, cols = [], []
+
+    for i, tokens in enumerate(tokenized):
+        for token in tokens:
+            rows.append(i)
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(tokenized), len(vocabulary))
+    )
+    return counts, list(vocabulary.keys())
+
+def tfidf_matrix(term_counts, doc_weights):
+    """TF-IDF weights where each distinct text counts as many times as it was submitted"""
+    n_docs = doc_weights.sum()
+
+    # Document frequency over respondents, not over distinct texts
+    presence = term_counts.copy()
+    presence.data[:] = 1
+    document_frequency = np.asarray(presence.T @ doc_weights).ravel()
+    idf = np.log((1 + n_docs) / (1 + document_frequency)) + 1
+
+    tfidf = term_counts @ sparse.diags(idf)
+    return normalize(tfidf, norm='l2', axis=1).tocsr()
+
+@timed
+def mine_suggestions(df, n_themes=4, top_n_keywords=15, ngram_range=(2, 3), n_jobs=None, seed=42,
+                     collapse_near_duplicates=True):
+    """Keyword ranking and theme clustering of free-text suggestions, linked to SICAS outcomes"""
+
+    texts = get_suggestion_texts(df)
+    if texts.empty:
+        return {'n_texts': 0, 'n_unique': 0, 'n_near_duplicates': 0,
+                'keywords': pd.DataFrame(), 'themes': pd.DataFrame()}
+
+    # Templated answers are merged into one distinct text per near-duplicate cluster; every
+    # respondent is kept, so the cluster's text is weighted by all of its members below
+    n_near_duplicates = 0
+    if collapse_near_duplicates:
+        duplicates = find_near_duplicates(texts)
+        n_near_duplicates = int(duplicates['is_near_duplicate'].sum())
+        texts = representative_view(texts, duplicates)
+
+    # Deduplicate first: many responses repeat verbatim
+    text_codes, unique_texts = pd.factorize(texts)
+    text_counts = np.bincount(text_codes).astype(np.float64)
+
+    tokenized = tokenize_texts(unique_texts, ngram_range, n_jobs=n_jobs)
+    term_counts, vocabulary = build_term_matrix(tokenized)
+    tfidf = tfidf_matrix(term_counts, text_counts)
+
+    # Keyword ranking weighted by how often each text was submitted
+    keyword_scores = np.asarray(tfidf.T @ text_counts).ravel()
+    order = np.argsort(keyword_scores)[::-1][:top_n_keywords]
+    keywords = pd.DataFrame({'keyword': [vocabulary[i] for i in order], 'score': keyword_scores[order]})
+
+    # Theme clustering on the normalized TF-IDF vectors of the distinct texts
+    n_clusters = max(1, min(n_themes, len(unique_texts)))
+    kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=seed)
+    theme_labels = kmeans.fit_predict(tfidf, sample_weight=text_counts)
+
+    # Link each respondent's theme to their satisfaction and purchase answers
+    outcomes = encode_likert_items(df.loc[texts.index], ['S2', 'A1'])
+    respondent_themes = theme_labels[text_codes]
+
+    themes = []
+    for theme in range(n_clusters):
+        members = respondent_themes == theme
+        centroid = kmeans.cluster_centers_[theme]
+        top_terms = [vocabulary[i] for i in np.argsort(centroid)[::-1][:3] if centroid[i] > 0]
+        examples = [unique_texts[i] for i in np.flatnonzero(theme_labels == theme)[:3]]
+
+        theme_row = {
+            'theme': theme + 1,
+            'top_terms': top_terms,
+            'n_respondents': int(members.sum()),
+            'share': members.mean(),
+            'examples': examples
+        }
+        for code, name in [('S2', 'mean_satisfaction'), ('A1', 'purchase_rate')]:
+            if code in outcomes['codes']:
+                values = outcomes['matrix'][members, outcomes['codes'].index(code)]
+                theme_row[name] = np.nanmean(values) if (~np.isnan(values)).any() else np.nan
+        themes.append(theme_row)
+
+    # Number themes by size, largest first
+    themes = pd.DataFrame(themes).sort_values('n_respondents', ascending=False).reset_index(drop=True)
+    themes['theme'] = np.arange(1, len(themes) + 1)
+
+    return {
+        'n_texts': len(texts),
+        'n_unique': len(unique_texts),
+        'n_near_duplicates': n_near_duplicates,
+        'keywords': keywords,
+        'themes': themes
+    }
+
+def main():
+    print("Loading data for suggestion mining...")
+    df = load_data()
+    df = clean_data(df)
+
+    print("Mining free-text suggestions...")
+    text_results = mine_suggestions(df)
+
+    print(f"{text_results['n_texts']} substantive suggestions ({text_results['n_unique']} distinct texts)")
+    if text_results['n_texts']:
+        print(text_results['keywords'].to_string(index=False))
+        print(text_results['themes'].drop(columns=['examples']).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -9,6 +10,17 @@ from matplotlib.colors import LinearSegmentedColormap
 import matplotlib.gridspec as gridspec
 import matplotlib.patches as mpatches
 from sicas_analysis import load_data, clean_data, analyze_sicas, get_translated_label, perform_demographic_analysis
+from significance_testing import run_segment_tests, summarize_significant_findings
+from survey_encoding import LIKERT_REGISTRY, encode_likert_items
+from polychoric import polychoric_correlation_matrix
+from correlation_significance import polychoric_significance, subset_significance, nonsignificant_mask, SIGNIFICANCE_LEVEL
+from path_model import analyze_sicas_paths, format_effect, STAGE_DISPLAY
+from sequential_funnel import analyze_sequential_funnel, segment_conversion_extremes
+from report_engine import heading, paragraph, bullets, image, table
+from report_export import export_report
+from survey_config import DEFAULT_QUESTIONS
+from survey_weighting import respondent_weights, load_weights, weighted_crosstab
+from instrumentation import timed
 
 # Create enhanced plots directory
 if not os.path.exists('thesis_plots'):
@@ -179,6 +191,7 @@ def set_thesis_style():
     mpl.rcParams['savefig.bbox'] = 'tight'
     mpl.rcParams['savefig.pad_inches'] = 0.1
 
+@timed
 def create_pie_charts(results, demographics):
     """Create pie charts for key proportions"""
     
@@ -276,8 +289,9 @@ def create_pie_charts(results, demographics):
             plt.savefig(f'thesis_plots/pie_{component}_{key}.png')
             plt.close()
 
-def create_radar_chart(results):
-    """Create a radar chart for SICAS model comparison"""
+@timed
+def create_radar_chart(results, funnel=None):
+    """Create a radar chart for SICAS model comparison (with stage-to-stage conversion when a respondent-level funnel is given)"""
     
     # Extract key metrics for the radar chart
     metrics = {
@@ -310,9 +324,17 @@ def create_radar_chart(results):
     plt.xticks(angles[:-1], categories[:-1], fontsize=14)
     
     # Draw the chart
-    ax.plot(angles, values, linewidth=2, linestyle='solid', color=ARCTERYX_COLORS[0])
+    ax.plot(angles, values, linewidth=2, linestyle='solid', color=ARCTERYX_COLORS[0], label='Stage rate')
     ax.fill(angles, values, alpha=0.25, color=ARCTERYX_COLORS[0])
     
+    # Conversion of respondents who passed every earlier stage (the first stage has no earlier stage)
+    if funnel is not None:
+        conversions = list(funnel['conditional'])
+        conversions += conversions[:1]
+        ax.plot(angles, conversions, linewidth=2, linestyle='dashed', color=ARCTERYX_COLORS[1],
+                label='Conversion from previous stages')
+        ax.legend(loc='lower right', bbox_to_anchor=(1.2, -0.05))
+    
     # Set y-axis limits
     ax.set_ylim(0, 1)
     
@@ -336,71 +358,34 @@ def create_radar_chart(results):
     plt.savefig('thesis_plots/radar_sicas_overview.png')
     plt.close()
 
-def create_heatmap(df):
-    """Create correlation heatmap between key variables"""
-    
-    # Encode categorical variables for correlation analysis
-    encoded_df = pd.DataFrame()
-    
-    # Map key categorical variables to numerical values
-    # Brand awareness
-    awareness_col = '您是否了解始祖鸟（Arc\'teryx）品牌？'
-    if awareness_col in df.columns:
-        awareness_map = {
-            '非常了解': 4, 
-            '略有了解': 3, 
-            '不太了解': 2, 
-            '完全不了解': 1
-        }
-        encoded_df['Brand_Awareness'] = df[awareness_col].map(awareness_map)
-    
-    # Content attraction
-    interest_col = '始祖鸟的社交媒体内容对您的吸引力如何?'
-    if interest_col in df.columns:
-        interest_map = {
-            '非常吸引': 5,
-            '比较吸引': 4,
-            '一般': 3,
-            '不太吸引': 2,
-            '完全不吸引': 1
-        }
-        encoded_df['Content_Attraction'] = df[interest_col].map(interest_map)
-    
-    # Interaction
-    interaction_col = '您是否曾与始祖鸟的社交媒体账号互动?'
-    if interaction_col in df.columns:
-        interaction_map = {
-            '经常互动(点赞、评论、分享等)': 4,
-            '偶尔互动': 3,
-            '很少互动': 2,
-            '从未互动': 1
-        }
-        encoded_df['Interaction_Level'] = df[interaction_col].map(interaction_map)
-    
-    # Purchase
-    purchase_col = '您是否因社交媒体内容购买过始祖鸟产品？'
-    if purchase_col in df.columns:
-        purchase_map = {'是': 1, '否': 0}
-        encoded_df['Purchase'] = df[purchase_col].map(purchase_map)
-    
-    # Satisfaction
-    satisfaction_col = '您对始祖鸟社交媒体的整体满意度如何？'
-    if satisfaction_col in df.columns:
-        satisfaction_map = {
-            '非常满意': 5,
-            '比较满意': 4,
-            '一般': 3,
-            '不太满意': 2,
-            '很不满意': 1
-        }
-        encoded_df['Satisfaction'] = df[satisfaction_col].map(satisfaction_map)
-    
-    # Create correlation matrix
-    corr_matrix = encoded_df.corr()
+@timed
+def create_heatmap(df, n_jobs=None, weights=None, significance=None):
+    """Create correlation heatmap between key variables
+
+    significance: a polychoric_significance result labelled by item code that covers the heatmap
+    items (e.g. the validation stage's, with the same weights); reused instead of re-running the bootstrap.
+    """
+    
+    # Encode the key SICAS items through the shared registry
+    heatmap_codes = ['S1', 'I1', 'C1', 'A1', 'S2']
+    items = encode_likert_items(df, heatmap_codes)
+    labels = [LIKERT_REGISTRY[code]['label'] for code in items['codes']]
+    
+    # Create correlation matrix (polychoric, since the items are ordinal codes)
+    weights = respondent_weights(df, weights)
+    corr_matrix = polychoric_correlation_matrix(items, n_jobs=n_jobs, weights=weights)
+    corr_matrix.index = labels
+    corr_matrix.columns = labels
+    
+    # Significance of the same polychoric estimates; non-significant correlations are left blank
+    if significance is not None and set(items['codes']) <= set(significance['p_value'].index):
+        significance = subset_significance(significance, items['codes'], labels)
+    else:
+        significance = polychoric_significance(items['matrix'], labels, weights=weights)
     
     # Create heatmap
     plt.figure(figsize=(10, 8))
-    mask = np.triu(np.ones_like(corr_matrix, dtype=bool))
+    mask = np.triu(np.ones_like(corr_matrix, dtype=bool)) | nonsignificant_mask(significance)
     
     # Custom diverging colormap
     cmap = sns.diverging_palette(230, 20, as_cmap=True)
@@ -421,26 +406,34 @@ def create_heatmap(df):
     )
     
     plt.title('Correlation Between SICAS Components', fontsize=18, pad=20)
-    plt.tight_layout()
+    plt.figtext(0.5, 0.01, f"Blank cells: not significant ({significance['test']} test of the polychoric correlations, FDR q ≥ {SIGNIFICANCE_LEVEL})",
+                ha='center', fontsize=10)
+    plt.tight_layout(rect=(0, 0.03, 1, 1))
     plt.savefig('thesis_plots/heatmap_sicas_correlation.png')
     plt.close()
+    
+    return significance
 
-def create_grouped_bar_charts(results, demographics):
+@timed
+def create_grouped_bar_charts(results, demographics, df=None, weights=None):
     """Create grouped bar charts to show relationships between demographics and SICAS metrics"""
     
-    # Load full dataset for cross-analysis
-    df = load_data()
-    df = clean_data(df)
+    # Load full dataset for cross-analysis unless the caller already has it
+    if df is None:
+        df = load_data()
+        df = clean_data(df)
+    weights = respondent_weights(df, weights)
     
     # Example: Gender vs Brand Awareness
-    gender_col = '您的性别'
-    awareness_col = '您是否了解始祖鸟（Arc\'teryx）品牌？'
+    gender_col = DEFAULT_QUESTIONS['gender']
+    awareness_col = DEFAULT_QUESTIONS['awareness']
     
     if gender_col in df.columns and awareness_col in df.columns:
         # Create cross-tabulation
-        cross_tab = pd.crosstab(
+        cross_tab = weighted_crosstab(
             df[gender_col], 
             df[awareness_col], 
+            weights,
             normalize='index'
         )
         
@@ -467,14 +460,15 @@ def create_grouped_bar_charts(results, demographics):
         plt.close()
     
     # Example: Age vs Purchase Rate
-    age_col = '您的年龄'
-    purchase_col = '您是否因社交媒体内容购买过始祖鸟产品？'
+    age_col = DEFAULT_QUESTIONS['age']
+    purchase_col = DEFAULT_QUESTIONS['purchase']
     
     if age_col in df.columns and purchase_col in df.columns:
         # Create cross-tabulation
-        cross_tab = pd.crosstab(
+        cross_tab = weighted_crosstab(
             df[age_col], 
             df[purchase_col], 
+            weights,
             normalize='index'
         )
         
@@ -519,7 +513,8 @@ def create_grouped_bar_charts(results, demographics):
         plt.savefig('thesis_plots/stacked_age_purchase.png')
         plt.close()
 
-def generate_sicas_conclusions(results, demographics):
+@timed
+def generate_sicas_conclusions(results, demographics, significance=None, funnel=None):
     """Generate research conclusions based on SICAS analysis"""
     
     conclusions = []
@@ -600,6 +595,21 @@ def generate_sicas_conclusions(results, demographics):
             top_ages.iloc[1]*100
         ))
     
+    # Statistically significant segment differences
+    if significance is not None and not significance.empty:
+        findings = summarize_significant_findings(significance)
+        n_tests = len(significance)
+        n_significant = int(significance['significant'].sum())
+        
+        if findings:
+            conclusions.append("**Segment Differences:** {} of {} demographic comparisons remain significant after Benjamini-Hochberg correction. The strongest differences: {}.".format(
+                n_significant,
+                n_tests,
+                "; ".join(findings)
+            ))
+        else:
+            conclusions.append("**Segment Differences:** None of the {} demographic comparisons of SICAS outcomes remain significant after Benjamini-Hochberg correction, so the visual differences between segments should be interpreted with caution.".format(n_tests))
+    
     # Improvement Recommendations
     if 'improvements' in results['share']:
         improvement_data = results['share']['improvements']
@@ -619,13 +629,23 @@ def generate_sicas_conclusions(results, demographics):
     action = purchase_rate
     satisfaction = high_satisfaction
     
-    # Find largest drop-off
-    transitions = [
-        ("awareness-interest", awareness - interest),
-        ("interest-communication", interest - communication),
-        ("communication-action", communication - action),
-        ("action-satisfaction", action - satisfaction if action > satisfaction else 0)
-    ]
+    # Find largest drop-off: with the respondent-level funnel, the share of respondents who passed
+    # every earlier stage but not this one; otherwise the difference of the stage rates
+    if funnel is not None:
+        losses = 1 - funnel['conditional']
+        transitions = [
+            ("awareness-interest", losses['Interest']),
+            ("interest-communication", losses['Communication']),
+            ("communication-action", losses['Action']),
+            ("action-satisfaction", losses['Share'])
+        ]
+    else:
+        transitions = [
+            ("awareness-interest", awareness - interest),
+            ("interest-communication", interest - communication),
+            ("communication-action", communication - action),
+            ("action-satisfaction", action - satisfaction if action > satisfaction else 0)
+        ]
     
     largest_drop = max(transitions, key=lambda x: x[1])
     
@@ -639,6 +659,23 @@ def generate_sicas_conclusions(results, demographics):
         elif largest_drop[0] == "action-satisfaction":
             conclusions.append("**Funnel Analysis:** The {:.1f}% decline from purchase to satisfaction suggests post-purchase disappointment that could damage brand reputation. Aligning marketing messaging more closely with product reality and improving customer experience should be prioritized.".format(largest_drop[1]*100))
     
+    # Respondent-level funnel: end-to-end conversion and the segments converting best and worst
+    if funnel is not None:
+        conversions = funnel['conditional'].iloc[1:]
+        text = "**Sequential Funnel:** {:.1f}% of respondents pass all five SICAS stages. Among respondents who passed every earlier stage, conversion is lowest into {} ({:.1f}%) and highest into {} ({:.1f}%).".format(
+            funnel['reach'].iloc[-1]*100,
+            conversions.idxmin(), conversions.min()*100,
+            conversions.idxmax(), conversions.max()*100
+        )
+        extremes = segment_conversion_extremes(funnel)
+        if extremes is not None:
+            (best_segment, best_level), best, (worst_segment, worst_level), worst = extremes
+            text += " Full-funnel conversion is highest for {} {} ({:.1f}%) and lowest for {} {} ({:.1f}%).".format(
+                best_segment.replace('_', ' '), get_translated_label(best_level), best*100,
+                worst_segment.replace('_', ' '), get_translated_label(worst_level), worst*100
+            )
+        conclusions.append(text)
+    
     # Final comprehensive conclusion
     overall_performance = np.mean([awareness, interest, communication, action, satisfaction])
     
@@ -659,146 +696,177 @@ def generate_sicas_conclusions(results, demographics):
     
     return conclusions
 
-def generate_enhanced_report(results, demographics, conclusions):
-    """Generate an enhanced report for thesis use"""
+@timed
+def generate_enhanced_report(results, demographics, conclusions, path_results=None, drivers=None):
+    """Generate an enhanced report for thesis use (with key-driver priorities when driver results are given)"""
     
-    with open('thesis_report.md', 'w', encoding='utf-8') as f:
-        f.write('# Arc\'teryx Social Media Marketing Effectiveness Analysis\n\n')
-        f.write('## Using the SICAS Model Framework\n\n')
+    blocks = [
+        heading(1, 'Arc\'teryx Social Media Marketing Effectiveness Analysis'),
+        heading(2, 'Using the SICAS Model Framework'),
         
         # Executive Summary
-        f.write('## Executive Summary\n\n')
-        f.write('This analysis examines Arc\'teryx\'s social media marketing effectiveness through the SICAS (Sense-Interest-Communication-Action-Share) framework, based on survey data from consumers. The findings reveal insights into brand awareness, content engagement, interaction patterns, purchase conversion, and overall satisfaction with the brand\'s social media presence.\n\n')
+        heading(2, 'Executive Summary'),
+        paragraph('This analysis examines Arc\'teryx\'s social media marketing effectiveness through the SICAS (Sense-Interest-Communication-Action-Share) framework, based on survey data from consumers. The findings reveal insights into brand awareness, content engagement, interaction patterns, purchase conversion, and overall satisfaction with the brand\'s social media presence.'),
         
         # Key Findings - Conclusions
-        f.write('## Key Findings\n\n')
-        for conclusion in conclusions:
-            f.write(f'- {conclusion}\n\n')
+        heading(2, 'Key Findings'),
+        bullets(conclusions, loose=True),
         
         # Visualization Gallery
-        f.write('## Visualization Gallery\n\n')
-        
-        # SICAS Overview - Radar Chart
-        f.write('### SICAS Model Overview\n\n')
-        f.write('![SICAS Radar Overview](thesis_plots/radar_sicas_overview.png)\n\n')
-        f.write('*Figure 1: Radar chart visualizing performance across all SICAS dimensions, showing the relative strengths and weaknesses in Arc\'teryx\'s social media marketing funnel.*\n\n')
-        
-        # Correlation Heatmap
-        f.write('### Component Correlations\n\n')
-        f.write('![SICAS Correlation Heatmap](thesis_plots/heatmap_sicas_correlation.png)\n\n')
-        f.write('*Figure 2: Correlation heatmap showing relationships between different SICAS components, revealing how each stage influences subsequent stages in the marketing funnel.*\n\n')
-        
-        # Demographic Insights
-        f.write('### Demographic Analysis\n\n')
-        
-        # Gender distribution
-        f.write('#### Gender Distribution\n\n')
-        f.write('![Gender Distribution](thesis_plots/pie_gender.png)\n\n')
-        f.write('*Figure 3: Gender distribution of survey respondents.*\n\n')
-        
-        # Age distribution
-        f.write('#### Age Distribution\n\n')
-        f.write('![Age Distribution](thesis_plots/pie_age.png)\n\n')
-        f.write('*Figure 4: Age distribution of survey respondents.*\n\n')
-        
-        # Cross-Analysis
-        f.write('### Cross-Demographic Analysis\n\n')
-        
-        # Gender vs Awareness
-        f.write('#### Gender vs. Brand Awareness\n\n')
-        f.write('![Gender vs Brand Awareness](thesis_plots/grouped_gender_awareness.png)\n\n')
-        f.write('*Figure 5: Brand awareness levels across different gender groups, showing variation in brand recognition between demographics.*\n\n')
-        
-        # Age vs Purchase
-        f.write('#### Age vs. Purchase Behavior\n\n')
-        f.write('![Age vs Purchase](thesis_plots/stacked_age_purchase.png)\n\n')
-        f.write('*Figure 6: Purchase conversion rates across age groups, highlighting which demographics are most likely to convert from social media engagement to product purchase.*\n\n')
-        
-        # Individual SICAS Components
-        f.write('## SICAS Component Analysis\n\n')
-        
-        # Sense - Brand Awareness
-        f.write('### Sense (Brand Awareness)\n\n')
-        f.write('![Brand Awareness](thesis_plots/pie_sense_awareness.png)\n\n')
-        f.write('*Figure 7: Distribution of brand awareness levels among respondents.*\n\n')
-        
-        # Interest - Content Attraction
-        f.write('### Interest (Content Attraction)\n\n')
-        f.write('![Content Attraction](plots/interest_attraction.png)\n\n')
-        f.write('*Figure 8: Respondents\' ratings of how attractive they find Arc\'teryx\'s social media content.*\n\n')
-        
-        # Action - Purchase
-        f.write('### Action (Purchase Conversion)\n\n')
-        f.write('![Purchase Conversion](thesis_plots/pie_action_purchase.png)\n\n')
-        f.write('*Figure 9: Proportion of respondents who have made purchases based on Arc\'teryx\'s social media content.*\n\n')
-        
-        # Satisfaction
-        f.write('### Share (User Satisfaction)\n\n')
-        f.write('![User Satisfaction](thesis_plots/pie_share_satisfaction.png)\n\n')
-        f.write('*Figure 10: Overall satisfaction levels with Arc\'teryx\'s social media presence.*\n\n')
-        
-        # Methodological Notes
-        f.write('## Methodological Notes\n\n')
-        f.write('This analysis employs the SICAS model to evaluate social media marketing effectiveness through five key dimensions: Sense (awareness), Interest (attraction), Communication (interaction), Action (purchase), and Share (satisfaction). Data was collected through a comprehensive consumer survey with responses from various demographic groups.\n\n')
-        f.write('The analysis utilizes multiple visualization techniques to reveal patterns and insights, including pie charts, radar charts, heatmaps, and grouped bar charts. Statistical correlations between SICAS components were calculated to identify relationships between different stages of the consumer journey.\n\n')
-        
-        # Recommendations
-        f.write('## Strategic Recommendations\n\n')
-        f.write('Based on the comprehensive analysis of Arc\'teryx\'s social media marketing effectiveness, the following strategic recommendations are proposed:\n\n')
-        
-        # Add recommendations based on findings
-        if 'awareness' in results['sense']:
-            awareness_data = results['sense']['awareness']
-            high_awareness = awareness_data.get('非常了解', 0) + awareness_data.get('略有了解', 0)
-            
-            if high_awareness < 0.6:
-                f.write('1. **Enhance Brand Visibility**: Implement targeted advertising campaigns and collaborative partnerships with outdoor influencers to increase brand recognition, particularly among the identified demographic segments with lower awareness.\n\n')
-            else:
-                f.write('1. **Leverage Strong Brand Recognition**: Capitalize on high brand awareness by focusing on differentiation messaging that reinforces Arc\'teryx\'s unique value proposition compared to competitors.\n\n')
-        
-        if 'attraction' in results['interest']:
-            interest_data = results['interest']['attraction']
-            high_interest = interest_data.get('非常吸引', 0) + interest_data.get('比较吸引', 0)
-            
-            if high_interest < 0.6:
-                f.write('2. **Content Strategy Revision**: Develop more engaging content formats based on audience preferences, emphasizing authentic storytelling, user-generated content, and educational material about outdoor activities.\n\n')
-            else:
-                f.write('2. **Refine Content Excellence**: Continue to enhance the already effective content strategy by introducing more innovative formats while maintaining the successful elements that are attracting audience interest.\n\n')
-        
-        if 'interaction' in results['communication']:
-            interaction_data = results['communication']['interaction']
-            active_interaction = interaction_data.get('经常互动(点赞、评论、分享等)', 0) + interaction_data.get('偶尔互动', 0)
-            
-            if active_interaction < 0.5:
-                f.write('3. **Boost Audience Engagement**: Create more interactive content formats such as polls, contests, Q&A sessions, and interactive stories to encourage active participation rather than passive consumption.\n\n')
-            else:
-                f.write('3. **Nurture Community Interaction**: Build upon the existing engagement by developing a structured community management strategy that rewards participation and creates opportunities for deeper brand relationships.\n\n')
-        
-        if 'purchase' in results['action']:
-            purchase_data = results['action']['purchase']
-            purchase_rate = purchase_data.get('是', 0)
-            
-            if purchase_rate < 0.2:
-                f.write('4. **Optimize Conversion Pathways**: Address the significant gap between engagement and purchase by simplifying the buying journey, implementing strategic calls-to-action, and developing social commerce capabilities.\n\n')
-            else:
-                f.write('4. **Enhance Purchase Experience**: Streamline the already successful conversion process and implement loyalty-building initiatives to encourage repeat purchases and maximize lifetime customer value.\n\n')
-        
-        if 'barriers' in results['action']:
-            barriers_data = results['action']['barriers']
-            price_barrier = barriers_data.get('价格过高', 0)
-            
-            if price_barrier > 0.3:
-                f.write('5. **Address Price Perception**: Develop targeted content that emphasizes product value, durability, and long-term benefits to justify the premium pricing and overcome the significant price barrier identified in the research.\n\n')
-        
-        f.write('6. **Demographic-Specific Strategies**: Develop tailored content approaches for different demographic segments based on the cross-analysis findings, with particular attention to age groups showing the highest potential for conversion improvement.\n\n')
-        
-        # Conclusion
-        f.write('## Conclusion\n\n')
-        f.write('The SICAS model analysis provides a structured framework for evaluating and enhancing Arc\'teryx\'s social media marketing effectiveness. By addressing the identified gaps in the consumer journey and building on existing strengths, the brand can optimize its social media strategy to better achieve marketing objectives and drive business results.\n\n')
-        f.write('This research demonstrates the value of a systematic approach to social media marketing analysis and provides actionable insights that can inform strategic decision-making. Future research could expand on these findings with longitudinal studies to track changes in effectiveness over time and competitive benchmarking to contextualize performance within the outdoor apparel industry.\n\n')
+        heading(2, 'Visualization Gallery')
+    ]
+    
+    # Each figure is (section heading, heading level, alt text, path, caption)
+    figures = [
+        ('SICAS Model Overview', 3, 'SICAS Radar Overview', 'thesis_plots/radar_sicas_overview.png',
+         'Radar chart visualizing performance across all SICAS dimensions, showing the relative strengths and weaknesses in Arc\'teryx\'s social media marketing funnel.'),
+        ('Component Correlations', 3, 'SICAS Correlation Heatmap', 'thesis_plots/heatmap_sicas_correlation.png',
+         'Correlation heatmap showing relationships between different SICAS components, revealing how each stage influences subsequent stages in the marketing funnel.'),
+        ('Demographic Analysis', 3, None, None, None),
+        ('Gender Distribution', 4, 'Gender Distribution', 'thesis_plots/pie_gender.png',
+         'Gender distribution of survey respondents.'),
+        ('Age Distribution', 4, 'Age Distribution', 'thesis_plots/pie_age.png',
+         'Age distribution of survey respondents.'),
+        ('Cross-Demographic Analysis', 3, None, None, None),
+        ('Gender vs. Brand Awareness', 4, 'Gender vs Brand Awareness', 'thesis_plots/grouped_gender_awareness.png',
+         'Brand awareness levels across different gender groups, showing variation in brand recognition between demographics.'),
+        ('Age vs. Purchase Behavior', 4, 'Age vs Purchase', 'thesis_plots/stacked_age_purchase.png',
+         'Purchase conversion rates across age groups, highlighting which demographics are most likely to convert from social media engagement to product purchase.'),
+        ('SICAS Component Analysis', 2, None, None, None),
+        ('Sense (Brand Awareness)', 3, 'Brand Awareness', 'thesis_plots/pie_sense_awareness.png',
+         'Distribution of brand awareness levels among respondents.'),
+        ('Interest (Content Attraction)', 3, 'Content Attraction', 'plots/interest_attraction.png',
+         'Respondents\' ratings of how attractive they find Arc\'teryx\'s social media content.'),
+        ('Action (Purchase Conversion)', 3, 'Purchase Conversion', 'thesis_plots/pie_action_purchase.png',
+         'Proportion of respondents who have made purchases based on Arc\'teryx\'s social media content.'),
+        ('Share (User Satisfaction)', 3, 'User Satisfaction', 'thesis_plots/pie_share_satisfaction.png',
+         'Overall satisfaction levels with Arc\'teryx\'s social media presence.')
+    ]
+    
+    figure_number = 0
+    for title, level, alt, path, caption in figures:
+        blocks.append(heading(level, title))
+        if path is not None:
+            figure_number += 1
+            blocks.append(image(alt, path))
+            blocks.append(paragraph(f'*Figure {figure_number}: {caption}*'))
+    
+    # SICAS Path Model
+    if path_results is not None:
+        blocks.append(heading(2, 'SICAS Path Model'))
+        blocks.append(paragraph('A recursive path model links each SICAS stage to all preceding stages (logistic link for purchase), estimated from the item covariance structure of {} respondents. Standardized effects are shown with 95% bootstrap confidence intervals ({} replicates).'.format(
+            path_results['n_respondents'],
+            path_results['n_bootstrap']
+        )))
+        blocks.append(table(['Path', 'Direct', 'Indirect', 'Total'], [
+            ['{} → {}'.format(STAGE_DISPLAY[row['cause']], STAGE_DISPLAY[row['outcome']]),
+             format_effect(row, 'direct'),
+             format_effect(row, 'indirect'),
+             format_effect(row, 'total')]
+            for _, row in path_results['effects'].iterrows()
+        ]))
+        
+        r_squared_text = ", ".join(["{} R² = {:.2f}".format(STAGE_DISPLAY[stage], value) for stage, value in path_results['r_squared'].items()])
+        blocks.append(paragraph(f'Explained variance by stage: {r_squared_text}.'))
+    
+    # Methodological Notes
+    blocks.append(heading(2, 'Methodological Notes'))
+    blocks.append(paragraph('This analysis employs the SICAS model to evaluate social media marketing effectiveness through five key dimensions: Sense (awareness), Interest (attraction), Communication (interaction), Action (purchase), and Share (satisfaction). Data was collected through a comprehensive consumer survey with responses from various demographic groups.'))
+    blocks.append(paragraph('The analysis utilizes multiple visualization techniques to reveal patterns and insights, including pie charts, radar charts, heatmaps, and grouped bar charts. Polychoric correlations between the ordinal SICAS items were calculated to identify relationships between different stages of the consumer journey.'))
+    
+    # Recommendations
+    blocks.append(heading(2, 'Strategic Recommendations'))
+    blocks.append(paragraph('Based on the comprehensive analysis of Arc\'teryx\'s social media marketing effectiveness, the following strategic recommendations are proposed:'))
+    
+    # Add recommendations based on findings
+    if 'awareness' in results['sense']:
+        awareness_data = results['sense']['awareness']
+        high_awareness = awareness_data.get('非常了解', 0) + awareness_data.get('略有了解', 0)
+        
+        if high_awareness < 0.6:
+            blocks.append(paragraph('1. **Enhance Brand Visibility**: Implement targeted advertising campaigns and collaborative partnerships with outdoor influencers to increase brand recognition, particularly among the identified demographic segments with lower awareness.'))
+        else:
+            blocks.append(paragraph('1. **Leverage Strong Brand Recognition**: Capitalize on high brand awareness by focusing on differentiation messaging that reinforces Arc\'teryx\'s unique value proposition compared to competitors.'))
+    
+    if 'attraction' in results['interest']:
+        interest_data = results['interest']['attraction']
+        high_interest = interest_data.get('非常吸引', 0) + interest_data.get('比较吸引', 0)
+        
+        if high_interest < 0.6:
+            blocks.append(paragraph('2. **Content Strategy Revision**: Develop more engaging content formats based on audience preferences, emphasizing authentic storytelling, user-generated content, and educational material about outdoor activities.'))
+        else:
+            blocks.append(paragraph('2. **Refine Content Excellence**: Continue to enhance the already effective content strategy by introducing more innovative formats while maintaining the successful elements that are attracting audience interest.'))
+    
+    if 'interaction' in results['communication']:
+        interaction_data = results['communication']['interaction']
+        active_interaction = interaction_data.get('经常互动(点赞、评论、分享等)', 0) + interaction_data.get('偶尔互动', 0)
+        
+        if active_interaction < 0.5:
+            blocks.append(paragraph('3. **Boost Audience Engagement**: Create more interactive content formats such as polls, contests, Q&A sessions, and interactive stories to encourage active participation rather than passive consumption.'))
+        else:
+            blocks.append(paragraph('3. **Nurture Community Interaction**: Build upon the existing engagement by developing a structured community management strategy that rewards participation and creates opportunities for deeper brand relationships.'))
+    
+    if 'purchase' in results['action']:
+        purchase_data = results['action']['purchase']
+        purchase_rate = purchase_data.get('是', 0)
+        
+        if purchase_rate < 0.2:
+            blocks.append(paragraph('4. **Optimize Conversion Pathways**: Address the significant gap between engagement and purchase by simplifying the buying journey, implementing strategic calls-to-action, and developing social commerce capabilities.'))
+        else:
+            blocks.append(paragraph('4. **Enhance Purchase Experience**: Streamline the already successful conversion process and implement loyalty-building initiatives to encourage repeat purchases and maximize lifetime customer value.'))
+    
+    if 'barriers' in results['action']:
+        barriers_data = results['action']['barriers']
+        price_barrier = barriers_data.get('价格过高', 0)
+        
+        if price_barrier > 0.3:
+            blocks.append(paragraph('5. **Address Price Perception**: Develop targeted content that emphasizes product value, durability, and long-term benefits to justify the premium pricing and overcome the significant price barrier identified in the research.'))
+    
+    blocks.append(paragraph('6. **Demographic-Specific Strategies**: Develop tailored content approaches for different demographic segments based on the cross-analysis findings, with particular attention to age groups showing the highest potential for conversion improvement.'))
+    
+    # Key-driver priorities: Shapley shares of explained variance in satisfaction and purchase
+    if drivers is not None and 'satisfaction' in drivers and 'purchase' in drivers:
+        # Imported here: driver_analysis uses this module's colour palette
+        from driver_analysis import predictor_display
+        satisfaction, purchase = drivers['satisfaction'], drivers['purchase']
+        top_satisfaction = satisfaction['importance'].iloc[0]
+        top_purchase = purchase['importance'].iloc[0]
+        blocks.append(paragraph('7. **Prioritize the Key Drivers**: An exact Shapley decomposition over all {} sub-models attributes the explained variance in satisfaction (R² = {:.2f}) and purchase (R² = {:.2f}) to each predictor. {} is the strongest driver of satisfaction ({:.1%} of its explained variance) and {} of purchase ({:.1%}), so improvements there are expected to move the outcomes most; low-ranked areas should not absorb a comparable share of the budget.'.format(
+            satisfaction['n_submodels'],
+            satisfaction['r_squared'],
+            purchase['r_squared'],
+            predictor_display(top_satisfaction['predictor'], top_satisfaction['kind']),
+            top_satisfaction['share'],
+            predictor_display(top_purchase['predictor'], top_purchase['kind']).lower(),
+            top_purchase['share']
+        )))
+        
+        shares = pd.concat({
+            'satisfaction': satisfaction['importance'].set_index(['predictor', 'kind'])['share'],
+            'purchase': purchase['importance'].set_index(['predictor', 'kind'])['share']
+        }, axis=1).sort_values('satisfaction', ascending=False)
+        blocks.append(table(['Driver', 'Share of Satisfaction R²', 'Share of Purchase R²'], [
+            [predictor_display(name, kind),
+             '{:.1%}'.format(row['satisfaction']) if pd.notna(row['satisfaction']) else '—',
+             '{:.1%}'.format(row['purchase']) if pd.notna(row['purchase']) else '—']
+            for (name, kind), row in shares.iterrows()
+        ]))
+        blocks.append(image('Key Drivers', 'driver_plots/key_drivers.png'))
+    
+    # Conclusion
+    blocks.append(heading(2, 'Conclusion'))
+    blocks.append(paragraph('The SICAS model analysis provides a structured framework for evaluating and enhancing Arc\'teryx\'s social media marketing effectiveness. By addressing the identified gaps in the consumer journey and building on existing strengths, the brand can optimize its social media strategy to better achieve marketing objectives and drive business results.'))
+    blocks.append(paragraph('This research demonstrates the value of a systematic approach to social media marketing analysis and provides actionable insights that can inform strategic decision-making. Future research could expand on these findings with longitudinal studies to track changes in effectiveness over time and competitive benchmarking to contextualize performance within the outdoor apparel industry.'))
+    
+    # Markdown and JSON, plus self-contained HTML and PDF for distribution
+    export_report(blocks, 'thesis_report')
+    return blocks
 
 def main():
     """Main function to run enhanced analysis"""
+    parser = argparse.ArgumentParser(description='Thesis charts and report of the SICAS analysis')
+    parser.add_argument('--weights', default=None, help="respondent weights CSV written by survey_weighting.py")
+    args = parser.parse_args()
     
     # Set the style for thesis-quality plots
     set_thesis_style()
@@ -809,35 +877,51 @@ def main():
     
     print("Cleaning data...")
     df = clean_data(df)
+    weights = load_weights(args.weights, df) if args.weights else None
     
     print("Analyzing SICAS components...")
-    sicas_results = analyze_sicas(df)
+    sicas_results = analyze_sicas(df, weights=weights)
     
     print("Performing demographic analysis...")
-    demographics = perform_demographic_analysis(df)
+    demographics = perform_demographic_analysis(df, weights=weights)
     
     # Create enhanced visualizations
     print("Creating pie charts...")
     create_pie_charts(sicas_results, demographics)
     
+    print("Building respondent-level funnel...")
+    funnel = analyze_sequential_funnel(df, weights)
+    
     print("Creating radar chart...")
-    create_radar_chart(sicas_results)
+    create_radar_chart(sicas_results, funnel)
     
     print("Creating correlation heatmap...")
-    create_heatmap(df)
+    create_heatmap(df, weights=weights)
     
     print("Creating grouped bar charts...")
-    create_grouped_bar_charts(sicas_results, demographics)
+    create_grouped_bar_charts(sicas_results, demographics, df, weights)
+    
+    print("Testing segment differences...")
+    significance = run_segment_tests(df, weights=weights)
     
     # Generate research conclusions
     print("Generating research conclusions...")
-    conclusions = generate_sicas_conclusions(sicas_results, demographics)
+    conclusions = generate_sicas_conclusions(sicas_results, demographics, significance, funnel)
+    
+    print("Fitting SICAS path model...")
+    path_results = analyze_sicas_paths(df, weights=weights)
+    
+    print("Decomposing key drivers of satisfaction and purchase...")
+    # Imported here: driver_analysis uses this module's colour palette
+    from driver_analysis import analyze_key_drivers, plot_key_drivers
+    drivers = analyze_key_drivers(df, weights)
+    plot_key_drivers(drivers)
     
     # Generate enhanced report
     print("Generating enhanced thesis report...")
-    generate_enhanced_report(sicas_results, demographics, conclusions)
+    generate_enhanced_report(sicas_results, demographics, conclusions, path_results, drivers)
     
-    print("Enhanced analysis complete! Results saved in 'thesis_report.md' and 'thesis_plots/' directory.")
+    print("Enhanced analysis complete! Results saved in 'thesis_report.md' (plus .html/.pdf/.json) and 'thesis_plots/' directory.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file